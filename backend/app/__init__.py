@@ -33,10 +33,17 @@ def create_app():
     from app.models.job import JobDescription
     from app.models.assessment_attempt import AssessmentAttempt
     from app.models.assessment_state import AssessmentState
+    from app.models.assessment_state_event import AssessmentStateEvent
     from app.models.skill import Skill
     from app.models.candidate_skill import CandidateSkill
     from app.models.required_skill import RequiredSkill
     from app.models.assessment_registration import AssessmentRegistration
+    from app.models.question_prefetch import QuestionPrefetch
+    from app.models.background_job import BackgroundJob
+    from app.models.candidate_face_embedding import CandidateFaceEmbedding
+    from app.models.skill_expansion import SkillExpansion
+    from app.models.knowledge_document import KnowledgeDocument, KnowledgeChunk
+    from app.models.question_pool_item import QuestionPoolItem
     
     # Import and register blueprints
     from app.routes.candidate import candidate_api_bp
@@ -1,6 +1,7 @@
 import os
 from urllib.parse import quote
 from dotenv import load_dotenv
+from app.services.db_pool import engine_options
 
 load_dotenv()
 
@@ -24,6 +25,7 @@ class Config:
 
     SQLALCHEMY_DATABASE_URI = get_db_uri.__func__()
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options()
 
     MAIL_SERVER = os.getenv('MAIL_SERVER')
     MAIL_PORT = int(os.getenv('MAIL_PORT'))
@@ -0,0 +1,14 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+class AssessmentStateEvent(db.Model):
+    __tablename__ = 'assessment_state_events'
+
+    attempt_id = db.Column(db.Integer, db.ForeignKey('assessment_attempts.attempt_id'), primary_key=True)
+    version = db.Column(db.Integer, primary_key=True)
+    ops = db.Column(JSONB, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<AssessmentStateEvent attempt_id={self.attempt_id} version={self.version}>'
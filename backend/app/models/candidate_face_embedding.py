@@ -0,0 +1,15 @@
+from app import db
+from datetime import datetime
+
+class CandidateFaceEmbedding(db.Model):
+    __tablename__ = 'candidate_face_embeddings'
+
+    candidate_id = db.Column(db.Integer, db.ForeignKey('candidates.candidate_id'), primary_key=True)
+    source = db.Column(db.String(20), primary_key=True)  # 'profile_picture' or 'camera_image'
+    model_name = db.Column(db.String(20), primary_key=True)  # 'SFace' or 'Facenet'
+    image_hash = db.Column(db.String(64), nullable=False)
+    embedding = db.Column(db.LargeBinary, nullable=False)  # float32 vector
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CandidateFaceEmbedding candidate_id={self.candidate_id} source={self.source} model={self.model_name}>'
@@ -0,0 +1,29 @@
+from app import db
+from datetime import datetime
+
+class KnowledgeDocument(db.Model):
+    __tablename__ = 'knowledge_documents'
+
+    topic = db.Column(db.String(255), primary_key=True)  # normalized: stripped, lower-case
+    title = db.Column(db.String(255))
+    source = db.Column(db.String(20), nullable=False)  # 'wikipedia', 'fixture' or 'missing'
+    content = db.Column(db.Text)
+    content_hash = db.Column(db.String(64))
+    fetched_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    chunks = db.relationship('KnowledgeChunk', backref='document', lazy=True, cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<KnowledgeDocument {self.topic} source={self.source}>'
+
+class KnowledgeChunk(db.Model):
+    __tablename__ = 'knowledge_chunks'
+
+    chunk_id = db.Column(db.Integer, primary_key=True)
+    topic = db.Column(db.String(255), db.ForeignKey('knowledge_documents.topic'), nullable=False, index=True)
+    position = db.Column(db.Integer, nullable=False)
+    text = db.Column(db.Text, nullable=False)
+    embedding = db.Column(db.LargeBinary, nullable=False)  # float32 vector
+
+    def __repr__(self):
+        return f'<KnowledgeChunk {self.chunk_id} topic={self.topic} position={self.position}>'
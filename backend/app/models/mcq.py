@@ -13,6 +13,8 @@ class MCQ(db.Model):
     option_d = db.Column(db.Text, nullable=False)
     correct_answer = db.Column(db.String(1), nullable=False)  # 'A', 'B', 'C', or 'D'
     difficulty_band = db.Column(db.String(20), nullable=False)  # 'good', 'better', 'perfect'
+    pool_id = db.Column(db.Integer, db.ForeignKey('question_pool.pool_id'), index=True)  # shared pool item it came from
+    content_hash = db.Column(db.String(64))  # unique per job, see question_pool.content_hash
 
     # Relationships
     skill = db.relationship('Skill', backref='mcqs')
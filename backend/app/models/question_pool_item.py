@@ -0,0 +1,25 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+class QuestionPoolItem(db.Model):
+    __tablename__ = 'question_pool'
+
+    pool_id = db.Column(db.Integer, primary_key=True)
+    skill_id = db.Column(db.Integer, db.ForeignKey('skills.skill_id'), nullable=False)
+    difficulty_band = db.Column(db.String(20), nullable=False)
+    question = db.Column(db.Text, nullable=False)
+    option_a = db.Column(db.Text, nullable=False)
+    option_b = db.Column(db.Text, nullable=False)
+    option_c = db.Column(db.Text, nullable=False)
+    option_d = db.Column(db.Text, nullable=False)
+    correct_answer = db.Column(db.String(1), nullable=False)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)
+    tags = db.Column(JSONB, nullable=False, default=lambda: [])  # empty = shared by every job
+    times_assigned = db.Column(db.Integer, nullable=False, default=0)  # jobs that copied it
+    times_served = db.Column(db.Integer, nullable=False, default=0)  # attempts that were asked it
+    retired = db.Column(db.Boolean, nullable=False, default=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<QuestionPoolItem {self.pool_id} skill_id={self.skill_id} band={self.difficulty_band}>'
@@ -0,0 +1,14 @@
+from app import db
+from datetime import datetime
+
+class QuestionPrefetch(db.Model):
+    __tablename__ = 'question_prefetches'
+
+    attempt_id = db.Column(db.Integer, db.ForeignKey('assessment_attempts.attempt_id'), primary_key=True)
+    skill_name = db.Column(db.String(255), primary_key=True)
+    difficulty_band = db.Column(db.String(20), primary_key=True)
+    mcq_id = db.Column(db.Integer, db.ForeignKey('mcqs.mcq_id'), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<QuestionPrefetch attempt_id={self.attempt_id} skill={self.skill_name} band={self.difficulty_band}>'
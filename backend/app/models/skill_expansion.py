@@ -0,0 +1,13 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+class SkillExpansion(db.Model):
+    __tablename__ = 'skill_expansions'
+
+    skill_name = db.Column(db.String(255), primary_key=True)
+    subskills = db.Column(JSONB, nullable=False, default=lambda: [])
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SkillExpansion {self.skill_name}: {len(self.subskills or [])} subskills>'
@@ -4,8 +4,7 @@ from datetime import datetime, timezone, timedelta
 import random
 import os
 from pathlib import Path
-import cv2
-import numpy as np
+from sqlalchemy.orm.attributes import flag_modified
 from app import db
 from app.models.candidate import Candidate
 from app.models.job import JobDescription
@@ -13,11 +12,19 @@ from app.models.assessment_attempt import AssessmentAttempt
 from app.models.required_skill import RequiredSkill
 from app.models.skill import Skill
 from app.models.candidate_skill import CandidateSkill
-from app.models.mcq import MCQ
 from app.models.assessment_registration import AssessmentRegistration
 from app.models.assessment_state import AssessmentState
-from app.services.question_batches import generate_single_question
-from deepface import DeepFace
+from app.services.question_batches import generate_single_question, question_coalescer
+from app.services.session_store import session_store, load_saved_state
+from app.services.question_bank import get_bank_snapshot, get_question
+from app.services.question_prefetch import schedule_prefetch, take_prefetched_question, clear_prefetched_questions
+from app.services.question_pool import record_exposure
+from app.services.question_reservoir import question_reservoir, split_questions, RESERVOIR_ENABLED
+from app.services.face_verification import enqueue_face_verification, FACE_VERIFICATION_JOB
+from app.services.job_queue import get_job
+from app.services.llm_executor import llm_executor
+from app.services.llm_scheduler import llm_scheduler
+from app.services.db_pool import get_pool_metrics
 import timeout_decorator
 import google.api_core.exceptions
 import json
@@ -54,37 +61,14 @@ INCORRECT_FEEDBACK = [
     "😬 Close, but the answer was: {answer}"
 ]
 
-assessment_states = {}
-
-def load_question_bank(job_id):
-    """Load and shuffle questions for a job, organized by skill and difficulty band."""
-    try:
-        bank = {band: {} for band in BAND_ORDER}
-        mcqs = MCQ.query.filter_by(job_id=job_id).join(Skill, Skill.skill_id == MCQ.skill_id).all()
-        
-        for mcq in mcqs:
-            skill_name = mcq.skill.name
-            band = mcq.difficulty_band
-            if skill_name not in bank[band]:
-                bank[band][skill_name] = []
-            if mcq.correct_answer not in ['A', 'B', 'C', 'D']:
-                logger.error(f"Invalid correct_answer '{mcq.correct_answer}' for MCQ mcq_id={mcq.mcq_id}")
-                continue
-            bank[band][skill_name].append({
-                "mcq_id": mcq.mcq_id,
-                "question": mcq.question,
-                "options": [mcq.option_a, mcq.option_b, mcq.option_c, mcq.option_d],
-                "answer": getattr(mcq, f"option_{mcq.correct_answer.lower()}")
-            })
-        
-        for band in bank:
-            for skill in bank[band]:
-                random.shuffle(bank[band][skill])
-        
-        return bank
-    except Exception as e:
-        logger.error(f"Error in load_question_bank for job_id={job_id}: {str(e)}")
-        raise
+def get_session_state(attempt_id):
+    """Fetch the live session state, upgrading states saved with a materialized question bank."""
+    state = session_store.get(attempt_id)
+    if state is not None and 'question_bank' in state:
+        state.pop('question_bank')
+        state['asked_questions'] = [q['mcq_id'] for q in state['asked_questions']]
+        state.setdefault('seed', random.getrandbits(32))
+    return state
 
 def divide_experience_range(jd_range):
     """Divide job experience range into three bands."""
@@ -112,42 +96,16 @@ def get_base_band(candidate_exp, jd_range):
         logger.error(f"Error in get_base_band for candidate_exp={candidate_exp}, jd_range={jd_range}: {str(e)}")
         raise
 
-def compare_images(snapshot_path, candidate_image_path):
-    """Compare snapshot with candidate's profile image using DeepFace."""
-    try:
-        snapshot_path = os.path.normpath(snapshot_path)
-        candidate_image_path = os.path.normpath(candidate_image_path)
-
-        if not os.path.exists(snapshot_path):
-            return False, f"Snapshot file does not exist: {snapshot_path}"
-        if not os.path.exists(candidate_image_path):
-            return False, f"Candidate profile image does not exist: {candidate_image_path}"
-
-        try:
-            DeepFace.extract_faces(img_path=snapshot_path, enforce_detection=False)
-            DeepFace.extract_faces(img_path=candidate_image_path, enforce_detection=False)
-        except Exception as e:
-            return False, f"No valid human face detected: {str(e)}. Consider checking image quality or camera setup."
-
-        result = DeepFace.verify(
-            img1_path=candidate_image_path,
-            img2_path=snapshot_path,
-            model_name="SFace",
-            enforce_detection=False
-        )
-        if result['verified']:
-            return True, f"✅ Faces match (distance={result['distance']:.4f}, threshold={result['threshold']:.4f})"
-        else:
-            return False, f"❌ Faces do NOT match (distance={result['distance']:.4f}, threshold={result['threshold']:.4f})"
-    except Exception as e:
-        return False, f"Face verification failed: {str(e)}"
-
 def save_assessment_state(attempt_id, state):
-    """Save assessment state to database."""
+    """Save assessment state to the shared session store and the database."""
+    session_store.save(attempt_id, state)
+    if session_store.persists_to_db:
+        return
     try:
         assessment_state = AssessmentState.query.get(attempt_id)
         if assessment_state:
             assessment_state.state = state
+            flag_modified(assessment_state, 'state')
         else:
             assessment_state = AssessmentState(attempt_id=attempt_id, state=state)
             db.session.add(assessment_state)
@@ -209,17 +167,13 @@ def start_assessment_session(attempt_id):
         candidate_experience = candidate.years_of_experience or 0
         jd_experience_range = f"{job.experience_min}-{job.experience_max}"
 
-        question_bank = load_question_bank(job.job_id)
-        if not any(bank for band in question_bank.values() for bank in band.values()):
+        question_bank = get_bank_snapshot(job.job_id)
+        if question_bank.is_empty():
             logger.error(f"No questions available for job_id={job.job_id}")
             return jsonify({'error': 'No questions available for this job'}), 400
 
         base_band = get_base_band(candidate_experience, jd_experience_range)
-        priority_sum = sum(jd_priorities.values()) or 1
-        questions_per_skill = {
-            skill: max(1, round((priority / priority_sum) * total_questions))
-            for skill, priority in jd_priorities.items()
-        }
+        questions_per_skill = split_questions(jd_priorities, total_questions)
         current_band_per_skill = {
             skill: proficiency_to_band.get(candidate_proficiency_per_skill.get(skill, "mid"), base_band)
             for skill in jd_priorities
@@ -235,13 +189,15 @@ def start_assessment_session(attempt_id):
             "accuracy_percent": 0.0
         } for skill in jd_priorities}
 
-        assessment_state = AssessmentState.query.get(attempt_id)
-        if assessment_state:
-            assessment_states[attempt_id] = assessment_state.state
-        else:
-            assessment_states[attempt_id] = {
+        state = get_session_state(attempt_id)
+        # Restored with its pending deltas: saving a snapshot drops every event up to its version
+        saved_state = load_saved_state(attempt_id) if state is None else None
+        if saved_state:
+            session_store.save(attempt_id, saved_state)
+        elif state is None:
+            state = {
                 'job_id': job.job_id,
-                'question_bank': question_bank,
+                'seed': random.getrandbits(32),
                 'questions_per_skill': questions_per_skill,
                 'current_band_per_skill': current_band_per_skill,
                 'initial_band_per_skill': initial_band_per_skill,
@@ -262,7 +218,7 @@ def start_assessment_session(attempt_id):
                     "termination_reason": ""
                 }
             }
-            save_assessment_state(attempt_id, assessment_states[attempt_id])
+            save_assessment_state(attempt_id, state)
 
         return jsonify({
             'total_questions': total_questions,
@@ -299,11 +255,12 @@ def capture_snapshot(attempt_id):
         snapshot_path = os.path.join(SNAPSHOT_DIR, snapshot_filename)
         snapshot_file.save(snapshot_path)
 
-        if attempt_id not in assessment_states:
+        state = get_session_state(attempt_id)
+        if state is None:
             logger.error(f"Assessment session not found for attempt_id={attempt_id}")
             return jsonify({'error': 'Assessment session not found'}), 404
 
-        proctoring_data = assessment_states[attempt_id].get('proctoring_data', {
+        proctoring_data = state.get('proctoring_data', {
             "snapshots": [],
             "tab_switches": 0,
             "fullscreen_warnings": 0,
@@ -317,8 +274,8 @@ def capture_snapshot(attempt_id):
         }
         proctoring_data["snapshots"].append(snapshot_entry)
         proctoring_data["remarks"].append(f"Snapshot captured at | {snapshot_entry['timestamp']} | {snapshot_entry['path']}")
-        assessment_states[attempt_id]['proctoring_data'] = proctoring_data
-        save_assessment_state(attempt_id, assessment_states[attempt_id])
+        state['proctoring_data'] = proctoring_data
+        save_assessment_state(attempt_id, state)
         logger.debug(f"Updated proctoring_data for attempt_id={attempt_id}: {proctoring_data}")
 
         return jsonify({'message': 'Snapshot captured successfully'}), 200
@@ -330,11 +287,11 @@ def capture_snapshot(attempt_id):
 def get_next_question(attempt_id):
     """Retrieve the next question for the assessment."""
     try:
-        if attempt_id not in assessment_states:
+        state = get_session_state(attempt_id)
+        if state is None:
             logger.error(f"Assessment session not found for attempt_id={attempt_id}")
             return jsonify({'error': 'Assessment session not found'}), 404
 
-        state = assessment_states[attempt_id]
         question_count = state['question_count']
         total_questions = state['total_questions']
         test_duration = state['test_duration']
@@ -343,7 +300,7 @@ def get_next_question(attempt_id):
         job_id = state['job_id']
         job_description = state.get('job_description', "")
         custom_prompt = state.get('custom_prompt', "")
-        used_mcq_ids = [q['mcq_id'] for q in state['asked_questions']]
+        used_mcq_ids = list(state['asked_questions'])
 
         elapsed_time = datetime.utcnow().timestamp() - start_time
         if question_count >= total_questions or elapsed_time >= test_duration:
@@ -362,7 +319,9 @@ def get_next_question(attempt_id):
             attempt.status = 'completed'
             db.session.commit()
             save_assessment_state(attempt_id, state)
-            del assessment_states[attempt_id]
+            session_store.delete(attempt_id)
+            clear_prefetched_questions(attempt_id)
+            record_exposure(state['asked_questions'])
 
             return jsonify({
                 'message': 'Assessment completed',
@@ -373,18 +332,22 @@ def get_next_question(attempt_id):
         required_skills = RequiredSkill.query.filter_by(job_id=job_id).join(Skill, Skill.skill_id == RequiredSkill.skill_id).all()
         jd_priorities = {rs.skill.name: rs.priority for rs in required_skills}
         sorted_skills = sorted(questions_per_skill.items(), key=lambda x: -jd_priorities.get(x[0], 0))
+        question_bank = get_bank_snapshot(job_id)
         for skill, remaining in sorted_skills:
             if remaining <= 0:
                 continue
 
             band = state['current_band_per_skill'][skill]
-            available = [
-                q for q in state['question_bank'].get(band, {}).get(skill, [])
-                if q['mcq_id'] not in used_mcq_ids
-            ]
 
             question = None
-            if question_count > 0:
+            # Prefetch only runs when the reservoir is off
+            if question_count > 0 and not RESERVOIR_ENABLED:
+                question = take_prefetched_question(attempt_id, job_id, skill, band, used_mcq_ids)
+            if not question:
+                question = question_bank.next_question(band, skill, state['seed'], used_mcq_ids)
+            # The reservoir normally keeps buckets stocked; an empty one (failed or pending
+            # refill) falls back to real-time generation rather than skewing the skill split
+            if not question:
                 try:
                     logger.debug(f"Generating question for skill={skill}, band={band}, attempt_id={attempt_id}")
                     question_data = generate_single_question(skill, band, job_id, job_description, used_question_ids=used_mcq_ids)
@@ -400,18 +363,21 @@ def get_next_question(attempt_id):
                             ],
                             "answer": question_data[f"option_{question_data['correct_answer'].lower()}"]
                         }
-                        state['question_bank'].setdefault(band, {}).setdefault(skill, []).append(question)
                 except (timeout_decorator.TimeoutError, google.api_core.exceptions.GoogleAPIError) as e:
-                    logger.warning(f"Real-time question generation failed for {skill} ({band}): {str(e)}. Falling back to database.")
-
-            if not question and available:
-                question = available.pop(0)
+                    logger.warning(f"Real-time question generation failed for {skill} ({band}): {str(e)}.")
 
             if question:
                 state['questions_per_skill'][skill] -= 1
                 state['question_count'] += 1
-                state['asked_questions'].append(question)
+                state['asked_questions'].append(question['mcq_id'])
                 save_assessment_state(attempt_id, state)
+                if not RESERVOIR_ENABLED:
+                    schedule_prefetch(attempt_id, state, jd_priorities, skill)
+                try:
+                    question_reservoir.observe(state, question_bank)
+                except Exception as e:
+                    db.session.rollback()
+                    logger.warning(f"Reservoir check failed for job_id={job_id}: {str(e)}")
 
                 return jsonify({
                     'greeting': random.choice(GREETING_MESSAGES),
@@ -435,11 +401,11 @@ def get_next_question(attempt_id):
 def submit_answer(attempt_id):
     """Submit an answer and update performance log."""
     try:
-        if attempt_id not in assessment_states:
+        state = get_session_state(attempt_id)
+        if state is None:
             logger.error(f"Assessment session not found for attempt_id={attempt_id}")
             return jsonify({'error': 'Assessment session not found'}), 404
 
-        state = assessment_states[attempt_id]
         data = request.get_json()
         skill = data.get('skill')
         user_input = data.get('answer')
@@ -454,11 +420,11 @@ def submit_answer(attempt_id):
             logger.error(f"Invalid answer '{user_input}' for attempt_id={attempt_id}")
             return jsonify({'error': 'Invalid answer provided'}), 400
 
-        if not mcq_id or mcq_id not in [q['mcq_id'] for q in state['asked_questions']]:
+        question = get_question(state['job_id'], mcq_id) if mcq_id in state['asked_questions'] else None
+        if not mcq_id or not question:
             logger.error(f"Invalid mcq_id '{mcq_id}' for attempt_id={attempt_id}")
             return jsonify({'error': 'Invalid mcq_id provided'}), 400
 
-        question = next(q for q in state['asked_questions'] if q['mcq_id'] == mcq_id)
         band = state['current_band_per_skill'][skill]
         
         input_map = {1: 'A', 2: 'B', 3: 'C', 4: 'D'}
@@ -500,11 +466,11 @@ def submit_answer(attempt_id):
 def end_assessment(attempt_id):
     """End the assessment, process proctoring data, and save results."""
     try:
-        if attempt_id not in assessment_states:
+        state = get_session_state(attempt_id)
+        if state is None:
             logger.error(f"Assessment session not found for attempt_id={attempt_id}")
             return jsonify({'error': 'Assessment session not found'}), 404
 
-        state = assessment_states[attempt_id]
         data = request.get_json()
         proctoring_data_in = data.get('proctoring_data', {})
         logger.debug(f"Received proctoring_data for attempt_id={attempt_id}: {proctoring_data_in}")
@@ -530,21 +496,8 @@ def end_assessment(attempt_id):
             logger.error(f"AssessmentAttempt not found for attempt_id={attempt_id}")
             return jsonify({'error': 'Assessment attempt not found'}), 404
 
-        candidate = Candidate.query.get(attempt.candidate_id)
-        if candidate.profile_picture:
-            profile_image_path = os.path.normpath(os.path.join(PROJECT_ROOT, candidate.profile_picture))
-            for snapshot in proctoring_data["snapshots"]:
-                snapshot_path = os.path.normpath(os.path.join(PROJECT_ROOT, snapshot["path"]))
-                is_match, remark = compare_images(snapshot_path, profile_image_path)
-                proctoring_data["remarks"].append(f"Snapshot at {snapshot['timestamp']}: {remark}")
-                snapshot["is_valid"] = is_match
-                # try:
-                #     if os.path.exists(snapshot_path):
-                #         os.remove(snapshot_path)
-                # except Exception as e:
-                #     logger.error(f"Failed to delete snapshot {snapshot_path}: {str(e)}")
-        else:
-            proctoring_data["remarks"].append("No candidate profile image available for comparison")
+        # Snapshots are verified by a background job once the attempt is saved
+        proctoring_data["verification"] = {"status": "pending"}
 
         performance_log = state['performance_log']
         for skill in performance_log:
@@ -559,19 +512,51 @@ def end_assessment(attempt_id):
         attempt.status = 'completed'
         db.session.commit()
         save_assessment_state(attempt_id, state)
-        del assessment_states[attempt_id]
+        session_store.delete(attempt_id)
+        clear_prefetched_questions(attempt_id)
+        record_exposure(state['asked_questions'])
+        verification_job = enqueue_face_verification(attempt_id, len(proctoring_data["snapshots"]))
 
         return jsonify({
             'message': 'Assessment completed',
             'candidate_report': performance_log,
             'proctoring_data': proctoring_data,
-            'total_questions': state['total_questions']
+            'total_questions': state['total_questions'],
+            'verification_job_id': verification_job.job_id
         }), 200
     except Exception as e:
         logger.error(f"Error in end_assessment for attempt_id={attempt_id}: {str(e)}")
         db.session.rollback()
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
+@assessment_api_bp.route('/verification/<int:job_id>', methods=['GET'])
+def get_verification_status(job_id):
+    """Report progress of a proctoring face-verification job."""
+    try:
+        if 'user_id' not in session:
+            logger.error("No user_id found in session")
+            return jsonify({'error': 'Unauthorized: No user session found'}), 401
+
+        user_id = session['user_id']
+        candidate = Candidate.query.filter_by(user_id=user_id).first_or_404()
+        job = get_job(job_id)
+        if not job or job.kind != FACE_VERIFICATION_JOB:
+            logger.error(f"Face verification job not found for job_id={job_id}")
+            return jsonify({'error': 'Verification job not found'}), 404
+
+        attempt = AssessmentAttempt.query.get(job.payload.get('attempt_id'))
+        if not attempt or attempt.candidate_id != candidate.candidate_id:
+            logger.error(f"Unauthorized access to verification job_id={job_id} by user_id={user_id}")
+            return jsonify({'error': 'Unauthorized'}), 403
+
+        return jsonify({
+            'attempt_id': job.payload.get('attempt_id'),
+            **job.to_dict()
+        }), 200
+    except Exception as e:
+        logger.error(f"Error in get_verification_status for job_id={job_id}: {str(e)}")
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
 @assessment_api_bp.route('/results/<int:attempt_id>', methods=['GET'])
 def get_assessment_results(attempt_id):
     """Retrieve assessment results for a candidate."""
@@ -655,4 +640,22 @@ def get_candidate_assessments():
         }), 200
     except Exception as e:
         logger.error(f"Error in get_candidate_assessments for user_id={user_id}: {str(e)}")
-        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
\ No newline at end of file
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+@assessment_api_bp.route('/llm-metrics', methods=['GET'])
+def get_llm_metrics():
+    """In-flight real-time LLM calls, outcomes, circuit breaker, coalescing and scheduler queue stats for this worker."""
+    if 'user_id' not in session or session.get('role') != 'recruiter':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify({
+        **llm_executor.metrics(),
+        'coalescing': question_coalescer.metrics(),
+        'scheduler': llm_scheduler.metrics()
+    }), 200
+
+@assessment_api_bp.route('/db-pool-metrics', methods=['GET'])
+def get_db_pool_metrics():
+    """Connection pool checkout waits, hold times and timeouts for this worker."""
+    if 'user_id' not in session or session.get('role') != 'recruiter':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return jsonify(get_pool_metrics(db.engine)), 200
@@ -5,6 +5,7 @@ from app.models.candidate import Candidate
 from app.models.recruiter import Recruiter
 from app.models.login_log import LoginLog
 from app.config import Config
+from app.services.db_pool import release_connection
 from flask_mail import Message
 from datetime import datetime, timedelta
 from geopy.distance import geodesic
@@ -273,9 +274,12 @@ def forgot_password():
         Quizzer
         """
     )
+    email = user.email
+    # Don't hold a pooled connection while the SMTP server responds
+    release_connection()
     try:
         mail.send(msg)
-        print(f"📧 Password reset link sent to {user.email}")
+        print(f"📧 Password reset link sent to {email}")
         return jsonify({'message': 'If an account exists for this email, a reset link has been sent.'}), 200
     except Exception as e:
         db.session.delete(reset_token)
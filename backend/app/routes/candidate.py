@@ -2,7 +2,8 @@ from flask import Blueprint, jsonify, request
 import os
 import re
 import difflib
-from deepface import DeepFace
+import cv2
+import numpy as np
 from app import db
 from app.models.candidate import Candidate
 from app.models.job import JobDescription
@@ -16,10 +17,14 @@ from app.models.degree import Degree
 from app.models.degree_branch import DegreeBranch
 from app.models.resume_json import ResumeJson
 from app.models.recruiter import Recruiter
+from app.services.face_embeddings import enqueue_reference_embeddings
+from app.services.inference import embed_face, verify_face
 from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timezone
 import pytz
 import google.generativeai as genai
+from app.services.llm_scheduler import llm_scheduler, PROFILE_PARSING
+from app.services.db_pool import release_connection
 import logging
 from io import BytesIO
 from pdfminer.high_level import extract_text
@@ -117,7 +122,8 @@ Extract information from the resume as follows:
 Resume:
 {resume_text}
         """
-        response = model.generate_content(prompt)
+        with llm_scheduler.slot(PROFILE_PARSING):
+            response = model.generate_content(prompt)
         return response.text
     except Exception as e:
         return None
@@ -272,33 +278,28 @@ def infer_proficiency(skill, work_experience, education, projects):
         proficiency = 4
     return proficiency
 
+def _decode_upload(file):
+    return cv2.imdecode(np.frombuffer(file.read(), dtype=np.uint8), cv2.IMREAD_COLOR)
+
 def verify_faces(profile_pic_file, webcam_image_file):
     """Verify if the faces in the two images match with at least 70% similarity."""
     try:
-        profile_pic_path = f"app/static/uploads/temp_profile_{datetime.now(timezone.utc).timestamp()}.jpg"
-        webcam_image_path = f"app/static/uploads/temp_webcam_{datetime.now(timezone.utc).timestamp()}.jpg"
-
-        profile_pic_file.save(profile_pic_path)
-        webcam_image_file.save(webcam_image_path)
-
-        result = DeepFace.verify(
-            img1_path=profile_pic_path,
-            img2_path=webcam_image_path,
-            model_name='Facenet',
-            distance_metric='cosine',
-            enforce_detection=True
-        )
+        profile_pic = _decode_upload(profile_pic_file)
+        webcam_image = _decode_upload(webcam_image_file)
+        if profile_pic is None or webcam_image is None:
+            raise ValueError("Could not decode uploaded image")
 
-        os.remove(profile_pic_path)
-        os.remove(webcam_image_path)
+        reference_embedding = embed_face(profile_pic, model_name='Facenet')
+        result = verify_face(webcam_image, reference_embedding, model_name='Facenet') if reference_embedding is not None else None
+        if result is None:
+            raise ValueError("Face could not be detected in one of the images")
 
-        verified = result['verified']
         distance = result['distance']
         similarity_percentage = (1 - distance) * 100
         print(f"Face verification: {similarity_percentage:.2f}% similarity")
-        print(f"Face verification {'successful' if verified and distance <= 0.4 else 'failed'}")
+        print(f"Face verification {'successful' if result['verified'] else 'failed'}")
         return {
-            'verified': verified and distance <= 0.4,
+            'verified': result['verified'],
             'similarity': round(similarity_percentage, 2)
         }
     except Exception as e:
@@ -397,6 +398,9 @@ def update_profile(user_id):
     if form_degree_branch and not DegreeBranch.query.get(form_degree_branch):
         return jsonify({'error': 'Invalid degree branch selected.'}), 400
 
+    # Face verification and resume parsing can take seconds; don't hold a pooled connection through them
+    release_connection()
+
     try:
         face_verification_result = None
 
@@ -535,6 +539,14 @@ def update_profile(user_id):
         db.session.add(candidate)
         db.session.commit()
 
+        # Reference face embeddings are computed once per image, off the request
+        updated_images = [source for source, file in (('profile_picture', profile_pic_file), ('camera_image', webcam_image_file)) if file]
+        if updated_images:
+            try:
+                enqueue_reference_embeddings(candidate.candidate_id, updated_images)
+            except Exception as e:
+                logger.error(f"Failed to queue face embeddings for candidate_id={candidate.candidate_id}: {str(e)}")
+
         logger.debug(f"✅ Profile updated successfully for candidate_id={candidate.candidate_id}")
         return jsonify({
             'message': 'Profile updated successfully',
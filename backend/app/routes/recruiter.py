@@ -11,7 +11,8 @@ from app.models.candidate_skill import CandidateSkill
 from app.models.assessment_attempt import AssessmentAttempt
 from app.models.degree import Degree
 from app.models.degree_branch import DegreeBranch
-from app.services import question_batches
+from app.services.question_bank import BAND_ORDER
+from app.services.bank_generation import enqueue_bank_generation, get_bank_progress, is_generation_active, start_bank_generation
 from sqlalchemy import and_
 from sqlalchemy.orm import joinedload
 from datetime import datetime, timezone, timedelta
@@ -179,19 +180,16 @@ def create_assessment():
             )
             db.session.add(required_skill)
         db.session.commit()
+        generation_job_id = None
         try:
-            skills_with_priorities = [
-                {'name': skill_data['name'], 'priority': priority_map[skill_data['priority'].lower()]}
-                for skill_data in data['skills']
-            ]
-            jd_experience_range = f"{experience_min}-{experience_max}"
-            question_batches.prepare_question_batches(
-                skills_with_priorities, jd_experience_range, assessment.job_id, assessment.custom_prompt
-            )
+            generation_job_id = enqueue_bank_generation(assessment).job_id
         except Exception as e:
-            logger.warning(f"Failed to generate question batches for job_id={assessment.job_id}: {str(e)}")
-            pass
-        return jsonify({'message': 'Assessment created successfully', 'job_id': assessment.job_id}), 201
+            logger.warning(f"Failed to queue question bank generation for job_id={assessment.job_id}: {str(e)}")
+        return jsonify({
+            'message': 'Assessment created successfully',
+            'job_id': assessment.job_id,
+            'generation_job_id': generation_job_id
+        }), 201
     except ValueError as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
@@ -199,6 +197,55 @@ def create_assessment():
         db.session.rollback()
         return jsonify({'error': f'Failed to create assessment: {str(e)}'}), 500
 
+def _get_recruiter_job(job_id):
+    """Return (job, error_response) for a job owned by the logged-in recruiter."""
+    if 'user_id' not in session or session.get('role') != 'recruiter':
+        return None, (jsonify({'error': 'Unauthorized'}), 401)
+    recruiter = Recruiter.query.filter_by(user_id=session['user_id']).first()
+    job = JobDescription.query.get(job_id)
+    if not job:
+        return None, (jsonify({'error': 'Assessment not found'}), 404)
+    if not recruiter or job.recruiter_id != recruiter.recruiter_id:
+        return None, (jsonify({'error': 'Unauthorized access to assessment'}), 403)
+    return job, None
+
+@recruiter_api_bp.route('/assessments/<int:job_id>/question-bank', methods=['GET'])
+def get_question_bank_progress(job_id):
+    """Question bank generation progress: batches per skill and band, failures and ETA."""
+    job, error = _get_recruiter_job(job_id)
+    if error:
+        return error
+    return jsonify(get_bank_progress(job.job_id)), 200
+
+@recruiter_api_bp.route('/assessments/<int:job_id>/question-bank', methods=['POST'])
+def generate_question_bank(job_id):
+    """Retry the failed batches of the last generation run, or extend the bank with more questions."""
+    job, error = _get_recruiter_job(job_id)
+    if error:
+        return error
+    data = request.json or {}
+    action = data.get('action', 'retry')
+    if action not in ('retry', 'extend'):
+        return jsonify({'error': "Action must be 'retry' or 'extend'"}), 400
+    skill_names = {rs.skill.name for rs in job.required_skills}
+    skills = data.get('skills')
+    bands = data.get('bands')
+    if skills and not set(skills) <= skill_names:
+        return jsonify({'error': f"Skills must be among the assessment's skills: {sorted(skill_names)}"}), 400
+    if bands and not set(bands) <= set(BAND_ORDER):
+        return jsonify({'error': f"Bands must be among {BAND_ORDER}"}), 400
+    if is_generation_active(job.job_id):
+        return jsonify({'error': 'Question bank generation is already in progress'}), 409
+    try:
+        bank_job = start_bank_generation(job.job_id, action, skills=skills, bands=bands)
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Failed to queue question bank generation for job_id={job_id}: {str(e)}")
+        return jsonify({'error': f'Failed to queue question bank generation: {str(e)}'}), 500
+    if bank_job is None:
+        return jsonify({'message': 'No failed batches to retry'}), 200
+    return jsonify({'message': 'Question bank generation queued', 'generation_job_id': bank_job.job_id}), 202
+
 @recruiter_api_bp.route('/assessments/<int:user_id>', methods=['GET'])
 def get_assessments_by_id(user_id):
     if 'user_id' not in session or session['role'] != 'recruiter':
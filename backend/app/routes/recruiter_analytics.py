@@ -6,6 +6,7 @@ from app.models.candidate import Candidate
 from app.models.assessment_registration import AssessmentRegistration
 from app.models.assessment_attempt import AssessmentAttempt
 from flask_mail import Message
+from app.services.db_pool import release_connection
 
 recruiter_analytics_api_bp = Blueprint('recruiter_analytics_api', __name__, url_prefix='/api/recruiter/analytics')
 
@@ -103,6 +104,8 @@ def block_candidate(candidate_id):
             recipients=[candidate.email],
             body=f'Your account has been suspended due to the following reason: {reason}. Please contact support for further details.'
         )
+        # Don't hold a pooled connection while the SMTP server responds
+        release_connection()
         mail.send(msg)
     except Exception as e:
         return jsonify({'error': f'Candidate blocked, but failed to send email: {str(e)}'}), 500
@@ -164,6 +167,12 @@ def get_jobs():
         'created_at': j.created_at.isoformat() if j.created_at else None
     } for j in jobs]), 200
 
+def registered_candidate_emails(job_id):
+    """(candidate_id, email) for every candidate registered for a job, in one query."""
+    return db.session.query(Candidate.candidate_id, Candidate.email).join(
+        AssessmentRegistration, AssessmentRegistration.candidate_id == Candidate.candidate_id
+    ).filter(AssessmentRegistration.job_id == job_id).all()
+
 @recruiter_analytics_api_bp.route('/job/suspend/<int:job_id>', methods=['POST'])
 def suspend_job(job_id):
     """Suspend a job with a reason and notify registered candidates."""
@@ -185,18 +194,19 @@ def suspend_job(job_id):
     job.suspension_reason = reason
     db.session.commit()
 
-    registrations = AssessmentRegistration.query.filter_by(job_id=job_id).all()
-    for reg in registrations:
-        candidate = Candidate.query.get(reg.candidate_id)
+    recipients = registered_candidate_emails(job_id)
+    job_title = job.job_title
+    release_connection()
+    for candidate_id, email in recipients:
         try:
             msg = Message(
                 subject='Job Suspension Notification',
-                recipients=[candidate.email],
-                body=f'The job "{job.job_title}" has been suspended due to: {reason}. We apologize for any inconvenience.'
+                recipients=[email],
+                body=f'The job "{job_title}" has been suspended due to: {reason}. We apologize for any inconvenience.'
             )
             mail.send(msg)
         except Exception as e:
-            return jsonify({'error': f'Job suspended, but failed to send email to candidate {candidate.candidate_id}: {str(e)}'}), 500
+            return jsonify({'error': f'Job suspended, but failed to send email to candidate {candidate_id}: {str(e)}'}), 500
 
     return jsonify({'message': 'Job suspended successfully'}), 200
 
@@ -214,18 +224,19 @@ def delete_job(job_id):
     if job.recruiter_id != recruiter.recruiter_id:
         return jsonify({'error': 'Unauthorized access'}), 403
 
-    registrations = AssessmentRegistration.query.filter_by(job_id=job_id).all()
-    for reg in registrations:
-        candidate = Candidate.query.get(reg.candidate_id)
+    recipients = registered_candidate_emails(job_id)
+    job_title = job.job_title
+    release_connection()
+    for candidate_id, email in recipients:
         try:
             msg = Message(
                 subject='Job Deletion Notification',
-                recipients=[candidate.email],
-                body=f'The job "{job.job_title}" has been deleted. Please contact the recruiter for more details.'
+                recipients=[email],
+                body=f'The job "{job_title}" has been deleted. Please contact the recruiter for more details.'
             )
             mail.send(msg)
         except Exception as e:
-            return jsonify({'error': f'Job deleted, but failed to send email to candidate {candidate.candidate_id}: {str(e)}'}), 500
+            return jsonify({'error': f'Job deleted, but failed to send email to candidate {candidate_id}: {str(e)}'}), 500
 
     db.session.delete(job)
     db.session.commit()
@@ -244,12 +255,13 @@ def notify_shortlisted():
     data = request.get_json()
     candidate_ids = data.get('candidate_ids', [])
 
-    for candidate_id in candidate_ids:
-        candidate = Candidate.query.get_or_404(candidate_id)
+    recipients = [(candidate_id, Candidate.query.get_or_404(candidate_id).email) for candidate_id in candidate_ids]
+    release_connection()
+    for candidate_id, email in recipients:
         try:
             msg = Message(
                 subject='Shortlist Notification',
-                recipients=[candidate.email],
+                recipients=[email],
                 body=f'Congratulations! You have been shortlisted for a job opportunity. Please check your dashboard for further details.'
             )
             mail.send(msg)
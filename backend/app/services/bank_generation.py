@@ -0,0 +1,145 @@
+import logging
+from datetime import datetime
+from sqlalchemy import func
+from app import db
+from app.models.mcq import MCQ
+from app.models.skill import Skill
+from app.models.job import JobDescription
+from app.models.required_skill import RequiredSkill
+from app.models.background_job import BackgroundJob
+from app.services.job_queue import job_handler, enqueue_job, update_job_progress, is_lease_expired
+from app.services.question_batches import prepare_question_batches
+from app.services.question_bank import BAND_ORDER
+from app.services.question_pool import job_pool_tags
+
+logger = logging.getLogger(__name__)
+
+QUESTION_BANK_JOB = "question_bank"
+
+def get_skills_with_priorities(job_id):
+    required_skills = RequiredSkill.query.filter_by(job_id=job_id).all()
+    return [{'name': rs.skill.name, 'priority': rs.priority} for rs in required_skills]
+
+def _initial_progress(batches):
+    progress = {'total_batches': len(batches), 'completed_batches': 0, 'failed_batches': 0, 'questions': 0, 'batches': {}}
+    for skill_name, band in batches:
+        progress['batches'].setdefault(skill_name, {})[band] = {'status': 'pending', 'questions': 0}
+    return progress
+
+def enqueue_bank_generation(job, batches=None, mode="build", batch_sizes=None):
+    """Queue generation of a job's question bank, or of the given (skill_name, band) batches.
+
+    `batch_sizes` optionally maps (skill_name, band) to how many questions that batch should add.
+    """
+    skills = get_skills_with_priorities(job.job_id)
+    if batches is None:
+        batches = [(skill['name'], band) for skill in skills for band in BAND_ORDER]
+    return enqueue_job(
+        QUESTION_BANK_JOB,
+        {
+            'job_id': job.job_id,
+            'mode': mode,
+            'skills': skills,
+            'batches': [list(batch) for batch in batches],
+            'experience_range': f"{job.experience_min}-{job.experience_max}",
+            'job_description': job.custom_prompt or "",
+            'pool_tags': job_pool_tags(job),
+            'tenant': f"recruiter:{job.recruiter_id}",
+            'batch_sizes': [[skill_name, band, size] for (skill_name, band), size in (batch_sizes or {}).items()]
+        },
+        progress=_initial_progress(batches)
+    )
+
+def get_latest_bank_job(job_id):
+    return BackgroundJob.query.filter(
+        BackgroundJob.kind == QUESTION_BANK_JOB,
+        BackgroundJob.payload['job_id'].astext == str(job_id)
+    ).order_by(BackgroundJob.created_at.desc()).first()
+
+def get_failed_batches(bank_job):
+    batches = (bank_job.progress or {}).get('batches', {})
+    return [
+        (skill_name, band)
+        for skill_name, bands in batches.items()
+        for band, batch in bands.items()
+        if batch.get('status') != 'completed'
+    ]
+
+@job_handler(QUESTION_BANK_JOB)
+def generate_question_bank(job, payload):
+    """Generate the requested batches of a job's question bank, reporting each as it finishes."""
+    batches = {tuple(batch) for batch in payload['batches']}
+    progress = _initial_progress(sorted(batches))
+    update_job_progress(job, **progress)
+
+    def on_batch(skill_name, band, status, questions, error):
+        batch = progress['batches'][skill_name][band]
+        batch['status'] = status
+        batch['questions'] = questions
+        if error:
+            batch['error'] = error
+        if status == 'completed':
+            progress['completed_batches'] += 1
+            progress['questions'] += questions
+        elif status == 'failed':
+            progress['failed_batches'] += 1
+        update_job_progress(job, **progress)
+
+    throughput = prepare_question_batches(
+        payload['skills'],
+        payload['experience_range'],
+        payload['job_id'],
+        payload.get('job_description', ""),
+        batches=batches,
+        progress_callback=on_batch,
+        pool_tags=payload.get('pool_tags'),
+        batch_sizes={(skill_name, band): size for skill_name, band, size in payload.get('batch_sizes', [])},
+        tenant=payload.get('tenant')
+    )
+    update_job_progress(job, throughput=throughput)
+    if progress['failed_batches'] and not progress['completed_batches']:
+        # Nothing succeeded (provider outage, quota): let the queue retry the run
+        raise RuntimeError(f"All {progress['failed_batches']} question batches failed for job_id={payload['job_id']}")
+    return {'questions': progress['questions'], 'failed_batches': progress['failed_batches'], 'throughput': throughput}
+
+def get_bank_progress(job_id):
+    """Generation status of a job's question bank: latest run's progress, ETA and stored counts."""
+    bank_job = get_latest_bank_job(job_id)
+    counts = db.session.query(Skill.name, MCQ.difficulty_band, func.count(MCQ.mcq_id)).join(
+        Skill, MCQ.skill_id == Skill.skill_id
+    ).filter(MCQ.job_id == job_id).group_by(Skill.name, MCQ.difficulty_band).all()
+    stored = {}
+    for skill_name, band, count in counts:
+        stored.setdefault(skill_name, {})[band] = count
+
+    response = {'job_id': job_id, 'stored_questions': stored, 'generation': None}
+    if bank_job is None:
+        return response
+    progress = bank_job.progress or {}
+    eta_seconds = None
+    finished = progress.get('completed_batches', 0) + progress.get('failed_batches', 0)
+    if bank_job.status == 'running' and bank_job.started_at and finished:
+        elapsed = (datetime.utcnow() - bank_job.started_at).total_seconds()
+        eta_seconds = round(elapsed / finished * (progress.get('total_batches', 0) - finished), 1)
+    response['generation'] = {**bank_job.to_dict(), 'mode': (bank_job.payload or {}).get('mode'), 'eta_seconds': eta_seconds}
+    return response
+
+def is_generation_active(job_id):
+    """A run is queued or running; one whose lease expired no longer counts."""
+    bank_job = get_latest_bank_job(job_id)
+    if bank_job is None or is_lease_expired(bank_job):
+        return False
+    return bank_job.status in ('queued', 'running')
+
+def start_bank_generation(job_id, action, skills=None, bands=None):
+    """Retry the unfinished batches of the latest run, or extend the bank with more questions."""
+    job = JobDescription.query.get(job_id)
+    if action == 'retry':
+        bank_job = get_latest_bank_job(job_id)
+        batches = get_failed_batches(bank_job) if bank_job else None
+        if bank_job and not batches:
+            return None
+        return enqueue_bank_generation(job, batches=batches, mode='retry')
+    skill_names = skills or [skill['name'] for skill in get_skills_with_priorities(job_id)]
+    batches = [(skill_name, band) for skill_name in skill_names for band in (bands or BAND_ORDER)]
+    return enqueue_bank_generation(job, batches=batches, mode='extend')
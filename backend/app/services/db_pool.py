@@ -0,0 +1,152 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Connections held longer than this are logged with the thread that held them
+DB_SLOW_CHECKOUT_SECONDS = float(os.getenv("DB_SLOW_CHECKOUT_SECONDS", 2.0))
+
+class PoolStats:
+    """How long requests wait for a pooled connection and how long they hold one."""
+
+    def __init__(self, size=1000):
+        self.waits = deque(maxlen=size)
+        self.holds = deque(maxlen=size)
+        self.counts = {"checkouts": 0, "checked_out": 0, "timeouts": 0, "slow_checkouts": 0}
+        self.lock = threading.Lock()
+
+    def record_wait(self, seconds, timed_out=False):
+        with self.lock:
+            self.waits.append(seconds)
+            if timed_out:
+                self.counts["timeouts"] += 1
+
+    def record_checkout(self):
+        with self.lock:
+            self.counts["checkouts"] += 1
+            self.counts["checked_out"] += 1
+
+    def record_checkin(self, held):
+        with self.lock:
+            self.counts["checked_out"] -= 1
+            self.holds.append(held)
+            if held >= DB_SLOW_CHECKOUT_SECONDS:
+                self.counts["slow_checkouts"] += 1
+        if held >= DB_SLOW_CHECKOUT_SECONDS:
+            logger.warning(f"DB connection held for {held:.2f}s by {threading.current_thread().name}")
+
+    @staticmethod
+    def _summary(samples):
+        if not samples:
+            return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "avg": round(sum(ordered) / len(ordered), 4),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+            "max": round(ordered[-1], 4)
+        }
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                **self.counts,
+                "wait_seconds": self._summary(self.waits),
+                "held_seconds": self._summary(self.holds)
+            }
+
+pool_stats = PoolStats()
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection."""
+
+    def _do_get(self):
+        started = time.monotonic()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            pool_stats.record_wait(time.monotonic() - started, timed_out=True)
+            raise
+        pool_stats.record_wait(time.monotonic() - started)
+        return connection
+
+@event.listens_for(InstrumentedQueuePool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checked_out_at"] = time.monotonic()
+    pool_stats.record_checkout()
+
+@event.listens_for(InstrumentedQueuePool, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    checked_out_at = connection_record.info.pop("checked_out_at", None)
+    if checked_out_at is not None:
+        pool_stats.record_checkin(time.monotonic() - checked_out_at)
+
+# The current transaction has written something: flushed ORM changes or a DML
+# statement run through session.execute (bulk inserts, updates, deletes)
+WROTE_KEY = "db_pool_wrote"
+
+@event.listens_for(Session, "after_flush")
+def _on_flush(session, flush_context):
+    session.info[WROTE_KEY] = True
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info[WROTE_KEY] = True
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _on_transaction_end(session):
+    session.info.pop(WROTE_KEY, None)
+
+def mark_written(session):
+    """Flag writes the events above cannot see, e.g. raw cursor COPY."""
+    session.info[WROTE_KEY] = True
+
+def engine_options():
+    return {
+        "poolclass": InstrumentedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": True
+    }
+
+def get_pool_metrics(engine):
+    pool = engine.pool
+    return {
+        **pool_stats.snapshot(),
+        "pool_size": pool.size(),
+        "idle": pool.checkedin(),
+        "overflow": pool.overflow(),
+        "status": pool.status()
+    }
+
+def release_connection():
+    """Return the session's connection to the pool before a slow external call.
+
+    Ends the read-only transaction without expiring loaded objects, so they
+    stay usable; the next query checks out a connection again. A transaction
+    that has written anything, flushed or not, is left alone, since releasing
+    would commit it early.
+    """
+    from app import db
+    session = db.session()
+    if session.new or session.dirty or session.deleted or session.info.get(WROTE_KEY):
+        logger.debug("Not releasing DB connection: transaction has uncommitted writes")
+        return False
+    expire_on_commit = session.expire_on_commit
+    session.expire_on_commit = False
+    try:
+        session.commit()
+    finally:
+        session.expire_on_commit = expire_on_commit
+    return True
@@ -0,0 +1,115 @@
+import os
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FACE_BATCH_SIZE = int(os.getenv("FACE_BATCH_SIZE", 16))
+FACE_BATCH_WORKERS = int(os.getenv("FACE_BATCH_WORKERS", 1))
+FACE_DETECTOR_BACKEND = os.getenv("FACE_DETECTOR_BACKEND", "opencv")
+
+_models = {}
+
+def get_model(model_name):
+    """Build a DeepFace recognition model once per process."""
+    if model_name not in _models:
+        from deepface import DeepFace
+        _models[model_name] = DeepFace.build_model(model_name)
+    return _models[model_name]
+
+def load_face(image_path, model_name, detector_backend=FACE_DETECTOR_BACKEND):
+    """Decode an image and return its most confident face, preprocessed for the model, or None."""
+    from deepface import DeepFace
+    from deepface.modules import preprocessing
+    img = cv2.imread(image_path)
+    if img is None:
+        return None
+    faces = DeepFace.extract_faces(img_path=img, detector_backend=detector_backend, enforce_detection=False, align=True)
+    faces = [face for face in faces if face.get("confidence", 0) > 0]
+    if not faces:
+        return None
+    face = max(faces, key=lambda f: f["confidence"])["face"]
+    # Same preprocessing DeepFace.represent applies before model.forward
+    face = face[:, :, ::-1]
+    target_size = get_model(model_name).input_shape
+    face = preprocessing.resize_image(img=face, target_size=(target_size[1], target_size[0]))
+    return preprocessing.normalize_input(img=face, normalization="base")
+
+def _forward_batch(model, batch):
+    """Run a batch through the model, one image at a time if the model only embeds the first."""
+    embeddings = np.asarray(model.forward(batch), dtype=np.float32)
+    if embeddings.ndim == 2 and embeddings.shape[0] == batch.shape[0]:
+        return embeddings
+    return np.stack([np.asarray(model.forward(batch[i:i + 1]), dtype=np.float32).reshape(-1) for i in range(batch.shape[0])])
+
+def _embed_chunk(paths, model_name, batch_size, detector_backend):
+    """Embed a list of images. Rows for images without a face are NaN."""
+    model = get_model(model_name)
+    faces = [load_face(path, model_name, detector_backend) if os.path.exists(path) else None for path in paths]
+    found = [i for i, face in enumerate(faces) if face is not None]
+    embeddings = None
+    for start in range(0, len(found), batch_size):
+        indices = found[start:start + batch_size]
+        batch = np.concatenate([faces[i] for i in indices], axis=0)
+        vectors = _forward_batch(model, batch)
+        if embeddings is None:
+            embeddings = np.full((len(paths), vectors.shape[1]), np.nan, dtype=np.float32)
+        embeddings[indices] = vectors
+    if embeddings is None:
+        embeddings = np.full((len(paths), 1), np.nan, dtype=np.float32)
+    return embeddings
+
+def embed_images(paths, model_name="SFace", batch_size=FACE_BATCH_SIZE, workers=FACE_BATCH_WORKERS,
+                 detector_backend=FACE_DETECTOR_BACKEND, progress_callback=None):
+    """Embed many images in model batches, optionally split across a process pool.
+
+    Returns an (n, d) float32 matrix; rows for images without a usable face are NaN.
+    """
+    paths = list(paths)
+    if not paths:
+        return np.empty((0, 0), dtype=np.float32)
+    if workers <= 1:
+        chunks = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+        results, processed = [], 0
+        for chunk in chunks:
+            results.append(_embed_chunk(chunk, model_name, batch_size, detector_backend))
+            processed += len(chunk)
+            if progress_callback:
+                progress_callback(processed)
+        return _stack(results)
+
+    chunk_size = max(batch_size, -(-len(paths) // workers))
+    chunks = [paths[i:i + chunk_size] for i in range(0, len(paths), chunk_size)]
+    results = [None] * len(chunks)
+    processed = 0
+    # spawn keeps TensorFlow state out of forked children
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        futures = {
+            pool.submit(_embed_chunk, chunk, model_name, batch_size, detector_backend): index
+            for index, chunk in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            processed += len(chunks[index])
+            if progress_callback:
+                progress_callback(processed)
+    return _stack(results)
+
+def _stack(results):
+    width = max(result.shape[1] for result in results)
+    padded = [
+        result if result.shape[1] == width else np.full((result.shape[0], width), np.nan, dtype=np.float32)
+        for result in results
+    ]
+    return np.concatenate(padded, axis=0)
+
+def cosine_distances(embeddings, reference):
+    """Cosine distance from every row of `embeddings` to `reference` as one matrix operation."""
+    reference = np.asarray(reference, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(reference)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return 1 - (embeddings @ reference) / norms
@@ -0,0 +1,121 @@
+import os
+import hashlib
+import logging
+import numpy as np
+from app import db
+from app.models.candidate import Candidate
+from app.models.candidate_face_embedding import CandidateFaceEmbedding
+from app.services.job_queue import job_handler, enqueue_job
+from app.services.face_batch import cosine_distances
+from app.services.inference import COSINE_THRESHOLDS, embed_face, embed_faces
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static', 'uploads'))
+
+EMBEDDING_MODELS = ("SFace", "Facenet")
+PROCTORING_MODEL = "SFace"
+
+FACE_EMBEDDING_JOB = "face_embedding"
+
+def hash_image(image_path):
+    with open(image_path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def compute_embedding(image_path, model_name=PROCTORING_MODEL):
+    """Detect the most prominent face in an image and return its embedding as float32."""
+    return embed_face(image_path, model_name)
+
+def cosine_distance(a, b):
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    denominator = np.linalg.norm(a) * np.linalg.norm(b)
+    if denominator == 0:
+        return 1.0
+    return float(1 - np.dot(a, b) / denominator)
+
+def _image_path(candidate, source):
+    relative_path = getattr(candidate, source, None)
+    if not relative_path:
+        return None
+    image_path = os.path.normpath(os.path.join(PROJECT_ROOT, relative_path))
+    return image_path if os.path.exists(image_path) else None
+
+def store_reference_embeddings(candidate, source, models=EMBEDDING_MODELS):
+    """Embed a candidate's profile_picture or camera_image once per model, keyed by image hash."""
+    image_path = _image_path(candidate, source)
+    if not image_path:
+        return {}
+    image_hash = hash_image(image_path)
+    embeddings = {}
+    for model_name in models:
+        row = CandidateFaceEmbedding.query.get((candidate.candidate_id, source, model_name))
+        if row and row.image_hash == image_hash:
+            embeddings[model_name] = np.frombuffer(row.embedding, dtype=np.float32)
+            continue
+        embedding = compute_embedding(image_path, model_name)
+        if embedding is None:
+            logger.warning(f"No face found in {source} for candidate_id={candidate.candidate_id}")
+            continue
+        db.session.merge(CandidateFaceEmbedding(
+            candidate_id=candidate.candidate_id,
+            source=source,
+            model_name=model_name,
+            image_hash=image_hash,
+            embedding=embedding.tobytes()
+        ))
+        embeddings[model_name] = embedding
+    db.session.commit()
+    return embeddings
+
+def get_reference_embedding(candidate, source="profile_picture", model_name=PROCTORING_MODEL):
+    """Return the stored reference embedding, computing it if missing or the image changed."""
+    return store_reference_embeddings(candidate, source, models=(model_name,)).get(model_name)
+
+def verify_snapshot(snapshot_path, reference_embedding, model_name=PROCTORING_MODEL):
+    """Embed only the snapshot and compare it with the stored reference embedding."""
+    try:
+        if not os.path.exists(snapshot_path):
+            return False, f"Snapshot file does not exist: {snapshot_path}"
+        embedding = compute_embedding(snapshot_path, model_name)
+        if embedding is None:
+            return False, "No valid human face detected. Consider checking image quality or camera setup."
+        distance = cosine_distance(reference_embedding, embedding)
+        threshold = COSINE_THRESHOLDS[model_name]
+        if distance <= threshold:
+            return True, f"✅ Faces match (distance={distance:.4f}, threshold={threshold:.4f})"
+        return False, f"❌ Faces do NOT match (distance={distance:.4f}, threshold={threshold:.4f})"
+    except Exception as e:
+        return False, f"Face verification failed: {str(e)}"
+
+def verify_snapshots(snapshot_paths, reference_embedding, model_name=PROCTORING_MODEL, progress_callback=None):
+    """Batched verify_snapshot: embed all snapshots together and score them in one pass."""
+    if not snapshot_paths:
+        return []
+    embeddings = embed_faces(snapshot_paths, model_name=model_name, progress_callback=progress_callback)
+    distances = cosine_distances(embeddings, reference_embedding)
+    threshold = COSINE_THRESHOLDS[model_name]
+    verdicts = []
+    for path, distance in zip(snapshot_paths, distances):
+        if not os.path.exists(path):
+            verdicts.append((False, f"Snapshot file does not exist: {path}"))
+        elif np.isnan(distance):
+            verdicts.append((False, "No valid human face detected. Consider checking image quality or camera setup."))
+        elif distance <= threshold:
+            verdicts.append((True, f"✅ Faces match (distance={distance:.4f}, threshold={threshold:.4f})"))
+        else:
+            verdicts.append((False, f"❌ Faces do NOT match (distance={distance:.4f}, threshold={threshold:.4f})"))
+    return verdicts
+
+def enqueue_reference_embeddings(candidate_id, sources):
+    return enqueue_job(FACE_EMBEDDING_JOB, {'candidate_id': candidate_id, 'sources': list(sources)})
+
+@job_handler(FACE_EMBEDDING_JOB)
+def compute_candidate_embeddings(job, payload):
+    candidate = Candidate.query.get(payload['candidate_id'])
+    if not candidate:
+        raise ValueError(f"Candidate not found: {payload['candidate_id']}")
+    stored = {}
+    for source in payload.get('sources', []):
+        stored[source] = sorted(store_reference_embeddings(candidate, source))
+    return stored
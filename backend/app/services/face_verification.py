@@ -0,0 +1,89 @@
+import os
+import logging
+from sqlalchemy.orm.attributes import flag_modified
+from app import db
+from app.models.candidate import Candidate
+from app.models.assessment_attempt import AssessmentAttempt
+from app.services.job_queue import job_handler, enqueue_job, update_job_progress
+from app.services.face_embeddings import get_reference_embedding, verify_snapshots
+from app.services.frame_filter import classify_frames, NEEDS_VERIFICATION, DUPLICATE
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'static', 'uploads'))
+
+FACE_VERIFICATION_JOB = "face_verification"
+
+def enqueue_face_verification(attempt_id, snapshot_count):
+    """Queue verification of an attempt's snapshots and return the job."""
+    return enqueue_job(
+        FACE_VERIFICATION_JOB,
+        {'attempt_id': attempt_id},
+        progress={'total': snapshot_count, 'processed': 0, 'matched': 0}
+    )
+
+@job_handler(FACE_VERIFICATION_JOB)
+def verify_attempt_snapshots(job, payload):
+    """Compare every snapshot of an attempt with the candidate's profile picture."""
+    attempt_id = payload['attempt_id']
+    attempt = AssessmentAttempt.query.get(attempt_id)
+    if not attempt:
+        raise ValueError(f"Assessment attempt not found: {attempt_id}")
+    candidate = Candidate.query.get(attempt.candidate_id)
+
+    performance_log = dict(attempt.performance_log or {})
+    proctoring_data = performance_log.get('proctoring_data', {})
+    snapshots = proctoring_data.get('snapshots', [])
+    remarks = []
+    matched = 0
+
+    reference_embedding = get_reference_embedding(candidate) if candidate and candidate.profile_picture else None
+    if candidate and candidate.profile_picture and reference_embedding is None:
+        remarks.append("No valid human face detected in the candidate profile image")
+    elif reference_embedding is not None:
+        snapshot_paths = [os.path.normpath(os.path.join(PROJECT_ROOT, snapshot["path"])) for snapshot in snapshots]
+        frames = classify_frames(snapshot_paths)
+        to_verify = [index for index, frame in enumerate(frames) if frame["class"] == NEEDS_VERIFICATION]
+        update_job_progress(job, total=len(snapshots), to_verify=len(to_verify), filtered=len(snapshots) - len(to_verify))
+        verdicts = dict(zip(to_verify, verify_snapshots(
+            [snapshot_paths[index] for index in to_verify],
+            reference_embedding,
+            progress_callback=lambda processed: update_job_progress(job, processed=processed)
+        )))
+        for index, (snapshot, frame) in enumerate(zip(snapshots, frames)):
+            if frame["class"] == NEEDS_VERIFICATION:
+                is_match, remark = verdicts[index]
+                if frame["reason"] == "multiple_faces_detected":
+                    # Someone else in frame is flagged even when the candidate's face matches
+                    remark = f"{remark} (pre-check: {frame['faces']} faces detected in frame)"
+                elif not is_match and frame["reason"] != "single_face":
+                    # The pre-filter's hint explains the verifier's verdict, it never replaces it
+                    remark = f"{remark} (pre-check: {frame['reason'].replace('_', ' ')})"
+            elif frame["class"] == DUPLICATE and frame.get("duplicate_of") in verdicts:
+                is_match, remark = verdicts[frame["duplicate_of"]]
+                remark = f"{remark} (duplicate of snapshot at {snapshots[frame['duplicate_of']]['timestamp']})"
+            else:
+                is_match, remark = False, "No valid human face detected. Consider checking image quality or camera setup."
+            remarks.append(f"Snapshot at {snapshot['timestamp']}: {remark}")
+            snapshot["is_valid"] = is_match
+            snapshot["frame_class"] = frame["class"]
+            snapshot["pre_check"] = frame["reason"]
+            snapshot["faces"] = frame.get("faces")
+            matched += int(is_match)
+        update_job_progress(job, processed=len(to_verify), matched=matched)
+    else:
+        remarks.append("No candidate profile image available for comparison")
+
+    # Re-read the attempt so the verdicts land on its latest performance log
+    attempt = AssessmentAttempt.query.get(attempt_id)
+    performance_log = dict(attempt.performance_log or {})
+    proctoring_data = performance_log.get('proctoring_data', {})
+    proctoring_data['snapshots'] = snapshots
+    proctoring_data['remarks'] = proctoring_data.get('remarks', []) + remarks
+    proctoring_data['verification'] = {'job_id': job.job_id, 'status': 'completed'}
+    performance_log['proctoring_data'] = proctoring_data
+    attempt.performance_log = performance_log
+    flag_modified(attempt, 'performance_log')
+    db.session.commit()
+    logger.debug(f"Face verification finished for attempt_id={attempt_id}: {matched}/{len(snapshots)} snapshots matched")
+    return {'total': len(snapshots), 'matched': matched}
@@ -26,10 +26,8 @@ def parse_question_block(block):
     }
 
 
-def fix_file(path):
-    with open(path, "r") as f:
-        raw_text = f.read()
-
+def fix_text(raw_text):
+    """Recover question dicts from a raw batch file's text."""
     # More robust block extraction using regex
     raw_text = raw_text.replace("python\n[", "").replace("]", "")
     question_blocks = re.findall(r'"(.*?)",\s*"(.*?)",\s*"(.*?)",?', raw_text, re.DOTALL)
@@ -42,6 +40,12 @@ def fix_file(path):
             fixed_questions.append(parsed)
         except IndexError as e: # Add error handling
             print(f"Error processing block: {block}, Error: {e}")
+    return fixed_questions
+
+
+def fix_file(path):
+    with open(path, "r") as f:
+        fixed_questions = fix_text(f.read())
 
     with open(path, "w") as f:
         json.dump(fixed_questions, f, indent=2)
@@ -55,4 +59,5 @@ def fix_all_batches():
             fix_file(os.path.join(folder, file))
     print("✅ All question files fixed.")
 
-fix_all_batches()
\ No newline at end of file
+if __name__ == "__main__":
+    fix_all_batches()
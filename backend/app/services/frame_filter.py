@@ -0,0 +1,100 @@
+import os
+import logging
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Frames darker than this mean pixel value, or with a Laplacian variance below
+# the blur threshold, are flagged as low quality. They still go to DeepFace,
+# which decides; the flags only explain a failed verification.
+FRAME_MIN_BRIGHTNESS = float(os.getenv("FRAME_MIN_BRIGHTNESS", 40))
+FRAME_MIN_SHARPNESS = float(os.getenv("FRAME_MIN_SHARPNESS", 60))
+# Max Hamming distance between 64-bit dHashes for two frames to count as the same
+FRAME_DUPLICATE_DISTANCE = int(os.getenv("FRAME_DUPLICATE_DISTANCE", 5))
+FRAME_DETECT_WIDTH = int(os.getenv("FRAME_DETECT_WIDTH", 320))
+
+UNREADABLE = "unreadable"
+DUPLICATE = "duplicate"
+NEEDS_VERIFICATION = "needs_verification"
+
+_cascade = None
+
+def get_face_cascade():
+    global _cascade
+    if _cascade is None:
+        _cascade = cv2.CascadeClassifier(os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml"))
+    return _cascade
+
+def frame_hash(gray):
+    """64-bit difference hash of a grayscale frame, as a hex string."""
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return f"{int(''.join('1' if bit else '0' for bit in bits), 2):016x}"
+
+def hash_distance(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+def count_faces(gray):
+    """Count frontal faces with a Haar cascade on a downscaled copy of the frame."""
+    if gray.shape[1] > FRAME_DETECT_WIDTH:
+        scale = FRAME_DETECT_WIDTH / gray.shape[1]
+        gray = cv2.resize(gray, (FRAME_DETECT_WIDTH, int(gray.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    min_size = max(24, gray.shape[1] // 10)
+    faces = get_face_cascade().detectMultiScale(
+        cv2.equalizeHist(gray), scaleFactor=1.1, minNeighbors=5, minSize=(min_size, min_size)
+    )
+    return len(faces)
+
+def classify_frame(image_path, previous_hash=None):
+    """Classify a snapshot as unreadable, duplicate or needs_verification.
+
+    Returns a dict with the class, a reason and the metrics behind it. Only
+    unreadable files and repeats of the previous verified frame are skipped;
+    brightness, sharpness and the Haar face count are hints recorded with
+    frames that go to the DeepFace verifier, never a verdict of their own.
+    """
+    img = cv2.imread(image_path) if os.path.exists(image_path) else None
+    if img is None:
+        return {"class": UNREADABLE, "reason": "unreadable"}
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    brightness = float(np.mean(gray))
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_64F).var())
+    result = {"brightness": round(brightness, 1), "sharpness": round(sharpness, 1), "hash": frame_hash(gray)}
+
+    if previous_hash and hash_distance(result["hash"], previous_hash) <= FRAME_DUPLICATE_DISTANCE:
+        return {**result, "class": DUPLICATE, "reason": "same_as_previous"}
+
+    result["faces"] = count_faces(gray)
+    if brightness < FRAME_MIN_BRIGHTNESS:
+        reason = "too_dark"
+    elif sharpness < FRAME_MIN_SHARPNESS:
+        reason = "too_blurry"
+    elif result["faces"] == 0:
+        reason = "no_face_detected"
+    elif result["faces"] > 1:
+        reason = "multiple_faces_detected"
+    else:
+        reason = "single_face"
+    return {**result, "class": NEEDS_VERIFICATION, "reason": reason}
+
+def classify_frames(image_paths):
+    """Classify a sequence of frames, deduplicating each against the last frame sent for verification.
+
+    Returns one result per path; duplicates carry `duplicate_of`, the index of
+    the verified frame they repeat.
+    """
+    results = []
+    previous_hash, previous_index = None, None
+    for index, image_path in enumerate(image_paths):
+        result = classify_frame(image_path, previous_hash)
+        if result["class"] == DUPLICATE:
+            result["duplicate_of"] = previous_index
+        elif result["class"] == NEEDS_VERIFICATION:
+            previous_hash, previous_index = result["hash"], index
+        results.append(result)
+    counts = {}
+    for result in results:
+        counts[result["class"]] = counts.get(result["class"], 0) + 1
+    logger.debug(f"Pre-filtered {len(results)} frames: {counts}")
+    return results
@@ -0,0 +1,247 @@
+import os
+import stat
+import queue
+import logging
+import threading
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client, Listener
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# "local" loads models inside the calling process (one copy per web worker),
+# "server" sends requests to `python inference_server.py`, which loads each
+# model once for every worker on the host.
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "local")
+# The socket lives in a directory only the server's user can enter
+INFERENCE_SOCKET = os.getenv(
+    "INFERENCE_SOCKET", os.path.join(os.path.expanduser("~"), ".assessment-inference", "inference.sock")
+)
+# Shared secret for the socket handshake; requests are pickled, so there is no default
+INFERENCE_AUTHKEY = os.getenv("INFERENCE_AUTHKEY")
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", 64))
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", 1))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", 60))
+
+TEXT_MODEL = "all-MiniLM-L6-v2"
+# DeepFace's cosine thresholds for these models
+COSINE_THRESHOLDS = {"SFace": 0.593, "Facenet": 0.40}
+
+class InferenceError(Exception):
+    pass
+
+class InferenceBusy(InferenceError):
+    """The server's request queue is full."""
+
+if INFERENCE_BACKEND == "server" and not INFERENCE_AUTHKEY:
+    raise ValueError("INFERENCE_AUTHKEY environment variable not set")
+
+# ---------------------------------------------------------------------------
+# In-process implementations, used directly by the local backend and by the server
+# ---------------------------------------------------------------------------
+
+_text_model = None
+_text_model_lock = threading.Lock()
+
+def _get_text_model():
+    global _text_model
+    with _text_model_lock:
+        if _text_model is None:
+            from sentence_transformers import SentenceTransformer
+            _text_model = SentenceTransformer(TEXT_MODEL)
+    return _text_model
+
+def _embed_face(image, model_name):
+    from deepface import DeepFace
+    faces = DeepFace.represent(img_path=image, model_name=model_name, enforce_detection=False)
+    # Without detection DeepFace embeds the whole image at confidence 0 when it finds no face
+    faces = [face for face in faces if face.get("face_confidence", 0) > 0]
+    if not faces:
+        return None
+    face = max(faces, key=lambda f: f.get("face_confidence", 0))
+    return np.asarray(face["embedding"], dtype=np.float32)
+
+def _embed_faces(paths, model_name):
+    from app.services.face_batch import embed_images
+    return embed_images(paths, model_name=model_name, workers=1)
+
+def _embed_text(texts):
+    return np.asarray(_get_text_model().encode(texts), dtype=np.float32)
+
+def _cosine_distance(a, b):
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    denominator = np.linalg.norm(a) * np.linalg.norm(b)
+    if denominator == 0:
+        return 1.0
+    return float(1 - np.dot(a, b) / denominator)
+
+def _verify_face(image, reference_embedding, model_name):
+    embedding = _embed_face(image, model_name)
+    if embedding is None:
+        return None
+    distance = _cosine_distance(reference_embedding, embedding)
+    threshold = COSINE_THRESHOLDS[model_name]
+    return {"verified": distance <= threshold, "distance": distance, "threshold": threshold}
+
+# ---------------------------------------------------------------------------
+# Client
+# ---------------------------------------------------------------------------
+
+def _load_image(image):
+    if isinstance(image, np.ndarray):
+        return image
+    img = cv2.imread(image)
+    if img is None:
+        raise InferenceError(f"Could not read image: {image}")
+    return img
+
+def _call(method, args, image=None):
+    """Send one request to the inference server, passing `image` through shared memory."""
+    segment = None
+    try:
+        if image is not None:
+            image = np.ascontiguousarray(image)
+            segment = shared_memory.SharedMemory(create=True, size=image.nbytes)
+            np.ndarray(image.shape, dtype=image.dtype, buffer=segment.buf)[:] = image
+            args = {**args, "image": (segment.name, image.shape, image.dtype.str)}
+        with Client(INFERENCE_SOCKET, family="AF_UNIX", authkey=INFERENCE_AUTHKEY.encode()) as conn:
+            conn.send((method, args))
+            if not conn.poll(INFERENCE_TIMEOUT):
+                raise InferenceError(f"Inference server did not answer {method} within {INFERENCE_TIMEOUT}s")
+            status, result = conn.recv()
+    except (ConnectionRefusedError, FileNotFoundError) as e:
+        raise InferenceError(f"Inference server unavailable at {INFERENCE_SOCKET}: {str(e)}")
+    finally:
+        if segment is not None:
+            segment.close()
+            segment.unlink()
+    if status == "busy":
+        raise InferenceBusy(result)
+    if status != "ok":
+        raise InferenceError(result)
+    return result
+
+def embed_face(image, model_name="SFace"):
+    """Embedding of the most confident face in an image (path or BGR array), or None."""
+    if INFERENCE_BACKEND != "server":
+        return _embed_face(_load_image(image), model_name)
+    return _call("embed_face", {"model_name": model_name}, image=_load_image(image))
+
+def embed_faces(paths, model_name="SFace", progress_callback=None):
+    """Batch-embed image files; rows without a usable face are NaN."""
+    if INFERENCE_BACKEND != "server":
+        from app.services.face_batch import embed_images
+        return embed_images(paths, model_name=model_name, progress_callback=progress_callback)
+    # The server runs on the same host, so it reads the files itself
+    embeddings = _call("embed_faces", {"paths": [os.path.abspath(p) for p in paths], "model_name": model_name})
+    if progress_callback:
+        progress_callback(len(paths))
+    return embeddings
+
+def verify_face(image, reference_embedding, model_name="SFace"):
+    """Compare the face in an image with a reference embedding.
+
+    Returns {'verified', 'distance', 'threshold'}, or None when no face is found.
+    """
+    reference_embedding = np.asarray(reference_embedding, dtype=np.float32)
+    if INFERENCE_BACKEND != "server":
+        return _verify_face(_load_image(image), reference_embedding, model_name)
+    return _call("verify_face", {"reference_embedding": reference_embedding, "model_name": model_name}, image=_load_image(image))
+
+def embed_text(texts):
+    """Sentence embeddings for a string or list of strings."""
+    if INFERENCE_BACKEND != "server":
+        return _embed_text(texts)
+    return _call("embed_text", {"texts": texts})
+
+# ---------------------------------------------------------------------------
+# Server
+# ---------------------------------------------------------------------------
+
+def _read_image(spec):
+    name, shape, dtype = spec
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf).copy()
+    finally:
+        segment.close()
+
+def _handle(method, args):
+    if method == "embed_face":
+        return _embed_face(_read_image(args["image"]), args["model_name"])
+    if method == "embed_faces":
+        return _embed_faces(args["paths"], args["model_name"])
+    if method == "verify_face":
+        return _verify_face(_read_image(args["image"]), args["reference_embedding"], args["model_name"])
+    if method == "embed_text":
+        return _embed_text(args["texts"])
+    raise InferenceError(f"Unknown inference method: {method}")
+
+def _model_loop(requests):
+    while True:
+        conn, method, args = requests.get()
+        try:
+            conn.send(("ok", _handle(method, args)))
+        except Exception as e:
+            logger.error(f"Inference {method} failed: {str(e)}")
+            try:
+                conn.send(("error", str(e)))
+            except OSError:
+                pass
+        finally:
+            conn.close()
+            requests.task_done()
+
+def _read_request(conn, requests):
+    try:
+        method, args = conn.recv()
+        # Bounded queue: reject instead of piling up work the models cannot keep up with
+        requests.put_nowait((conn, method, args))
+    except queue.Full:
+        conn.send(("busy", f"Inference queue full ({INFERENCE_QUEUE_SIZE} requests)"))
+        conn.close()
+    except (EOFError, OSError):
+        conn.close()
+
+def _prepare_socket_dir(path):
+    """Create the socket directory as 0700 and refuse one another user owns or can enter."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise InferenceError(f"Inference socket directory {path} is not a directory owned by this user")
+    if stat.S_IMODE(info.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+
+def serve(address=INFERENCE_SOCKET, queue_size=INFERENCE_QUEUE_SIZE, threads=INFERENCE_THREADS, preload=("SFace",)):
+    """Load the models once and answer embed/verify requests from every local worker."""
+    if not INFERENCE_AUTHKEY:
+        raise ValueError("INFERENCE_AUTHKEY environment variable not set")
+    _prepare_socket_dir(os.path.dirname(address))
+    if os.path.exists(address):
+        os.remove(address)
+    from app.services.face_batch import get_model
+    for model_name in preload:
+        get_model(model_name)
+    _get_text_model()
+
+    requests = queue.Queue(maxsize=queue_size)
+    for i in range(threads):
+        threading.Thread(target=_model_loop, args=(requests,), name=f"inference-{i}", daemon=True).start()
+    # Socket file is created 0600 rather than chmod-ed after bind
+    previous_umask = os.umask(0o177)
+    try:
+        listener = Listener(address, family="AF_UNIX", authkey=INFERENCE_AUTHKEY.encode())
+    finally:
+        os.umask(previous_umask)
+    with listener:
+        logger.info(f"Inference server listening on {address} (queue={queue_size}, threads={threads})")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                # Bad authkey or a client that hung up during the handshake
+                logger.warning(f"Rejected inference connection: {str(e)}")
+                continue
+            threading.Thread(target=_read_request, args=(conn, requests), daemon=True).start()
@@ -0,0 +1,183 @@
+import os
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy import or_, and_
+from sqlalchemy.orm.attributes import flag_modified
+from app import db
+from app.models.background_job import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# "local" runs jobs on a thread pool inside the web process, "worker" leaves
+# them for `python worker.py`. Both claim rows with FOR UPDATE SKIP LOCKED.
+JOB_QUEUE_BACKEND = os.getenv("JOB_QUEUE_BACKEND", "local")
+JOB_QUEUE_LOCAL_WORKERS = int(os.getenv("JOB_QUEUE_LOCAL_WORKERS", 2))
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", 300))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+# Local backend: how often the web process picks up jobs left queued by a
+# restart or running under an expired lease
+JOB_RECLAIM_INTERVAL = float(os.getenv("JOB_RECLAIM_INTERVAL", 60))
+
+HANDLERS = {}
+
+_local_executor = None
+_local_running = 0
+_local_running_lock = threading.Lock()
+
+def job_handler(kind):
+    """Register a function(job, payload) as the handler for a job kind."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+def _get_local_executor():
+    global _local_executor
+    if _local_executor is None:
+        _local_executor = ThreadPoolExecutor(max_workers=JOB_QUEUE_LOCAL_WORKERS, thread_name_prefix="job-queue")
+    return _local_executor
+
+def enqueue_job(kind, payload, progress=None):
+    """Persist a job and, with the local backend, start it in the background."""
+    job = BackgroundJob(kind=kind, payload=payload, status='queued', progress=progress or {})
+    db.session.add(job)
+    db.session.commit()
+    if JOB_QUEUE_BACKEND == "local":
+        app = current_app._get_current_object()
+        _get_local_executor().submit(_run_local, app, job.job_id)
+    return job
+
+def _run_local(app, job_id, claimed=False):
+    global _local_running
+    with _local_running_lock:
+        _local_running += 1
+    try:
+        with app.app_context():
+            job = BackgroundJob.query.get(job_id) if claimed else claim_job(job_id=job_id)
+            if job:
+                run_job(job)
+    finally:
+        with _local_running_lock:
+            _local_running -= 1
+
+def reclaim_local_jobs(app):
+    """Claim orphaned jobs this process has handlers for, up to the free local workers. Returns how many."""
+    with _local_running_lock:
+        free = JOB_QUEUE_LOCAL_WORKERS - _local_running
+    claimed = 0
+    with app.app_context():
+        while claimed < free:
+            job = claim_job(kinds=list(HANDLERS))
+            if job is None:
+                break
+            logger.info(f"Reclaimed background job {job.job_id} ({job.kind}, attempt {job.attempts})")
+            _get_local_executor().submit(_run_local, app, job.job_id, True)
+            claimed += 1
+        db.session.remove()
+    return claimed
+
+def _reclaim_loop(app, interval):
+    while True:
+        try:
+            reclaim_local_jobs(app)
+        except Exception as e:
+            logger.error(f"Background job reclaim failed: {str(e)}")
+        time.sleep(interval)
+
+def start_local_reclaimer(app, interval=JOB_RECLAIM_INTERVAL):
+    """With the local backend, sweep for orphaned jobs now and every `interval` seconds.
+
+    Nothing else runs jobs queued before a restart or whose worker died,
+    since run_worker is only started for the worker backend.
+    """
+    if JOB_QUEUE_BACKEND != "local":
+        return None
+    thread = threading.Thread(target=_reclaim_loop, args=(app, interval), name="job-reclaim", daemon=True)
+    thread.start()
+    return thread
+
+def claim_job(job_id=None, kinds=None):
+    """Atomically take a queued job (or one whose lease expired) and mark it running."""
+    lease_expired = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    query = BackgroundJob.query.filter(
+        or_(
+            BackgroundJob.status == 'queued',
+            and_(BackgroundJob.status == 'running', BackgroundJob.heartbeat_at < lease_expired)
+        ),
+        BackgroundJob.attempts < JOB_MAX_ATTEMPTS
+    )
+    if job_id is not None:
+        query = query.filter(BackgroundJob.job_id == job_id)
+    if kinds:
+        query = query.filter(BackgroundJob.kind.in_(kinds))
+    try:
+        job = query.order_by(BackgroundJob.created_at).with_for_update(skip_locked=True).first()
+        if not job:
+            db.session.rollback()
+            return None
+        job.status = 'running'
+        job.attempts += 1
+        job.started_at = job.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+        return job
+    except Exception as e:
+        logger.error(f"Error claiming background job: {str(e)}")
+        db.session.rollback()
+        return None
+
+def is_lease_expired(job):
+    """True for a running job whose worker stopped heartbeating (e.g. the process restarted)."""
+    lease_expired = datetime.utcnow() - timedelta(seconds=JOB_LEASE_SECONDS)
+    return job.status == 'running' and (job.heartbeat_at is None or job.heartbeat_at < lease_expired)
+
+def update_job_progress(job, **progress):
+    """Merge progress fields into the job and refresh its lease."""
+    job.progress = {**(job.progress or {}), **progress}
+    flag_modified(job, 'progress')
+    job.heartbeat_at = datetime.utcnow()
+    db.session.commit()
+
+def run_job(job):
+    handler = HANDLERS.get(job.kind)
+    if handler is None:
+        logger.error(f"No handler registered for background job kind={job.kind}")
+        job.status = 'failed'
+        job.error = f"Unknown job kind: {job.kind}"
+        db.session.commit()
+        return
+    try:
+        result = handler(job, job.payload or {})
+        job = BackgroundJob.query.get(job.job_id)
+        job.status = 'completed'
+        job.result = result
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Background job {job.job_id} ({job.kind}) failed: {str(e)}")
+        db.session.rollback()
+        job = BackgroundJob.query.get(job.job_id)
+        job.status = 'failed' if job.attempts >= JOB_MAX_ATTEMPTS else 'queued'
+        job.error = str(e)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        if job.status == 'queued' and JOB_QUEUE_BACKEND == "local":
+            _get_local_executor().submit(_run_local, current_app._get_current_object(), job.job_id)
+
+def run_worker(app, kinds=None, poll_interval=2.0):
+    """Process jobs until interrupted. Run several of these for more throughput."""
+    with app.app_context():
+        logger.info(f"Background job worker started for kinds={kinds or sorted(HANDLERS)}")
+        while True:
+            job = claim_job(kinds=kinds)
+            if job is None:
+                db.session.remove()
+                time.sleep(poll_interval)
+                continue
+            run_job(job)
+
+def get_job(job_id):
+    return BackgroundJob.query.get(job_id)
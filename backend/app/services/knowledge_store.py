@@ -0,0 +1,238 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from app import db
+from app.models.knowledge_document import KnowledgeDocument, KnowledgeChunk
+from app.services.inference import embed_text
+from app.services.db_pool import release_connection
+
+logger = logging.getLogger(__name__)
+
+KNOWLEDGE_FIXTURE_DIR = os.getenv(
+    "KNOWLEDGE_FIXTURE_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'knowledge_fixtures'))
+)
+# Offline mode never touches the network: topics come from the DB or the fixture corpus only
+KNOWLEDGE_OFFLINE = os.getenv("KNOWLEDGE_OFFLINE", "False") == "True"
+KNOWLEDGE_INDEX_PATH = os.getenv("KNOWLEDGE_INDEX_PATH", "")
+KNOWLEDGE_FETCH_CONCURRENCY = int(os.getenv("KNOWLEDGE_FETCH_CONCURRENCY", 8))
+KNOWLEDGE_FETCH_TIMEOUT = float(os.getenv("KNOWLEDGE_FETCH_TIMEOUT", 10))
+KNOWLEDGE_CHUNK_CHARS = int(os.getenv("KNOWLEDGE_CHUNK_CHARS", 800))
+# Topics Wikipedia had no page for are retried after this long
+KNOWLEDGE_MISSING_TTL = int(os.getenv("KNOWLEDGE_MISSING_TTL", 7 * 24 * 60 * 60))
+
+WIKIPEDIA_API = "https://en.wikipedia.org/w/api.php"
+USER_AGENT = "MandviAIQuiz/1.0 (contact: mandvishukla20@gmail.com)"
+
+def normalize_topic(topic):
+    return topic.strip().lower()
+
+def chunk_text(text, max_chars=KNOWLEDGE_CHUNK_CHARS):
+    """Split text into paragraph-aligned chunks of at most about max_chars."""
+    chunks, current = [], ""
+    for paragraph in (p.strip() for p in re.split(r"\n\s*\n|\n", text)):
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 1 > max_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{paragraph}" if current else paragraph
+        while len(current) > max_chars:
+            cut = current.rfind(". ", 0, max_chars)
+            cut = cut + 1 if cut > 0 else max_chars
+            chunks.append(current[:cut].strip())
+            current = current[cut:].strip()
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _fixture_slug(topic):
+    return re.sub(r"[^a-z0-9]+", "_", normalize_topic(topic)).strip("_")
+
+def load_fixture(topic):
+    """Content for a topic from the local fixture corpus (<slug>.txt or <slug>.json), or None."""
+    slug = _fixture_slug(topic)
+    text_path = os.path.join(KNOWLEDGE_FIXTURE_DIR, f"{slug}.txt")
+    if os.path.exists(text_path):
+        with open(text_path, encoding="utf-8") as f:
+            return {"title": topic, "content": f.read().strip()}
+    json_path = os.path.join(KNOWLEDGE_FIXTURE_DIR, f"{slug}.json")
+    if os.path.exists(json_path):
+        with open(json_path, encoding="utf-8") as f:
+            data = json.load(f)
+        return {"title": data.get("title", topic), "content": data["content"].strip()}
+    return None
+
+async def _fetch_summary(session, semaphore, topic):
+    params = {
+        "action": "query", "prop": "extracts", "exintro": 1, "explaintext": 1,
+        "redirects": 1, "format": "json", "titles": topic
+    }
+    async with semaphore:
+        try:
+            async with session.get(WIKIPEDIA_API, params=params) as response:
+                response.raise_for_status()
+                data = await response.json()
+        except Exception as e:
+            logger.warning(f"Wikipedia fetch failed for {topic}: {str(e)}")
+            return topic, None
+    for page in data.get("query", {}).get("pages", {}).values():
+        if "missing" not in page and page.get("extract"):
+            return topic, {"title": page.get("title", topic), "content": page["extract"].strip()}
+    return topic, {}
+
+async def _fetch_summaries(topics):
+    import aiohttp
+    semaphore = asyncio.Semaphore(KNOWLEDGE_FETCH_CONCURRENCY)
+    timeout = aiohttp.ClientTimeout(total=KNOWLEDGE_FETCH_TIMEOUT)
+    async with aiohttp.ClientSession(timeout=timeout, headers={"User-Agent": USER_AGENT}) as session:
+        return dict(await asyncio.gather(*(_fetch_summary(session, semaphore, topic) for topic in topics)))
+
+def fetch_wikipedia_summaries(topics):
+    """Fetch intro extracts for many topics concurrently.
+
+    Maps each topic to {'title', 'content'}, to {} when Wikipedia has no page,
+    or to None when the fetch itself failed.
+    """
+    if not topics:
+        return {}
+    return asyncio.run(_fetch_summaries(list(topics)))
+
+def ensure_topics(topics):
+    """Make sure each topic is stored and embedded; return {topic: content} for those with content.
+
+    Stored topics cost nothing. Missing ones come from the fixture corpus or,
+    unless offline, from Wikipedia in one concurrent round. Needs an app context.
+    """
+    wanted = {normalize_topic(topic): topic for topic in topics if topic and topic.strip()}
+    if not wanted:
+        return {}
+    documents = {doc.topic: doc for doc in KnowledgeDocument.query.filter(KnowledgeDocument.topic.in_(list(wanted)))}
+    missing_cutoff = datetime.utcnow() - timedelta(seconds=KNOWLEDGE_MISSING_TTL)
+    to_fetch = [
+        key for key in wanted
+        if key not in documents or (documents[key].source == 'missing' and documents[key].fetched_at < missing_cutoff)
+    ]
+
+    found = {}
+    for key in to_fetch:
+        fixture = load_fixture(wanted[key])
+        if fixture:
+            found[key] = ("fixture", fixture)
+    remote = [key for key in to_fetch if key not in found]
+    if remote and not KNOWLEDGE_OFFLINE:
+        release_connection()
+        for topic, summary in fetch_wikipedia_summaries([wanted[key] for key in remote]).items():
+            if summary is not None:
+                found[normalize_topic(topic)] = ("wikipedia", summary)
+
+    new_chunks = []
+    for key, (source, summary) in found.items():
+        if key in documents:
+            db.session.delete(documents[key])
+            db.session.flush()
+        content = summary.get("content")
+        document = KnowledgeDocument(
+            topic=key,
+            title=summary.get("title"),
+            source=source if content else 'missing',
+            content=content,
+            content_hash=hashlib.sha256(content.encode()).hexdigest() if content else None,
+            fetched_at=datetime.utcnow()
+        )
+        db.session.add(document)
+        documents[key] = document
+        if content:
+            new_chunks.extend((key, position, text) for position, text in enumerate(chunk_text(content)))
+    if new_chunks:
+        embeddings = np.asarray(embed_text([text for _, _, text in new_chunks]), dtype=np.float32)
+        for (key, position, text), embedding in zip(new_chunks, embeddings):
+            db.session.add(KnowledgeChunk(topic=key, position=position, text=text, embedding=embedding.tobytes()))
+    if found:
+        db.session.commit()
+        logger.debug(f"Stored {len(found)} knowledge topics ({len(new_chunks)} chunks)")
+    return {wanted[key]: doc.content for key, doc in documents.items() if key in wanted and doc.content}
+
+class KnowledgeIndex:
+    """FAISS inner-product index over normalized chunk embeddings, keyed by chunk_id.
+
+    Chunks are append-only, so the index catches up by adding rows with a
+    chunk_id above the highest one it holds. With KNOWLEDGE_INDEX_PATH set the
+    index is saved after each sync and reloaded on start.
+    """
+
+    def __init__(self, path=KNOWLEDGE_INDEX_PATH):
+        self.path = path
+        self.index = None
+        self.max_chunk_id = 0
+        self.lock = threading.Lock()
+
+    def _load(self, dimension):
+        import faiss
+        if self.path and os.path.exists(self.path):
+            self.index = faiss.read_index(self.path)
+            ids = faiss.vector_to_array(self.index.id_map)
+            self.max_chunk_id = int(ids.max()) if len(ids) else 0
+        else:
+            self.index = faiss.IndexIDMap(faiss.IndexFlatIP(dimension))
+
+    def sync(self):
+        """Add chunks stored since the last sync. Needs an app context."""
+        with self.lock:
+            rows = KnowledgeChunk.query.filter(KnowledgeChunk.chunk_id > self.max_chunk_id).order_by(KnowledgeChunk.chunk_id).all()
+            if not rows:
+                return 0
+            vectors = np.stack([np.frombuffer(row.embedding, dtype=np.float32) for row in rows])
+            if self.index is None:
+                self._load(vectors.shape[1])
+                rows = [row for row in rows if row.chunk_id > self.max_chunk_id]
+                if not rows:
+                    return 0
+                vectors = np.stack([np.frombuffer(row.embedding, dtype=np.float32) for row in rows])
+            import faiss
+            vectors = np.ascontiguousarray(vectors)
+            faiss.normalize_L2(vectors)
+            self.index.add_with_ids(vectors, np.array([row.chunk_id for row in rows], dtype=np.int64))
+            self.max_chunk_id = rows[-1].chunk_id
+            if self.path:
+                faiss.write_index(self.index, self.path)
+            return len(rows)
+
+    def search(self, query, k=5, topics=None):
+        """Top-k chunks for a query as [{'topic', 'text', 'score'}], optionally limited to some topics."""
+        self.sync()
+        if self.index is None or self.index.ntotal == 0:
+            return []
+        import faiss
+        vector = np.asarray(embed_text([query]), dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        allowed = {normalize_topic(topic) for topic in topics} if topics else None
+        # Over-fetch when filtering by topic so k results usually survive the filter
+        with self.lock:
+            scores, ids = self.index.search(vector, min(self.index.ntotal, k * 4 if allowed else k))
+        hits = [(int(chunk_id), float(score)) for chunk_id, score in zip(ids[0], scores[0]) if chunk_id != -1]
+        chunks = {chunk.chunk_id: chunk for chunk in KnowledgeChunk.query.filter(KnowledgeChunk.chunk_id.in_([c for c, _ in hits]))}
+        results = []
+        for chunk_id, score in hits:
+            chunk = chunks.get(chunk_id)
+            if chunk is None or (allowed and chunk.topic not in allowed):
+                continue
+            results.append({'topic': chunk.topic, 'text': chunk.text, 'score': round(score, 4)})
+            if len(results) == k:
+                break
+        return results
+
+knowledge_index = KnowledgeIndex()
+
+def retrieve_passages(query, topics=None, k=5):
+    """Top-k grounding passages for a prompt, or [] if retrieval is unavailable."""
+    try:
+        return knowledge_index.search(query, k=k, topics=topics)
+    except Exception as e:
+        logger.warning(f"Knowledge retrieval failed for '{query}': {str(e)}")
+        return []
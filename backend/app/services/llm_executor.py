@@ -0,0 +1,165 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+logger = logging.getLogger(__name__)
+
+LLM_EXECUTOR_WORKERS = int(os.getenv("LLM_EXECUTOR_WORKERS", 8))
+# Calls beyond this many in flight are rejected instead of queueing behind a slow provider
+LLM_EXECUTOR_MAX_IN_FLIGHT = int(os.getenv("LLM_EXECUTOR_MAX_IN_FLIGHT", 16))
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", 20))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", 5))
+LLM_BREAKER_ERROR_RATE = float(os.getenv("LLM_BREAKER_ERROR_RATE", 0.5))
+LLM_BREAKER_LATENCY_BUDGET = float(os.getenv("LLM_BREAKER_LATENCY_BUDGET", 4.0))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", 30.0))
+
+class LLMCallError(Exception):
+    pass
+
+class DeadlineExceeded(LLMCallError):
+    pass
+
+class CircuitOpen(LLMCallError):
+    pass
+
+class ExecutorSaturated(LLMCallError):
+    pass
+
+class CircuitBreaker:
+    """Opens when the recent error rate or p95 latency exceeds its budget; probes again after a cooldown."""
+
+    def __init__(self, window=LLM_BREAKER_WINDOW, min_calls=LLM_BREAKER_MIN_CALLS, error_rate=LLM_BREAKER_ERROR_RATE,
+                 latency_budget=LLM_BREAKER_LATENCY_BUDGET, cooldown=LLM_BREAKER_COOLDOWN):
+        self.outcomes = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.latency_budget = latency_budget
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = None
+        self.trips = 0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def allow(self):
+        with self.lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = "half_open"
+            # Half-open lets a single probe through
+            if self.state == "half_open" and not self.probing:
+                self.probing = True
+                return True
+            return False
+
+    def record(self, ok, latency):
+        with self.lock:
+            if self.state == "half_open":
+                self.probing = False
+                if ok and latency <= self.latency_budget:
+                    self.state = "closed"
+                    self.outcomes.clear()
+                else:
+                    self._open()
+                return
+            self.outcomes.append((ok, latency))
+            if self.state == "closed" and len(self.outcomes) >= self.min_calls:
+                errors = sum(1 for outcome_ok, _ in self.outcomes if not outcome_ok)
+                latencies = sorted(latency for _, latency in self.outcomes)
+                p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+                if errors / len(self.outcomes) > self.error_rate or p95 > self.latency_budget:
+                    self._open()
+
+    def _open(self):
+        self.state = "open"
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning(f"LLM circuit breaker opened (trip {self.trips})")
+
+    def snapshot(self):
+        with self.lock:
+            errors = sum(1 for ok, _ in self.outcomes if not ok)
+            return {
+                "state": self.state,
+                "trips": self.trips,
+                "recent_calls": len(self.outcomes),
+                "recent_error_rate": round(errors / len(self.outcomes), 3) if self.outcomes else 0.0
+            }
+
+class LLMExecutor:
+    """Shared, bounded pool for outbound LLM calls with per-call deadlines.
+
+    Submitted functions must not touch the database: when a deadline passes
+    the caller moves on and the late result is simply dropped, so it can never
+    commit anything behind the caller's back.
+    """
+
+    def __init__(self, workers=LLM_EXECUTOR_WORKERS, max_in_flight=LLM_EXECUTOR_MAX_IN_FLIGHT, breaker=None):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-call")
+        self.slots = threading.BoundedSemaphore(max_in_flight)
+        self.breaker = breaker or CircuitBreaker()
+        self.lock = threading.Lock()
+        self.counts = {"in_flight": 0, "submitted": 0, "succeeded": 0, "failed": 0, "timed_out": 0,
+                       "late_discarded": 0, "rejected_saturated": 0, "rejected_open": 0}
+
+    def _count(self, key, delta=1):
+        with self.lock:
+            self.counts[key] += delta
+
+    def _run(self, fn, args, kwargs, started, abandoned):
+        try:
+            result = fn(*args, **kwargs)
+            self.breaker.record(True, time.monotonic() - started)
+            self._count("succeeded")
+            return result
+        except Exception:
+            self.breaker.record(False, time.monotonic() - started)
+            self._count("failed")
+            raise
+        finally:
+            if abandoned.is_set():
+                self._count("late_discarded")
+            self._count("in_flight", -1)
+            self.slots.release()
+
+    def call(self, fn, *args, deadline=None, **kwargs):
+        """Run fn in the pool and wait until `deadline` (a time.monotonic() value).
+
+        Raises CircuitOpen or ExecutorSaturated without calling fn, and
+        DeadlineExceeded when the result does not arrive in time.
+        """
+        if not self.breaker.allow():
+            self._count("rejected_open")
+            raise CircuitOpen("LLM circuit breaker is open")
+        if not self.slots.acquire(blocking=False):
+            self._count("rejected_saturated")
+            raise ExecutorSaturated(f"{LLM_EXECUTOR_MAX_IN_FLIGHT} LLM calls already in flight")
+        abandoned = threading.Event()
+        self._count("in_flight")
+        self._count("submitted")
+        future = self.pool.submit(self._run, fn, args, kwargs, time.monotonic(), abandoned)
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            abandoned.set()
+            if future.cancel():
+                # Never started: release what _run would have
+                self._count("in_flight", -1)
+                self.slots.release()
+            self._count("timed_out")
+            raise DeadlineExceeded(f"LLM call exceeded its deadline of {timeout:.1f}s")
+
+    def metrics(self):
+        with self.lock:
+            counts = dict(self.counts)
+        return {**counts, "breaker": self.breaker.snapshot()}
+
+llm_executor = LLMExecutor()
+
+def remaining_seconds(deadline):
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
@@ -0,0 +1,237 @@
+import os
+import re
+import json
+import time
+import random
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from app.services.llm_executor import DeadlineExceeded, remaining_seconds, LLM_EXECUTOR_MAX_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+# "gemini" talks to Google; "fake" answers locally with canned MCQs (tests, offline dev, load runs)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+# Comma-separated model lists per tier: the first model is primary, the second is the hedge target
+LLM_REALTIME_MODELS = os.getenv("LLM_REALTIME_MODELS", "gemini-1.5-flash-8b,gemini-1.5-flash")
+LLM_BATCH_MODELS = os.getenv("LLM_BATCH_MODELS", "gemini-1.5-flash")
+LLM_HEDGING_ENABLED = os.getenv("LLM_HEDGING_ENABLED", "True") == "True"
+# Hedge after the primary's p95 latency, never sooner than this; used as is until enough samples exist
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", 0.3))
+LLM_HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", 1.5))
+LLM_HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+# Every in-flight call may leave an abandoned request running here, so the pool
+# holds at least a primary and a hedge per executor slot
+LLM_HEDGE_WORKERS = max(int(os.getenv("LLM_HEDGE_WORKERS", 0)), 2 * LLM_EXECUTOR_MAX_IN_FLIGHT)
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", 0.05))
+
+if LLM_PROVIDER == "gemini":
+    import google.generativeai as genai
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_API_KEY environment variable not set")
+    genai.configure(api_key=api_key)
+
+generation_config = {
+    "temperature": 0.2,
+    "max_output_tokens": 2048
+}
+# Structured all-bands responses carry a whole skill's questions
+STRUCTURED_MAX_OUTPUT_TOKENS = int(os.getenv("LLM_STRUCTURED_MAX_OUTPUT_TOKENS", 8192))
+
+class LLMResponse:
+    def __init__(self, text, total_tokens=0, provider=None):
+        self.text = text
+        self.total_tokens = total_tokens
+        self.provider = provider
+
+class LatencyTracker:
+    def __init__(self, size=200):
+        self.samples = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def percentile(self, q):
+        with self.lock:
+            if not self.samples:
+                return None
+            ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+    def __len__(self):
+        return len(self.samples)
+
+class LLMProvider(ABC):
+    def __init__(self, name):
+        self.name = name
+        self.latency = LatencyTracker()
+
+    def generate(self, prompt, timeout=None):
+        """Send a prompt and return an LLMResponse; successful latencies feed hedging."""
+        started = time.monotonic()
+        response = self._generate(prompt, timeout)
+        self.latency.record(time.monotonic() - started)
+        return response
+
+    def stream(self, prompt, timeout=None, schema=None):
+        """Yield LLMResponse chunks as text arrives; the last one carries the total token usage.
+
+        With a `schema` the provider is asked for JSON matching it.
+        """
+        return self._stream(prompt, timeout, schema)
+
+    @abstractmethod
+    def _generate(self, prompt, timeout):
+        """Send one prompt and return an LLMResponse."""
+
+    @abstractmethod
+    def _stream(self, prompt, timeout, schema):
+        """Yield LLMResponse chunks for one prompt."""
+
+class GeminiProvider(LLMProvider):
+    def __init__(self, model_name):
+        super().__init__(model_name)
+        self.model = genai.GenerativeModel(model_name=model_name, generation_config=generation_config)
+
+    def _generate(self, prompt, timeout):
+        response = self.model.generate_content(prompt, request_options={"timeout": timeout} if timeout else None)
+        return LLMResponse(response.text, self._total_tokens(response), self.name)
+
+    def _stream(self, prompt, timeout, schema):
+        config = {**generation_config, "max_output_tokens": STRUCTURED_MAX_OUTPUT_TOKENS}
+        if schema:
+            config.update(response_mime_type="application/json", response_schema=schema)
+        response = self.model.generate_content(
+            prompt, generation_config=config, stream=True, request_options={"timeout": timeout} if timeout else None
+        )
+        for chunk in response:
+            yield LLMResponse(chunk.text, self._total_tokens(chunk), self.name)
+
+    @staticmethod
+    def _total_tokens(response):
+        usage = getattr(response, "usage_metadata", None)
+        return getattr(usage, "total_token_count", 0) if usage else 0
+
+class FakeProvider(LLMProvider):
+    """Answers prompts with well-formed canned output after a configurable delay."""
+
+    def __init__(self, name="fake", latency=FAKE_LLM_LATENCY, jitter=0.5, failure_rate=0.0):
+        super().__init__(name)
+        self.base_latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def _delay(self, timeout):
+        delay = self.base_latency * (1 + random.uniform(-self.jitter, self.jitter))
+        time.sleep(min(delay, timeout) if timeout else delay)
+        if timeout and delay > timeout:
+            raise TimeoutError(f"{self.name} timed out after {timeout:.1f}s")
+        if random.random() < self.failure_rate:
+            raise RuntimeError(f"{self.name} injected failure")
+
+    def _mcq(self):
+        with self.lock:
+            self.counter += 1
+            n = self.counter
+        return (
+            f"Sample question {n} from {self.name}?\n\n"
+            f"(A) Option {n}A\n(B) Option {n}B\n(C) Option {n}C\n(D) Option {n}D\n\n"
+            f"Correct Answer: (B)"
+        )
+
+    def _generate(self, prompt, timeout):
+        self._delay(timeout)
+        if prompt.startswith("List 5 key subtopics"):
+            text = "\n".join(f"- Subtopic {i}" for i in range(1, 6))
+        elif "Generate a single" in prompt:
+            text = self._mcq()
+        else:
+            match = re.search(r"Generate (\d+) unique", prompt)
+            count = int(match.group(1)) if match else 1
+            text = "[" + ", ".join(f'"{self._mcq()}"' for _ in range(count)) + "]"
+        return LLMResponse(text, len(prompt) // 4 + len(text) // 4, self.name)
+
+    def _stream(self, prompt, timeout, schema):
+        self._delay(timeout)
+        items = []
+        for band, count in re.findall(r'"(good|better|perfect)": (\d+) questions', prompt):
+            for _ in range(int(count)):
+                lines = self._mcq().split("\n")
+                options = [line[4:] for line in lines[2:6]]
+                items.append({"band": band, "question": lines[0], "options": options, "answer": "B"})
+        text = json.dumps(items)
+        for start in range(0, len(text), 64):
+            last = start + 64 >= len(text)
+            yield LLMResponse(text[start:start + 64], len(prompt) // 4 + len(text) // 4 if last else 0, self.name)
+
+_providers = {}
+_providers_lock = threading.Lock()
+_hedge_pool = ThreadPoolExecutor(max_workers=LLM_HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+
+def get_provider(model_name):
+    with _providers_lock:
+        if model_name not in _providers:
+            if LLM_PROVIDER == "fake":
+                _providers[model_name] = FakeProvider(name=f"fake:{model_name}")
+            else:
+                _providers[model_name] = GeminiProvider(model_name)
+        return _providers[model_name]
+
+def get_tier(tier):
+    """Providers for a tier: 'realtime' favours the fastest model, 'batch' the cheaper bulk one."""
+    models = LLM_REALTIME_MODELS if tier == "realtime" else LLM_BATCH_MODELS
+    return [get_provider(name.strip()) for name in models.split(",") if name.strip()]
+
+def hedge_delay(provider):
+    if len(provider.latency) < LLM_HEDGE_MIN_SAMPLES:
+        return LLM_HEDGE_DEFAULT_DELAY
+    return max(LLM_HEDGE_MIN_DELAY, provider.latency.percentile(0.95))
+
+def _abandon(futures, on_abandoned):
+    """Cancel requests that have not started; report the others' responses once they finish."""
+    for future in futures:
+        if future.cancel():
+            if on_abandoned:
+                on_abandoned(None)
+        elif on_abandoned:
+            future.add_done_callback(
+                lambda f: on_abandoned(f.result() if not f.cancelled() and f.exception() is None else None)
+            )
+
+def hedged_generate(providers, prompt, deadline=None, can_hedge=None, on_abandoned=None):
+    """Send to the primary; if it has not answered by its p95 latency, also send to the backup.
+
+    Returns whichever succeeds first. The slower call cannot be interrupted:
+    it is cancelled if it has not started, otherwise left to finish, and
+    `on_abandoned(response or None)` is called for it so the caller can settle
+    its quota. `can_hedge()` gates the second request (e.g. on quota).
+    """
+    primary = providers[0]
+    backup = providers[1] if len(providers) > 1 else providers[0]
+    futures = {_hedge_pool.submit(primary.generate, prompt, remaining_seconds(deadline))}
+    delay = hedge_delay(primary)
+    if deadline is not None:
+        delay = min(delay, remaining_seconds(deadline))
+    done, _ = wait(futures, timeout=delay)
+    if not done and (can_hedge is None or can_hedge()):
+        logger.debug(f"Hedging {primary.name} with {backup.name} after {delay:.2f}s")
+        futures.add(_hedge_pool.submit(backup.generate, prompt, remaining_seconds(deadline)))
+    error = None
+    while futures:
+        done, futures = wait(futures, timeout=remaining_seconds(deadline), return_when=FIRST_COMPLETED)
+        if not done:
+            _abandon(futures, on_abandoned)
+            raise DeadlineExceeded("No LLM response before the deadline")
+        for future in done:
+            if future.exception() is None:
+                _abandon(futures, on_abandoned)
+                return future.result()
+            error = error or future.exception()
+    raise error
@@ -0,0 +1,124 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+from app.services.llm_executor import DeadlineExceeded
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, highest first
+LIVE_EXAM = "live_exam"
+PROFILE_PARSING = "profile_parsing"
+BANK_BUILDING = "bank_building"
+PRIORITY_CLASSES = [LIVE_EXAM, PROFILE_PARSING, BANK_BUILDING]
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# Slots only live-exam calls may use, so background work can never take all of them
+LLM_LIVE_RESERVED = int(os.getenv("LLM_LIVE_RESERVED", 2))
+
+class _Waiter:
+    def __init__(self, priority, tenant, start_tag, finish_tag):
+        self.priority = priority
+        self.tenant = tenant
+        self.start_tag = start_tag
+        self.finish_tag = finish_tag
+        self.granted = threading.Event()
+        self.enqueued = time.monotonic()
+
+class LLMScheduler:
+    """Process-wide admission control for outbound LLM calls.
+
+    Calls wait for one of `max_concurrency` slots. Free slots go to the
+    highest priority class with waiters; within a class, tenants (e.g.
+    recruiters) share slots by weighted fair queueing on virtual finish
+    tags, so one tenant with many queued calls cannot starve the others.
+    """
+
+    def __init__(self, max_concurrency=LLM_MAX_CONCURRENCY, live_reserved=LLM_LIVE_RESERVED):
+        self.max_concurrency = max_concurrency
+        self.live_reserved = min(live_reserved, max_concurrency - 1)
+        self.active = {priority: 0 for priority in PRIORITY_CLASSES}
+        self.queues = {priority: [] for priority in PRIORITY_CLASSES}
+        self.virtual_time = {priority: 0.0 for priority in PRIORITY_CLASSES}
+        self.last_finish = {}
+        self.waits = {priority: deque(maxlen=500) for priority in PRIORITY_CLASSES}
+        self.counts = {priority: {"granted": 0, "timed_out": 0} for priority in PRIORITY_CLASSES}
+        self.lock = threading.Lock()
+
+    def _capacity(self, priority):
+        if priority == LIVE_EXAM:
+            return self.max_concurrency
+        return self.max_concurrency - self.live_reserved
+
+    def _in_use(self, priority):
+        if priority == LIVE_EXAM:
+            return sum(self.active.values())
+        return sum(count for name, count in self.active.items() if name != LIVE_EXAM) + max(
+            0, self.active[LIVE_EXAM] - self.live_reserved
+        )
+
+    def _dispatch(self):
+        """Grant free slots to queued waiters. Caller holds the lock."""
+        for priority in PRIORITY_CLASSES:
+            queue = self.queues[priority]
+            while queue and self._in_use(priority) < self._capacity(priority):
+                waiter = min(queue, key=lambda w: w.finish_tag)
+                queue.remove(waiter)
+                self._grant(waiter)
+            if queue:
+                # Lower classes wait until this one drains
+                return
+
+    def _grant(self, waiter):
+        self.active[waiter.priority] += 1
+        self.virtual_time[waiter.priority] = max(self.virtual_time[waiter.priority], waiter.start_tag)
+        self.waits[waiter.priority].append(time.monotonic() - waiter.enqueued)
+        self.counts[waiter.priority]["granted"] += 1
+        waiter.granted.set()
+
+    @contextmanager
+    def slot(self, priority, tenant=None, weight=1.0, timeout=None):
+        """Hold one LLM slot for the duration of the block.
+
+        Raises DeadlineExceeded if no slot is granted within `timeout` seconds.
+        """
+        with self.lock:
+            key = (priority, tenant)
+            start = max(self.virtual_time[priority], self.last_finish.get(key, 0.0))
+            waiter = _Waiter(priority, tenant, start, start + 1.0 / weight)
+            self.last_finish[key] = waiter.finish_tag
+            self.queues[priority].append(waiter)
+            self._dispatch()
+        if not waiter.granted.wait(timeout):
+            with self.lock:
+                if not waiter.granted.is_set():
+                    self.queues[priority].remove(waiter)
+                    self.counts[priority]["timed_out"] += 1
+                    raise DeadlineExceeded(f"No LLM slot for {priority} within {timeout:.1f}s")
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.active[priority] -= 1
+                if not self.queues[priority] and not self.active[priority]:
+                    # Idle class: forget finish tags so returning tenants start level
+                    self.last_finish = {k: v for k, v in self.last_finish.items() if k[0] != priority}
+                self._dispatch()
+
+    def metrics(self):
+        with self.lock:
+            classes = {}
+            for priority in PRIORITY_CLASSES:
+                waits = sorted(self.waits[priority])
+                classes[priority] = {
+                    "active": self.active[priority],
+                    "queued": len(self.queues[priority]),
+                    **self.counts[priority],
+                    "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    "p95_wait_seconds": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 3) if waits else 0.0
+                }
+            return {"max_concurrency": self.max_concurrency, "live_reserved": self.live_reserved, "classes": classes}
+
+llm_scheduler = LLMScheduler()
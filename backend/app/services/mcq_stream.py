@@ -0,0 +1,99 @@
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Structured output format for all-bands generation: a JSON array of MCQ objects
+MCQ_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "band": {"type": "string", "enum": ["good", "better", "perfect"]},
+            "question": {"type": "string"},
+            "options": {"type": "array", "items": {"type": "string"}},
+            "answer": {"type": "string", "enum": ["A", "B", "C", "D"]}
+        },
+        "required": ["band", "question", "options", "answer"]
+    }
+}
+
+def validate_mcq(item):
+    """Convert one structured MCQ object to (band, parsed question), or None if it is malformed."""
+    if not isinstance(item, dict):
+        return None
+    options = item.get("options")
+    question = item.get("question")
+    answer = str(item.get("answer", "")).strip().strip("()").upper()
+    band = item.get("band")
+    if not isinstance(question, str) or not question.strip():
+        return None
+    if not isinstance(options, list) or len(options) != 4 or not all(isinstance(o, str) and o.strip() for o in options):
+        return None
+    if answer not in ("A", "B", "C", "D") or band not in ("good", "better", "perfect"):
+        return None
+    return band, {
+        "question": question.strip(),
+        "option_a": options[0].strip(),
+        "option_b": options[1].strip(),
+        "option_c": options[2].strip(),
+        "option_d": options[3].strip(),
+        "correct_answer": answer
+    }
+
+class McqStreamParser:
+    """Incremental parser for a streamed JSON array of MCQ objects.
+
+    feed() takes raw text chunks as they arrive and returns the MCQs whose
+    objects closed in them, so each can be stored before the response ends.
+    A malformed object is skipped on its own instead of failing the batch.
+    Text before the opening bracket (e.g. a ```json fence) is ignored.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.started = False
+        self.buffer = []
+        self.invalid = 0
+
+    def feed(self, chunk):
+        parsed = []
+        for char in chunk:
+            if not self.started:
+                self.started = char == "["
+                continue
+            if self.depth > 0:
+                self.buffer.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+            if char == '"':
+                self.in_string = True
+            elif char == "{":
+                if self.depth == 0:
+                    self.buffer = [char]
+                self.depth += 1
+            elif char == "}" and self.depth > 0:
+                self.depth -= 1
+                if self.depth == 0:
+                    mcq = self._close("".join(self.buffer))
+                    if mcq:
+                        parsed.append(mcq)
+        return parsed
+
+    def _close(self, text):
+        try:
+            mcq = validate_mcq(json.loads(text))
+        except json.JSONDecodeError:
+            mcq = None
+        if mcq is None:
+            self.invalid += 1
+            logger.debug(f"Skipping malformed streamed MCQ: {text[:200]}")
+        return mcq
@@ -0,0 +1,124 @@
+import io
+import os
+import csv
+import logging
+from sqlalchemy.dialects.postgresql import insert
+from app import db
+from app.models.mcq import MCQ
+from app.models.question_pool_item import QuestionPoolItem
+from app.services.question_pool import content_hash
+from app.services.db_pool import mark_written
+
+logger = logging.getLogger(__name__)
+
+# Rows per INSERT statement; keeps statements well under the bind-parameter limit
+MCQ_WRITE_CHUNK = int(os.getenv("MCQ_WRITE_CHUNK", 500))
+# At or above this many rows write_mcqs("auto") loads through COPY into a staging table
+MCQ_COPY_THRESHOLD = int(os.getenv("MCQ_COPY_THRESHOLD", 2000))
+
+MCQ_COLUMNS = [
+    "job_id", "skill_id", "question", "option_a", "option_b", "option_c", "option_d",
+    "correct_answer", "difficulty_band", "pool_id", "content_hash"
+]
+
+POOL_COLUMNS = [
+    "skill_id", "difficulty_band", "question", "option_a", "option_b", "option_c", "option_d",
+    "correct_answer", "content_hash", "tags"
+]
+
+def mcq_row(job_id, skill_id, band, parsed, pool_id=None):
+    """Insertable row for a parsed question ({question, option_a..d, correct_answer})."""
+    return {
+        "job_id": job_id,
+        "skill_id": skill_id,
+        "question": parsed["question"],
+        "option_a": parsed["option_a"],
+        "option_b": parsed["option_b"],
+        "option_c": parsed["option_c"],
+        "option_d": parsed["option_d"],
+        "correct_answer": parsed["correct_answer"],
+        "difficulty_band": band,
+        "pool_id": pool_id,
+        "content_hash": content_hash(parsed)
+    }
+
+def write_mcqs(rows, method="auto"):
+    """Insert MCQ rows in bulk, skipping ones whose (job_id, content_hash) already exists.
+
+    `method` is "insert" (multi-row INSERT ... RETURNING), "copy" (COPY into a
+    staging table, then one INSERT ... SELECT) or "auto". Runs in the current
+    transaction; the caller commits. Returns {(job_id, content_hash): mcq_id}
+    for the rows actually inserted.
+    """
+    unique = {}
+    for row in rows:
+        unique.setdefault((row["job_id"], row["content_hash"]), row)
+    rows = list(unique.values())
+    if not rows:
+        return {}
+    if method == "copy" or (method == "auto" and len(rows) >= MCQ_COPY_THRESHOLD):
+        return _copy(rows)
+    return _insert(rows)
+
+def _insert(rows):
+    inserted = {}
+    for start in range(0, len(rows), MCQ_WRITE_CHUNK):
+        statement = insert(MCQ).values(rows[start:start + MCQ_WRITE_CHUNK]).on_conflict_do_nothing(
+            index_elements=["job_id", "content_hash"]
+        ).returning(MCQ.mcq_id, MCQ.job_id, MCQ.content_hash)
+        for mcq_id, job_id, digest in db.session.execute(statement):
+            inserted[(job_id, digest)] = mcq_id
+    return inserted
+
+def _copy(rows):
+    columns = ", ".join(MCQ_COLUMNS)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # An unquoted empty field is NULL in COPY's CSV format
+        writer.writerow(["" if row.get(column) is None else row[column] for column in MCQ_COLUMNS])
+    buffer.seek(0)
+    mark_written(db.session())
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS mcq_staging ON COMMIT DROP AS SELECT {columns} FROM mcqs WITH NO DATA")
+        cursor.execute("TRUNCATE mcq_staging")
+        cursor.copy_expert(f"COPY mcq_staging ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        cursor.execute(
+            f"INSERT INTO mcqs ({columns}) SELECT {columns} FROM mcq_staging "
+            f"ON CONFLICT (job_id, content_hash) DO NOTHING RETURNING mcq_id, job_id, content_hash"
+        )
+        return {(job_id, digest): mcq_id for mcq_id, job_id, digest in cursor.fetchall()}
+    finally:
+        cursor.close()
+
+def existing_mcq_ids(job_id, digests):
+    """mcq_ids already stored for a job's content hashes."""
+    if not digests:
+        return {}
+    return dict(db.session.query(MCQ.content_hash, MCQ.mcq_id).filter(
+        MCQ.job_id == job_id, MCQ.content_hash.in_(list(digests))
+    ).all())
+
+def write_pool_items(rows):
+    """Insert question pool rows in bulk, skipping content hashes already pooled.
+
+    Returns {content_hash: pool_id} for every row, new or existing. The caller commits.
+    """
+    unique = {}
+    for row in rows:
+        unique.setdefault(row["content_hash"], {column: row.get(column) for column in POOL_COLUMNS})
+    rows = list(unique.values())
+    for row in rows:
+        row["tags"] = row["tags"] or []
+    for start in range(0, len(rows), MCQ_WRITE_CHUNK):
+        db.session.execute(insert(QuestionPoolItem).values(rows[start:start + MCQ_WRITE_CHUNK]).on_conflict_do_nothing(
+            index_elements=["content_hash"]
+        ))
+    pool_ids = {}
+    digests = list(unique)
+    for start in range(0, len(digests), MCQ_WRITE_CHUNK):
+        pool_ids.update(db.session.query(QuestionPoolItem.content_hash, QuestionPoolItem.pool_id).filter(
+            QuestionPoolItem.content_hash.in_(digests[start:start + MCQ_WRITE_CHUNK])
+        ).all())
+    return pool_ids
@@ -0,0 +1,263 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from app import db
+from app.models.mcq import MCQ
+from app.models.skill import Skill
+
+logger = logging.getLogger(__name__)
+
+BAND_ORDER = ["good", "better", "perfect"]
+
+# Question bank cache configuration
+BANK_CACHE_SIZE = int(os.getenv("QUESTION_BANK_CACHE_SIZE", 64))
+BANK_CACHE_REDIS_URL = os.getenv("QUESTION_BANK_CACHE_REDIS_URL", "")
+BANK_CACHE_SHARED_TTL = int(os.getenv("QUESTION_BANK_CACHE_TTL", 6 * 60 * 60))
+
+class QuestionBankSnapshot:
+    """Immutable, shared view of a job's MCQs organized by band and skill.
+
+    Attempts never copy the bank. Each attempt keeps a random seed, and the
+    order in which it sees questions is derived from that seed and the
+    mcq_id, so it stays the same across reloads and when new MCQs are added.
+    """
+
+    def __init__(self, job_id, version, questions, index):
+        self.job_id = job_id
+        self.version = version
+        self.questions = questions
+        self.index = index
+
+    def is_empty(self):
+        return not any(ids for band in self.index.values() for ids in band.values())
+
+    def get(self, mcq_id):
+        return self.questions.get(mcq_id)
+
+    def next_question(self, band, skill, seed, used_mcq_ids):
+        """Return the unused question with the lowest seeded rank for band/skill."""
+        used = set(used_mcq_ids)
+        candidates = [mcq_id for mcq_id in self.index.get(band, {}).get(skill, ()) if mcq_id not in used]
+        if not candidates:
+            return None
+        return self.questions[min(candidates, key=lambda mcq_id: question_rank(seed, mcq_id))]
+
+    def extended(self, version, skill, band, questions):
+        """A new snapshot with `questions` ({mcq_id: serialized}) added under band/skill."""
+        index = dict(self.index)
+        index[band] = {**index.get(band, {}), skill: index.get(band, {}).get(skill, ()) + tuple(sorted(questions))}
+        return QuestionBankSnapshot(self.job_id, version, {**self.questions, **questions}, index)
+
+def question_rank(seed, mcq_id):
+    """Deterministic pseudo-random position of a question within an attempt."""
+    digest = hashlib.blake2b(f"{seed}:{mcq_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+def serialize_mcq(mcq):
+    return {
+        "mcq_id": mcq.mcq_id,
+        "question": mcq.question,
+        "options": [mcq.option_a, mcq.option_b, mcq.option_c, mcq.option_d],
+        "answer": getattr(mcq, f"option_{mcq.correct_answer.lower()}")
+    }
+
+def serialize_row(row):
+    """serialize_mcq for a stored row dict (mcq_id, question, option_a..d, correct_answer)."""
+    return {
+        "mcq_id": row["mcq_id"],
+        "question": row["question"],
+        "options": [row["option_a"], row["option_b"], row["option_c"], row["option_d"]],
+        "answer": row[f"option_{row['correct_answer'].lower()}"]
+    }
+
+def parse_bank_version(version):
+    count, max_id = version.split(":")
+    return int(count), int(max_id)
+
+def get_bank_version(job_id):
+    """Cheap version stamp that changes whenever MCQs are added to or removed from a job."""
+    count, max_id = db.session.query(db.func.count(MCQ.mcq_id), db.func.max(MCQ.mcq_id)).filter(
+        MCQ.job_id == job_id
+    ).one()
+    return f"{count}:{max_id or 0}"
+
+def build_bank_snapshot(job_id, version):
+    """Load a job's questions, organized by difficulty band and skill."""
+    try:
+        questions = {}
+        index = {band: {} for band in BAND_ORDER}
+        mcqs = MCQ.query.filter_by(job_id=job_id).join(Skill, Skill.skill_id == MCQ.skill_id).order_by(MCQ.mcq_id).all()
+
+        for mcq in mcqs:
+            if mcq.correct_answer not in ['A', 'B', 'C', 'D']:
+                logger.error(f"Invalid correct_answer '{mcq.correct_answer}' for MCQ mcq_id={mcq.mcq_id}")
+                continue
+            if mcq.difficulty_band not in index:
+                continue
+            questions[mcq.mcq_id] = serialize_mcq(mcq)
+            index[mcq.difficulty_band].setdefault(mcq.skill.name, []).append(mcq.mcq_id)
+
+        index = {band: {skill: tuple(ids) for skill, ids in skills.items()} for band, skills in index.items()}
+        return QuestionBankSnapshot(job_id, version, questions, index)
+    except Exception as e:
+        logger.error(f"Error in build_bank_snapshot for job_id={job_id}: {str(e)}")
+        raise
+
+class QuestionBankCache:
+    """Per-job snapshot cache: a process-level LRU in front of an optional shared Redis cache.
+
+    Entries are keyed by the job's bank version, so a snapshot is never served
+    once MCQs have been added; stale shared entries simply expire. A few MCQs
+    stored during a live exam are added to the cached snapshot with add()
+    instead of forcing every worker to rebuild the whole bank.
+    """
+
+    def __init__(self, max_entries=BANK_CACHE_SIZE, redis_url=BANK_CACHE_REDIS_URL, shared_ttl=BANK_CACHE_SHARED_TTL):
+        self.max_entries = max_entries
+        self.redis_url = redis_url
+        self.shared_ttl = shared_ttl
+        self._client = None
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+        self.stats = {"local_hits": 0, "shared_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "extensions": 0}
+
+    def _shared(self):
+        if not self.redis_url:
+            return None
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.redis_url)
+        return self._client
+
+    def _shared_key(self, job_id, version):
+        return f"question_bank:{job_id}:{version}"
+
+    def _get_local(self, job_id, version):
+        with self._lock:
+            snapshot = self._local.get(job_id)
+            if snapshot and snapshot.version == version:
+                self._local.move_to_end(job_id)
+                return snapshot
+        return None
+
+    def _put_local(self, snapshot):
+        with self._lock:
+            self._local[snapshot.job_id] = snapshot
+            self._local.move_to_end(snapshot.job_id)
+            while len(self._local) > self.max_entries:
+                evicted, _ = self._local.popitem(last=False)
+                self._build_locks.pop(evicted, None)
+                self.stats["evictions"] += 1
+
+    def _get_shared(self, job_id, version):
+        try:
+            client = self._shared()
+            raw = client.get(self._shared_key(job_id, version)) if client else None
+        except Exception as e:
+            logger.warning(f"Shared question bank cache unavailable: {str(e)}")
+            return None
+        if not raw:
+            return None
+        data = json.loads(raw)
+        questions = {int(mcq_id): question for mcq_id, question in data["questions"].items()}
+        index = {band: {skill: tuple(ids) for skill, ids in skills.items()} for band, skills in data["index"].items()}
+        return QuestionBankSnapshot(job_id, version, questions, index)
+
+    def _put_shared(self, snapshot):
+        try:
+            client = self._shared()
+            if client:
+                data = {"questions": snapshot.questions, "index": snapshot.index}
+                client.set(self._shared_key(snapshot.job_id, snapshot.version), json.dumps(data), ex=self.shared_ttl)
+        except Exception as e:
+            logger.warning(f"Shared question bank cache unavailable: {str(e)}")
+
+    def get(self, job_id):
+        version = get_bank_version(job_id)
+        snapshot = self._get_local(job_id, version)
+        if snapshot:
+            self.stats["local_hits"] += 1
+            return snapshot
+
+        # One build per job at a time, so a burst of candidates at schedule_start shares it
+        with self._lock:
+            build_lock = self._build_locks.setdefault(job_id, threading.Lock())
+        with build_lock:
+            snapshot = self._get_local(job_id, version)
+            if snapshot:
+                self.stats["local_hits"] += 1
+                return snapshot
+            snapshot = self._get_shared(job_id, version)
+            if snapshot:
+                self.stats["shared_hits"] += 1
+            else:
+                self.stats["misses"] += 1
+                snapshot = build_bank_snapshot(job_id, version)
+                self._put_shared(snapshot)
+            self._put_local(snapshot)
+        logger.debug(f"Question bank cache for job_id={job_id} version={version}: {self.stats}")
+        return snapshot
+
+    def add(self, job_id, skill, band, rows):
+        """Fold newly stored MCQ rows into the cached snapshot and publish it under the new version.
+
+        Only applies when the bank grew by exactly these rows since the
+        snapshot was built; otherwise the local entry is dropped and the next
+        get() rebuilds.
+        """
+        with self._lock:
+            snapshot = self._local.get(job_id)
+        if snapshot is None or not rows:
+            return None
+        version = get_bank_version(job_id)
+        old_count, old_max = parse_bank_version(snapshot.version)
+        count, max_id = parse_bank_version(version)
+        ids = [row["mcq_id"] for row in rows]
+        if count != old_count + len(ids) or min(ids) <= old_max or max(ids) != max_id:
+            self.invalidate(job_id)
+            return None
+        snapshot = snapshot.extended(version, skill, band, {row["mcq_id"]: serialize_row(row) for row in rows})
+        self._put_local(snapshot)
+        self._put_shared(snapshot)
+        self.stats["extensions"] += 1
+        return snapshot
+
+    def invalidate(self, job_id):
+        """Drop this process's snapshot for a job after its MCQs change.
+
+        Shared entries are keyed by version and never match again, so they
+        are left to expire instead of being scanned for.
+        """
+        with self._lock:
+            self._local.pop(job_id, None)
+        self.stats["invalidations"] += 1
+
+bank_cache = QuestionBankCache()
+
+def get_bank_snapshot(job_id):
+    """Return the shared snapshot of a job's question bank."""
+    return bank_cache.get(job_id)
+
+def invalidate_question_bank(job_id):
+    bank_cache.invalidate(job_id)
+
+def add_to_question_bank(job_id, skill, band, rows):
+    """Add a few freshly stored MCQ rows (dicts with mcq_id) to the cached bank."""
+    bank_cache.add(job_id, skill, band, rows)
+
+def get_bank_cache_stats():
+    return dict(bank_cache.stats)
+
+def get_question(job_id, mcq_id):
+    """Look up a question for a job, falling back to the database for MCQs newer than the snapshot."""
+    question = get_bank_snapshot(job_id).get(mcq_id)
+    if question:
+        return question
+    mcq = MCQ.query.filter_by(job_id=job_id, mcq_id=mcq_id).first()
+    if not mcq or mcq.correct_answer not in ['A', 'B', 'C', 'D']:
+        return None
+    return serialize_mcq(mcq)
@@ -1,73 +1,163 @@
-import wikipediaapi
 import numpy as np
 import time
 import os
 import re
+import queue
 import threading
-import functools
-import hashlib
-from flask import current_app
-from sentence_transformers import SentenceTransformer
-import google.generativeai as genai
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
 from google.api_core.exceptions import TooManyRequests
 from app import db
 from app.models.skill import Skill
 from app.models.mcq import MCQ
+from app.services.question_bank import BAND_ORDER, invalidate_question_bank, add_to_question_bank
+from app.services.rate_limiter import RateLimiter, backoff_delay
+from app.services.subskill_cache import subskill_cache, get_subskills
+from app.services.knowledge_store import ensure_topics, retrieve_passages
+from app.services.question_dedupe import encode_questions, find_duplicates, remember_questions
+from app.services.question_pool import assign_from_pool, publish_to_pool
+from app.services.mcq_writer import mcq_row, write_mcqs, existing_mcq_ids
+from app.services.llm_executor import llm_executor, remaining_seconds, LLMCallError, DeadlineExceeded
+from app.services.request_coalescer import RequestCoalescer
+from app.services.llm_scheduler import llm_scheduler, LIVE_EXAM, BANK_BUILDING
+from app.services.llm_providers import generation_config, get_tier, hedged_generate, LLM_HEDGING_ENABLED, STRUCTURED_MAX_OUTPUT_TOKENS
+from app.services.mcq_stream import McqStreamParser, MCQ_RESPONSE_SCHEMA
+from app.services.db_pool import release_connection
 
-# Cross-platform timeout implementation with Flask context
-class TimeoutError(Exception):
-    pass
-
-def timeout_with_context(seconds):
-    """Cross-platform timeout decorator that preserves Flask application context"""
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            # Capture the current Flask app context
-            app = current_app._get_current_object()
-            result = [None]
-            exception = [None]
-            
-            def target():
-                # Push the app context in the new thread
-                with app.app_context():
-                    try:
-                        result[0] = func(*args, **kwargs)
-                    except Exception as e:
-                        exception[0] = e
-            
-            thread = threading.Thread(target=target)
-            thread.daemon = True
-            thread.start()
-            thread.join(seconds)
-            
-            if thread.is_alive():
-                # Thread is still running, which means timeout occurred
-                raise TimeoutError(f'Function call timed out after {seconds} seconds')
-            
-            if exception[0]:
-                raise exception[0]
-            
-            return result[0]
-        return wrapper
-    return decorator
-
-# Configure Gemini AI API
-api_key = os.getenv("GOOGLE_API_KEY")
-if not api_key:
-    raise ValueError("GOOGLE_API_KEY environment variable not set")
-genai.configure(api_key=api_key)
-generation_config = {
-    "temperature": 0.2,
-    "max_output_tokens": 2048
-}
-model_gemini = genai.GenerativeModel(
-    model_name="gemini-1.5-flash", generation_config=generation_config
-)
-embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-wiki = wikipediaapi.Wikipedia(
-    user_agent="MandviAIQuiz/1.0 (contact: mandvishukla20@gmail.com)", language='en'
-)
+# Provider quota shared by every generation thread in this process
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", 15))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", 1000000))
+# Requests per minute of burst quota only live-exam calls may take
+GEMINI_LIVE_RESERVED_RPM = int(os.getenv("GEMINI_LIVE_RESERVED_RPM", 3))
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", 5))
+QUESTION_GENERATION_WORKERS = int(os.getenv("QUESTION_GENERATION_WORKERS", 4))
+KNOWLEDGE_TOP_K = int(os.getenv("KNOWLEDGE_TOP_K", 5))
+QUESTION_BATCH_SIZE = int(os.getenv("QUESTION_BATCH_SIZE", 20))
+REALTIME_GENERATION_TIMEOUT = float(os.getenv("REALTIME_GENERATION_TIMEOUT", 5))
+# "all_bands" asks for every band of a skill in one structured, streamed response; "per_band" sends one prompt per band
+QUESTION_GENERATION_MODE = os.getenv("QUESTION_GENERATION_MODE", "all_bands")
+# How often bank generation stores questions that have streamed in
+STREAM_FLUSH_INTERVAL = float(os.getenv("QUESTION_STREAM_FLUSH_INTERVAL", 1.0))
+gemini_limiter = RateLimiter(GEMINI_RPM, GEMINI_TPM)
+question_coalescer = RequestCoalescer()
+
+class GenerationStats:
+    """Thread-safe counters for one bank generation run."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counts = {
+            "requests": 0, "tokens": 0, "rate_limited": 0, "questions": 0,
+            "pooled": 0, "duplicates": 0, "failed_batches": 0
+        }
+        self.lock = threading.Lock()
+
+    def record(self, **counts):
+        with self.lock:
+            for key, value in counts.items():
+                self.counts[key] += value
+
+    def as_dict(self):
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            minutes = elapsed / 60 or 1
+            return {
+                **self.counts,
+                "elapsed_seconds": round(elapsed, 1),
+                "questions_per_minute": round(self.counts["questions"] / minutes, 1),
+                "requests_per_minute": round(self.counts["requests"] / minutes, 1)
+            }
+
+def estimate_tokens(prompt):
+    return len(prompt) // 4 + generation_config["max_output_tokens"]
+
+def send_prompt(prompt, max_retries=GEMINI_MAX_RETRIES, stats=None, deadline=None, tier="batch", tenant=None):
+    """Send a prompt to the tier's provider within the RPM/TPM budget, backing off with jitter on 429s.
+
+    With a `deadline` (time.monotonic() value) the remaining time is passed to
+    the provider as its request timeout and no retry starts after it. The
+    realtime tier hedges a slow primary with its backup model when quota allows.
+    Each attempt holds an LLM scheduler slot: realtime prompts run as live-exam
+    work, batch prompts as bank building shared fairly between `tenant`s.
+    Quota is taken before the slot, so no slot is held while waiting on the
+    rate limit, and batch prompts leave GEMINI_LIVE_RESERVED_RPM for live ones.
+    """
+    estimated = estimate_tokens(prompt)
+    providers = get_tier(tier)
+    priority = LIVE_EXAM if tier == "realtime" else BANK_BUILDING
+    headroom = 0 if priority == LIVE_EXAM else GEMINI_LIVE_RESERVED_RPM
+    for attempt in range(max_retries + 1):
+        if gemini_limiter.acquire(estimated, headroom=headroom, timeout=remaining_seconds(deadline)) is None:
+            raise DeadlineExceeded("No LLM quota before the deadline")
+        sent = False
+        try:
+            with llm_scheduler.slot(priority, tenant, timeout=remaining_seconds(deadline)):
+                if deadline is not None and remaining_seconds(deadline) <= 0:
+                    raise DeadlineExceeded("Deadline passed before the LLM request was sent")
+                sent = True
+                if tier == "realtime" and LLM_HEDGING_ENABLED:
+                    # Every request sent takes `estimated`; the ones not returned settle when they finish
+                    response = hedged_generate(
+                        providers, prompt, deadline, can_hedge=lambda: gemini_limiter.try_acquire(estimated),
+                        on_abandoned=lambda abandoned: gemini_limiter.settle(estimated, abandoned.total_tokens if abandoned else 0)
+                    )
+                else:
+                    response = providers[0].generate(prompt, remaining_seconds(deadline))
+        except DeadlineExceeded:
+            if not sent:
+                # The quota goes back for other callers
+                gemini_limiter.refund(estimated)
+            raise
+        except TooManyRequests:
+            gemini_limiter.throttle()
+            if stats:
+                stats.record(rate_limited=1)
+            if attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            if deadline is not None and delay >= remaining_seconds(deadline):
+                raise
+            print(f"⛔️ Gemini quota exceeded. Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+            continue
+        if response.total_tokens:
+            gemini_limiter.settle(estimated, response.total_tokens)
+        if stats:
+            stats.record(requests=1, tokens=response.total_tokens or estimated)
+        return response
+
+def stream_prompt(prompt, max_retries=GEMINI_MAX_RETRIES, stats=None, tenant=None, schema=None):
+    """Stream a batch-tier prompt's response text, chunk by chunk, within the RPM/TPM budget.
+
+    A 429 is retried with backoff only before any text has been yielded.
+    Like send_prompt, quota is taken (leaving the live-exam reserve) before the slot.
+    """
+    estimated = len(prompt) // 4 + STRUCTURED_MAX_OUTPUT_TOKENS
+    provider = get_tier("batch")[0]
+    for attempt in range(max_retries + 1):
+        actual = 0
+        received = False
+        gemini_limiter.acquire(estimated, headroom=GEMINI_LIVE_RESERVED_RPM)
+        try:
+            with llm_scheduler.slot(BANK_BUILDING, tenant):
+                for chunk in provider.stream(prompt, schema=schema):
+                    received = True
+                    actual = chunk.total_tokens or actual
+                    yield chunk.text
+        except TooManyRequests:
+            gemini_limiter.throttle()
+            if stats:
+                stats.record(rate_limited=1)
+            if received or attempt >= max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"⛔️ Gemini quota exceeded. Retrying in {delay:.1f} seconds...")
+            time.sleep(delay)
+            continue
+        if actual:
+            gemini_limiter.settle(estimated, actual)
+        if stats:
+            stats.record(requests=1, tokens=actual or estimated)
+        return
 
 def divide_experience_range(jd_range):
     start, end = map(float, jd_range.split("-"))
@@ -78,11 +168,12 @@ def divide_experience_range(jd_range):
         "perfect": (start + 2 * interval, end)
     }
 
-def expand_skills_with_gemini(skill):
+def expand_skills_with_gemini(skill, max_retries=0, stats=None, deadline=None, tenant=None):
     prompt = f"List 5 key subtopics under {skill} that are relevant for a technical interview. Only list the subskills."
     try:
-        chat_session = model_gemini.start_chat(history=[{"role": "user", "parts": [prompt]}])
-        response = chat_session.send_message(prompt)
+        # Deadline-bound expansions serve a waiting candidate, so they use the realtime tier
+        tier = "batch" if deadline is None else "realtime"
+        response = send_prompt(prompt, max_retries=max_retries, stats=stats, deadline=deadline, tier=tier, tenant=tenant)
     except TooManyRequests:
         print(f"⛔️ Gemini quota exceeded while expanding skill: {skill}")
         return []
@@ -92,19 +183,21 @@ def expand_skills_with_gemini(skill):
     return []
 
 def fetch_wikipedia_content(topic):
-    page = wiki.page(topic)
-    return page.summary if page.exists() else None
+    return ensure_topics([topic]).get(topic)
 
-def generate_questions_prompt(skill, subskills, difficulty_band, job_description=""):
+def generate_questions_prompt(skill, subskills, difficulty_band, job_description="", passages=None, count=QUESTION_BATCH_SIZE):
     difficulty_descriptor = {
         "good": "easy and theory-based, suitable for beginners. Can be data structures and algorithms based question",
         "better": "moderate difficulty, mixing theory and practical concepts can be dsa based or practical based question",
         "perfect": "challenging, practical, and suitable for advanced learners, should mostly be a code snippet to test practical skills"
     }[difficulty_band]
     description_context = f"The job description is: {job_description}" if job_description else "There is no specific job description provided."
+    if passages:
+        reference = "\n\n".join(passages)
+        description_context += f"\n    Use the following reference material to keep the questions factually accurate:\n{reference}"
     prompt = f"""
     {description_context}
-    Generate 20 unique and diverse multiple-choice questions (MCQs) on the skill '{skill}' and its subskills: {", ".join(subskills)}.
+    Generate {count} unique and diverse multiple-choice questions (MCQs) on the skill '{skill}' and its subskills: {", ".join(subskills)}.
     The questions should be {difficulty_descriptor}. It should also include a few code snippets where applicable.
     Guidelines:
     1. Each question must be different in wording and concept.
@@ -116,7 +209,36 @@ def generate_questions_prompt(skill, subskills, difficulty_band, job_description
     6. Format each question exactly like this:
     "Question text\n\n(A) Option A\n(B) Option B\n(C) Option C\n(D) Option D\n\nCorrect Answer: (B)"
     7. Return the questions as a list of strings, separated by commas, enclosed in square brackets, e.g., ["question1...", "question2..."].
-    Return ONLY the list of 20 formatted MCQs. No extra text, no explanations, no code block markers (like ```json or ```python).
+    Return ONLY the list of {count} formatted MCQs. No extra text, no explanations, no code block markers (like ```json or ```python).
+    """
+    return prompt.strip()
+
+def generate_all_bands_prompt(skill, subskills, band_counts, job_description="", passages=None):
+    """One prompt for several bands of a skill, answered as a JSON array (see MCQ_RESPONSE_SCHEMA)."""
+    difficulty_descriptor = {
+        "good": "easy and theory-based, suitable for beginners. Can be data structures and algorithms based question",
+        "better": "moderate difficulty, mixing theory and practical concepts can be dsa based or practical based question",
+        "perfect": "challenging, practical, and suitable for advanced learners, should mostly be a code snippet to test practical skills"
+    }
+    description_context = f"The job description is: {job_description}" if job_description else "There is no specific job description provided."
+    if passages:
+        reference = "\n\n".join(passages)
+        description_context += f"\n    Use the following reference material to keep the questions factually accurate:\n{reference}"
+    bands = "\n".join(
+        f'    - "{band}": {count} questions, {difficulty_descriptor[band]}' for band, count in band_counts.items()
+    )
+    prompt = f"""
+    {description_context}
+    Generate unique and diverse multiple-choice questions (MCQs) on the skill '{skill}' and its subskills: {", ".join(subskills)}.
+    Difficulty bands and how many questions each needs:
+{bands}
+    Guidelines:
+    1. Each question must be different in wording and concept, across all bands.
+    2. Cover a broad range of topics from the subskills provided, with code snippets where applicable.
+    3. Each MCQ has exactly four options and one correct answer.
+    4. Return ONLY a JSON array of objects like
+    {{"band": "good", "question": "Question text", "options": ["Option A", "Option B", "Option C", "Option D"], "answer": "B"}}
+    where "answer" is the letter of the correct option. No extra text.
     """
     return prompt.strip()
 
@@ -207,57 +329,104 @@ def parse_response(raw_text):
     else:
         return [raw_text] if raw_text else []
 
-@timeout_with_context(5)
-def generate_single_question_with_timeout(skill_name, difficulty_band, job_id, job_description="", used_question_ids=None):
-    """Generate a single question with timeout - internal function"""
+def generate_question_texts(skill_name, subskills, difficulty_band, job_description="", count=1, deadline=None, tenant=None):
+    """Ask the realtime LLM tier for `count` distinct MCQs and parse them. Pure LLM work, safe to abandon at a deadline."""
+    if count == 1:
+        prompt = generate_single_question_prompt(skill_name, subskills, difficulty_band, job_description)
+    else:
+        prompt = generate_questions_prompt(skill_name, subskills, difficulty_band, job_description, count=count)
+    response = send_prompt(prompt, max_retries=0, deadline=deadline, tier="realtime", tenant=tenant)
+    if not response or not isinstance(response.text, str):
+        return []
+    questions = parse_response(response.text.strip())
+    if not questions:
+        print(f"⚠️ No valid question generated for {skill_name} ({difficulty_band})")
+        return []
+    parsed_questions, seen = [], set()
+    for q in questions:
+        parsed = parse_question(q)
+        if not parsed:
+            print(f"⚠️ Invalid question format for {skill_name} ({difficulty_band})")
+            continue
+        normalized = " ".join(parsed["question"].lower().split())
+        if normalized not in seen:
+            seen.add(normalized)
+            parsed_questions.append(parsed)
+    return parsed_questions[:count]
+
+def generate_single_question_with_timeout(skill_name, difficulty_band, job_id, job_description="", used_question_ids=None,
+                                          timeout=REALTIME_GENERATION_TIMEOUT):
+    """Generate and store a single question within `timeout` seconds.
+
+    LLM calls run on the shared LLM executor under one deadline, coalesced
+    with concurrent requests for the same job, skill and band; the DB work
+    happens here, only once a result arrived in time. Raises LLMCallError
+    subclasses on deadline, open circuit or saturation.
+    """
+    deadline = time.monotonic() + timeout
+    # Live candidates share slots fairly per assessment
+    tenant = f"job:{job_id}"
     skill = Skill.query.filter_by(name=skill_name).first()
     if not skill:
         print(f"⚠️ Skill {skill_name} not found in database.")
         return None
     
     skill_id = skill.skill_id
-    subskills = expand_skills_with_gemini(skill_name)
-    prompt = generate_single_question_prompt(skill_name, subskills, difficulty_band, job_description)
-    
-    chat = model_gemini.start_chat(history=[{"role": "user", "parts": [prompt]}])
-    response = chat.send_message(prompt)
+    # Nothing is written until the LLM answers; don't hold a pooled connection while waiting
+    release_connection()
+    subskills = get_subskills(
+        skill_name,
+        lambda name: llm_executor.call(expand_skills_with_gemini, name, 0, None, deadline, tenant, deadline=deadline)
+    )
+    # Candidates of the same job asking for the same skill/band share one multi-question prompt
+    parsed = question_coalescer.request(
+        (job_id, skill_name, difficulty_band),
+        lambda count, group_deadline: llm_executor.call(
+            generate_question_texts, skill_name, subskills, difficulty_band, job_description, count, group_deadline, tenant,
+            deadline=group_deadline
+        ),
+        deadline
+    )
+    if not parsed:
+        return None
+
+    duplicates, vectors = find_duplicates(job_id, skill_id, [parsed], band=difficulty_band, realtime=True)
+    if duplicates[0] is not None:
+        # Near-duplicate of a stored MCQ: serve that one instead of inserting a copy
+        existing = MCQ.query.get(duplicates[0])
+        print(f"♻️ Generated question for {skill_name} ({difficulty_band}) duplicates mcq_id={existing.mcq_id}")
+        return {
+            "mcq_id": existing.mcq_id,
+            "question": existing.question,
+            "option_a": existing.option_a,
+            "option_b": existing.option_b,
+            "option_c": existing.option_c,
+            "option_d": existing.option_d,
+            "correct_answer": existing.correct_answer
+        }
     
-    if response and isinstance(response.text, str):
-        questions = parse_response(response.text)
-        if not questions:
-            print(f"⚠️ No valid question generated for {skill_name} ({difficulty_band})")
-            return None
-        
-        parsed = parse_question(questions[0])
-        if not parsed:
-            print(f"⚠️ Invalid question format for {skill_name} ({difficulty_band})")
+    row = mcq_row(job_id, skill_id, difficulty_band, parsed)
+    inserted = write_mcqs([row], method="insert")
+    db.session.commit()
+    mcq_id = inserted.get((job_id, row["content_hash"]))
+    if mcq_id is None:
+        # Exact copy of a stored MCQ (e.g. from a concurrent request): serve the stored one
+        mcq_id = existing_mcq_ids(job_id, [row["content_hash"]]).get(row["content_hash"])
+        if mcq_id is None:
             return None
-        
-        mcq = MCQ(
-            job_id=job_id,
-            skill_id=skill_id,
-            question=parsed["question"],
-            option_a=parsed["option_a"],
-            option_b=parsed["option_b"],
-            option_c=parsed["option_c"],
-            option_d=parsed["option_d"],
-            correct_answer=parsed["correct_answer"],
-            difficulty_band=difficulty_band
-        )
-        db.session.add(mcq)
-        db.session.commit()
-        
+    else:
+        add_to_question_bank(job_id, skill_name, difficulty_band, [{**row, "mcq_id": mcq_id}])
+        remember_questions(job_id, skill_id, [mcq_id], vectors, [difficulty_band])
         print(f"✅ Saved real-time question for {skill_name} ({difficulty_band}) to MCQ table")
-        return {
-            "mcq_id": mcq.mcq_id,
-            "question": parsed["question"],
-            "option_a": parsed["option_a"],
-            "option_b": parsed["option_b"],
-            "option_c": parsed["option_c"],
-            "option_d": parsed["option_d"],
-            "correct_answer": parsed["correct_answer"]
-        }
-    return None
+    return {
+        "mcq_id": mcq_id,
+        "question": parsed["question"],
+        "option_a": parsed["option_a"],
+        "option_b": parsed["option_b"],
+        "option_c": parsed["option_c"],
+        "option_d": parsed["option_d"],
+        "correct_answer": parsed["correct_answer"]
+    }
 
 def get_prestored_question(skill_name, difficulty_band, job_id, used_question_ids=None):
     print("used_question_ids:", used_question_ids)
@@ -317,18 +486,13 @@ def generate_single_question(skill_name, difficulty_band, job_id, job_descriptio
             # Try to generate question in real-time with timeout
             result = generate_single_question_with_timeout(skill_name, difficulty_band, job_id, job_description)
             if result:
-                # Compute a hash of the question content to check for duplicates
-                question_content = f"{result['question']}{result['option_a']}{result['option_b']}{result['option_c']}{result['option_d']}"
-                question_hash = hashlib.md5(question_content.encode()).hexdigest()
-                
-                # Check if this question (or its hash) has been used
-                used_hashes = [hashlib.md5(str(q).encode()).hexdigest() for q in used_question_ids if isinstance(q, dict)]
-                if result["mcq_id"] in used_question_ids or question_hash in used_hashes:
-                    print(f"⚠️ Duplicate question detected (mcq_id: {result['mcq_id']}, hash: {question_hash}). Retrying...")
+                # Near-duplicates resolve to the stored MCQ, so an mcq_id check covers repeats
+                if result["mcq_id"] in used_question_ids:
+                    print(f"⚠️ Duplicate question detected (mcq_id: {result['mcq_id']}). Retrying...")
                     continue
                 return result
-        except TimeoutError:
-            print(f"⏰ Real-time generation timed out for {skill_name} ({difficulty_band}). Falling back to pre-stored questions.")
+        except LLMCallError as e:
+            print(f"⏰ Real-time generation skipped for {skill_name} ({difficulty_band}): {e}. Falling back to pre-stored questions.")
             break
         except Exception as e:
             print(f"⚠️ Error in real-time generation for {skill_name} ({difficulty_band}): {e}")
@@ -338,85 +502,292 @@ def generate_single_question(skill_name, difficulty_band, job_id, job_descriptio
     # Fallback to pre-stored questions
     return get_prestored_question(skill_name, difficulty_band, job_id, used_question_ids)
 
-def prepare_question_batches(skills_with_priorities, jd_experience_range, job_id, job_description=""):
+def expand_skill(skill_name, stats=None, subskills=None, tenant=None):
+    """Subskills for one skill. Runs on a generation thread, no DB access.
+
+    `subskills` comes from the subskill cache; when None the skill is expanded with Gemini.
+    """
+    if subskills is None:
+        subskills = expand_skills_with_gemini(skill_name, max_retries=GEMINI_MAX_RETRIES, stats=stats, tenant=tenant)
+    return subskills
+
+def gather_grounding(skill_name, subskills):
+    """Store the skill's topics in the knowledge base and retrieve the top passages for its prompts."""
+    topics = [skill_name] + subskills
+    try:
+        ensure_topics(topics)
+    except Exception as e:
+        db.session.rollback()
+        print(f"⚠️ Could not fetch knowledge for {skill_name}: {e}")
+    return [passage["text"] for passage in retrieve_passages(f"{skill_name}: {', '.join(subskills)}", topics=topics, k=KNOWLEDGE_TOP_K)]
+
+def generate_batch(skill_name, subskills, band, job_description="", stats=None, passages=None, count=QUESTION_BATCH_SIZE,
+                   tenant=None):
+    """Generate and parse one band's batch of questions. Runs on a generation thread, no DB access."""
+    prompt = generate_questions_prompt(skill_name, subskills, band, job_description, passages, count)
+    response = send_prompt(prompt, stats=stats, tenant=tenant)
+    if not response or not isinstance(response.text, str):
+        return [], encode_questions([])
+    questions = parse_response(response.text.strip())
+    print(f"✅ [{band.upper()}] {skill_name}: {len(questions)} questions generated")
+    parsed_questions = []
+    for q in questions:
+        parsed = parse_question(q)
+        if not parsed:
+            print(f"⚠️ Invalid question format for {skill_name} in {band} band: {q}")
+            continue
+        parsed_questions.append(parsed)
+    # Encode here so the calling thread only has to compare vectors
+    return parsed_questions, encode_questions(parsed_questions)
+
+def stream_skill_questions(skill_name, subskills, band_counts, sink, job_description="", stats=None, passages=None, tenant=None):
+    """Generate all requested bands of a skill in one streamed structured response.
+
+    Each valid MCQ goes to `sink(band, parsed, vector)` as soon as its object
+    closes; malformed ones are skipped and bands are capped at their count.
+    Runs on a generation thread, no DB access. Returns questions per band.
+    """
+    prompt = generate_all_bands_prompt(skill_name, subskills, band_counts, job_description, passages)
+    parser = McqStreamParser()
+    received = {band: 0 for band in band_counts}
+    for text in stream_prompt(prompt, stats=stats, tenant=tenant, schema=MCQ_RESPONSE_SCHEMA):
+        for band, parsed in parser.feed(text):
+            if received.get(band, 0) >= band_counts.get(band, 0):
+                continue
+            received[band] += 1
+            # Encode here so the calling thread only has to compare vectors
+            sink(band, parsed, encode_questions([parsed])[0])
+    if parser.invalid:
+        print(f"⚠️ {skill_name}: skipped {parser.invalid} malformed questions")
+    print(f"✅ {skill_name}: {received} questions streamed")
+    return received
+
+def warm_subskill_cache(refresh=False):
+    """Expand every skill in the skills table that has no fresh cached expansion (or all, with refresh)."""
+    skill_names = [skill.name for skill in Skill.query.order_by(Skill.skill_id).all()]
+    if not refresh:
+        skill_names = subskill_cache.stale_skills(skill_names)
+    print(f"🔥 Warming subskill cache for {len(skill_names)} skills")
+    warmed = 0
+    with ThreadPoolExecutor(max_workers=QUESTION_GENERATION_WORKERS, thread_name_prefix="subskill-warmup") as pool:
+        futures = {
+            pool.submit(expand_skills_with_gemini, skill_name, GEMINI_MAX_RETRIES): skill_name
+            for skill_name in skill_names
+        }
+        for future in as_completed(futures):
+            skill_name = futures[future]
+            try:
+                subskills = future.result()
+                subskill_cache.put(skill_name, subskills)
+                warmed += int(bool(subskills))
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Could not warm subskills for {skill_name}: {e}")
+    print(f"✅ Cached subskills for {warmed}/{len(skill_names)} skills")
+    return warmed
+
+def prepare_question_batches(skills_with_priorities, jd_experience_range, job_id, job_description="",
+                             batches=None, progress_callback=None, pool_tags=None, batch_sizes=None, tenant=None):
+    """Build a job's question bank from the shared pool, generating only the shortfall.
+
+    Each (skill, band) batch first takes up to QUESTION_BATCH_SIZE unused pool
+    questions matching `pool_tags`; skills whose batches the pool fills are
+    never sent to the LLM. The rest run skill expansion and generation
+    concurrently through the process-wide rate limiter, and new questions are
+    published back to the pool. In the default all-bands mode each skill is
+    one streamed structured request whose questions are stored as they
+    arrive; per-band mode sends one prompt per batch. `batches` restricts the
+    run to a set of (skill_name, band) pairs and `batch_sizes` maps pairs to a
+    question count other than QUESTION_BATCH_SIZE. LLM calls are scheduled as
+    bank building for `tenant` (the owning recruiter). Finished batches are
+    reported to `progress_callback(skill_name, band, status, questions, error)`;
+    storage and callbacks run on the calling thread. Returns throughput stats.
+    """
     band_ranges = divide_experience_range(jd_experience_range)
-    knowledge_base = {}
-    question_bank = {"good": {}, "better": {}, "perfect": {}}
-    total_questions_saved = 0
-    
+    stats = GenerationStats()
+
+    def wanted_bands(skill_name):
+        return [band for band in BAND_ORDER if batches is None or (skill_name, band) in batches]
+
+    def report(skill_name, band, status, questions=0, error=None):
+        if progress_callback:
+            progress_callback(skill_name, band, status, questions, error)
+
+    skill_ids = {}
     for skill_data in skills_with_priorities:
         skill_name = skill_data["name"]
+        if not wanted_bands(skill_name):
+            continue
         print(f"\n📌 Processing Skill: {skill_name} (Priority: {skill_data['priority']})")
         skill = Skill.query.filter_by(name=skill_name).first()
         if not skill:
             print(f"⚠️ Skill {skill_name} not found in database. Skipping...")
+            for band in wanted_bands(skill_name):
+                report(skill_name, band, "failed", error="Skill not found")
             continue
-        skill_id = skill.skill_id
-        subskills = expand_skills_with_gemini(skill_name)
-        all_topics = [skill_name] + subskills
-        for topic in all_topics:
-            if topic not in knowledge_base:
-                content = fetch_wikipedia_content(topic)
-                if content:
-                    embedding = embedding_model.encode(content)
-                    knowledge_base[topic] = {
-                        "content": content,
-                        "embedding": np.array(embedding)
-                    }
-        
-        for band in ["good", "better", "perfect"]:
-            key = f"{skill_name}"
-            if key not in question_bank[band]:
-                question_bank[band][key] = []
-            
-            prompt = generate_questions_prompt(skill_name, subskills, band, job_description)
+        skill_ids[skill_name] = skill.skill_id
+
+    pooled, shortfall = {}, {}
+    for skill_name, skill_id in skill_ids.items():
+        for band in wanted_bands(skill_name):
+            size = (batch_sizes or {}).get((skill_name, band), QUESTION_BATCH_SIZE)
+            try:
+                pooled[(skill_name, band)] = assign_from_pool(job_id, skill_id, band, size, pool_tags)
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Could not assign pool questions for {skill_name} in {band} band: {e}")
+                pooled[(skill_name, band)] = 0
+            stats.record(pooled=pooled[(skill_name, band)], questions=pooled[(skill_name, band)])
+            if pooled[(skill_name, band)] >= size:
+                print(f"📦 [{band.upper()}] {skill_name}: served entirely from the question pool")
+                report(skill_name, band, "completed", pooled[(skill_name, band)])
+            else:
+                shortfall.setdefault(skill_name, {})[band] = size - pooled[(skill_name, band)]
+
+    def store(skill_name, band, parsed_questions, vectors):
+        """Dedupe, insert and publish generated questions on the calling thread. Returns how many were added.
+
+        The caller invalidates the job's bank once the skill or batch is done.
+        """
+        skill_id = skill_ids[skill_name]
+        try:
+            duplicates, _ = find_duplicates(job_id, skill_id, parsed_questions, vectors)
+        except Exception as e:
+            print(f"⚠️ Dedupe unavailable for {skill_name} in {band} band, keeping all questions: {e}")
+            duplicates = [None] * len(parsed_questions)
+        stats.record(duplicates=sum(duplicate is not None for duplicate in duplicates))
+        candidates = [
+            (mcq_row(job_id, skill_id, band, parsed), vector)
+            for parsed, vector, duplicate in zip(parsed_questions, vectors, duplicates)
+            if duplicate is None
+        ]
+        try:
+            inserted = write_mcqs([row for row, _ in candidates])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        added = []
+        for row, vector in candidates:
+            mcq_id = inserted.pop((job_id, row["content_hash"]), None)
+            if mcq_id is not None:
+                added.append(({**row, "mcq_id": mcq_id}, vector))
+        stats.record(duplicates=len(candidates) - len(added))
+        if added:
+            remember_questions(job_id, skill_id, [row["mcq_id"] for row, _ in added], np.stack([v for _, v in added]), [band] * len(added))
+        stats.record(questions=len(added))
+        try:
+            publish_to_pool([row for row, _ in added], pool_tags)
+        except Exception as e:
+            db.session.rollback()
+            print(f"⚠️ Could not publish {skill_name} ({band}) questions to the pool: {e}")
+        return len(added)
+
+    # All-bands mode: generation threads push each streamed MCQ here and the
+    # calling thread stores whatever has arrived every STREAM_FLUSH_INTERVAL
+    streamed = queue.Queue()
+    stored = {}
+    store_errors = {}
+
+    def flush_streamed():
+        arrived = {}
+        while True:
+            try:
+                skill_name, band, parsed, vector = streamed.get_nowait()
+            except queue.Empty:
+                break
+            arrived.setdefault((skill_name, band), []).append((parsed, vector))
+        for (skill_name, band), items in arrived.items():
             try:
-                chat = model_gemini.start_chat(history=[{"role": "user", "parts": [prompt]}])
-                response = chat.send_message(prompt)
-                
-                if response and isinstance(response.text, str):
-                    raw_text = response.text.strip()
-                    questions = parse_response(raw_text)
-                    print(f"✅ [{band.upper()}] {skill_name}: {len(questions)} questions generated")
-                    
-                    for q in questions:
-                        parsed = parse_question(q)
-                        if not parsed:
-                            print(f"⚠️ Invalid question format for {skill_name} in {band} band: {q}")
-                            continue
-                        
+                added = store(skill_name, band, [parsed for parsed, _ in items], np.stack([vector for _, vector in items]))
+                stored[(skill_name, band)] = stored.get((skill_name, band), 0) + added
+            except Exception as e:
+                print(f"⚠️ Error saving questions to database: {e}")
+                store_errors[(skill_name, band)] = str(e)
+
+    with ThreadPoolExecutor(max_workers=QUESTION_GENERATION_WORKERS, thread_name_prefix="question-generation") as pool:
+        cached_subskills = {skill_name: subskill_cache.get(skill_name) for skill_name in shortfall}
+        pending = {
+            pool.submit(expand_skill, skill_name, stats, cached_subskills[skill_name], tenant): ("expand", skill_name, None)
+            for skill_name in shortfall
+        }
+        while pending:
+            # Everything above committed; hand the connection back while the workers talk to the LLM
+            release_connection()
+            done, _ = wait(pending, timeout=STREAM_FLUSH_INTERVAL, return_when=FIRST_COMPLETED)
+            # Drained before handling finished streams, so their last questions are stored first
+            flush_streamed()
+            for future in done:
+                task, skill_name, band = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if task == "batch":
+                        stats.record(failed_batches=1)
+                        print(f"⚠️ Error generating batch for {skill_name} in {band} band: {e}")
+                        report(skill_name, band, "failed", error=str(e))
+                    elif task == "skill":
+                        print(f"⚠️ Error generating questions for {skill_name}: {e}")
+                        invalidate_question_bank(job_id)
+                        for band in shortfall[skill_name]:
+                            if stored.get((skill_name, band)):
+                                # Questions that streamed in before the failure are kept
+                                report(skill_name, band, "completed", pooled[(skill_name, band)] + stored[(skill_name, band)])
+                            else:
+                                stats.record(failed_batches=1)
+                                report(skill_name, band, "failed", error=str(e))
+                    else:
+                        print(f"⚠️ Error expanding skill {skill_name}: {e}")
+                        for band in shortfall[skill_name]:
+                            stats.record(failed_batches=1)
+                            report(skill_name, band, "failed", error=str(e))
+                    continue
+                if task == "expand":
+                    subskills = result
+                    if cached_subskills[skill_name] is None:
                         try:
-                            mcq = MCQ(
-                                job_id=job_id,
-                                skill_id=skill_id,
-                                question=parsed["question"],
-                                option_a=parsed["option_a"],
-                                option_b=parsed["option_b"],
-                                option_c=parsed["option_c"],
-                                option_d=parsed["option_d"],
-                                correct_answer=parsed["correct_answer"],
-                                difficulty_band=band
-                            )
-                            db.session.add(mcq)
-                            total_questions_saved += 1
-                            print(f"Added MCQ: {parsed['question']} (Band: {band}, Correct Answer: {parsed['correct_answer']})")
+                            subskill_cache.put(skill_name, subskills)
                         except Exception as e:
-                            print(f"⚠️ Error adding MCQ to session for {skill_name} in {band} band: {e}")
-                            print(f"MCQ data: {parsed}")
-            
-            except TooManyRequests:
-                print("⛔️ Gemini quota exceeded. Retrying in 10 seconds...")
-                time.sleep(10)
-            except Exception as e:
-                print(f"⚠️ Error generating batch for {skill_name} in {band} band: {e}")
-            
-            time.sleep(1.5)
-    
-    try:
-        db.session.commit()
-        print(f"✅ {total_questions_saved} questions saved to the database.")
-    except Exception as e:
-        db.session.rollback()
-        print(f"⚠️ Error saving questions to database: {e}")
-    
-    print("\n✅ Question generation completed!")
\ No newline at end of file
+                            db.session.rollback()
+                            print(f"⚠️ Could not cache subskills for {skill_name}: {e}")
+                    passages = gather_grounding(skill_name, subskills)
+                    if QUESTION_GENERATION_MODE == "all_bands":
+                        sink = lambda band, parsed, vector, skill_name=skill_name: streamed.put((skill_name, band, parsed, vector))
+                        future = pool.submit(
+                            stream_skill_questions, skill_name, subskills, shortfall[skill_name], sink,
+                            job_description, stats, passages, tenant
+                        )
+                        pending[future] = ("skill", skill_name, None)
+                    else:
+                        for band, count in shortfall[skill_name].items():
+                            future = pool.submit(generate_batch, skill_name, subskills, band, job_description, stats, passages, count, tenant)
+                            pending[future] = ("batch", skill_name, band)
+                    for band in shortfall[skill_name]:
+                        report(skill_name, band, "running")
+                    continue
+                if task == "skill":
+                    # Once per skill rather than on every flush of streamed questions
+                    invalidate_question_bank(job_id)
+                    for band in shortfall[skill_name]:
+                        key = (skill_name, band)
+                        if key in store_errors and not stored.get(key):
+                            stats.record(failed_batches=1)
+                            report(skill_name, band, "failed", error=store_errors[key])
+                        else:
+                            report(skill_name, band, "completed", pooled[key] + stored.get(key, 0))
+                    continue
+                parsed_questions, vectors = result
+                try:
+                    added = store(skill_name, band, parsed_questions, vectors)
+                except Exception as e:
+                    stats.record(failed_batches=1)
+                    print(f"⚠️ Error saving questions to database: {e}")
+                    report(skill_name, band, "failed", error=str(e))
+                    continue
+                invalidate_question_bank(job_id)
+                report(skill_name, band, "completed", pooled[(skill_name, band)] + added)
+
+    throughput = stats.as_dict()
+    print(f"✅ {throughput['questions']} questions saved to the database.")
+    print(f"\n✅ Question generation completed for job {job_id}: {throughput}")
+    return throughput
@@ -0,0 +1,168 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from flask import current_app
+from app import db
+from app.models.mcq import MCQ
+from app.services.inference import embed_text
+
+logger = logging.getLogger(__name__)
+
+# Cosine similarity above which a new MCQ counts as a repeat of an existing one
+MCQ_DEDUPE_THRESHOLD = float(os.getenv("MCQ_DEDUPE_THRESHOLD", 0.92))
+MCQ_DEDUPE_CACHE_SIZE = int(os.getenv("MCQ_DEDUPE_CACHE_SIZE", 256))
+
+# Cold indexes requested on the real-time path are built here, off the candidate's deadline
+_warm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dedupe-warm")
+
+def mcq_text(question):
+    """Text that identifies an MCQ for dedupe: the question followed by its options."""
+    get = question.get if isinstance(question, dict) else lambda key: getattr(question, key)
+    return "\n".join([get("question"), get("option_a"), get("option_b"), get("option_c"), get("option_d")])
+
+def encode_questions(questions):
+    """L2-normalized MiniLM embeddings for a list of MCQs (dicts or rows), encoded in one batch."""
+    if not questions:
+        return np.empty((0, 0), dtype=np.float32)
+    vectors = np.asarray(embed_text([mcq_text(q) for q in questions]), dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+class DedupeIndex:
+    """Inner-product index over one job and skill's MCQ embeddings, with each MCQ's band.
+
+    Sets are a few hundred items at most, so a NumPy matrix product is as fast
+    as FAISS here. The index catches up with MCQs written by other processes by
+    embedding only the rows it has not seen; `warm` is set after the first
+    full refresh.
+    """
+
+    def __init__(self, job_id, skill_id):
+        self.job_id = job_id
+        self.skill_id = skill_id
+        self.ids = []
+        self.bands = []
+        self.vectors = None
+        self.warm = False
+        self.warming = False
+        self.lock = threading.Lock()
+
+    def _add(self, mcq_ids, bands, vectors):
+        if not len(mcq_ids):
+            return
+        self.ids.extend(mcq_ids)
+        self.bands.extend(bands)
+        self.vectors = vectors if self.vectors is None else np.vstack([self.vectors, vectors])
+
+    def refresh(self):
+        """Embed MCQs for this job and skill the index has not seen yet. Needs an app context."""
+        stored = {mcq_id for (mcq_id,) in db.session.query(MCQ.mcq_id).filter(
+            MCQ.job_id == self.job_id,
+            MCQ.skill_id == self.skill_id
+        )}
+        with self.lock:
+            unseen = stored - set(self.ids)
+        if unseen:
+            rows = MCQ.query.filter(MCQ.mcq_id.in_(unseen)).order_by(MCQ.mcq_id).all()
+            self.remember([row.mcq_id for row in rows], encode_questions(rows), [row.difficulty_band for row in rows])
+        self.warm = True
+
+    def check(self, vectors, threshold=MCQ_DEDUPE_THRESHOLD, band=None):
+        """For each candidate vector, the mcq_id (or -1 for an earlier candidate) it duplicates, else None.
+
+        Candidates are also compared with each other, so a batch cannot repeat
+        itself. With a `band`, only stored MCQs of that band count as matches.
+        """
+        duplicates = [None] * len(vectors)
+        if not len(vectors):
+            return duplicates
+        with self.lock:
+            columns = [k for k, stored_band in enumerate(self.bands) if band is None or stored_band == band]
+            if self.vectors is not None and columns:
+                similarities = vectors @ self.vectors[columns].T
+                best = similarities.argmax(axis=1)
+                for i, j in enumerate(best):
+                    if similarities[i, j] >= threshold:
+                        duplicates[i] = self.ids[columns[j]]
+        within = vectors @ vectors.T
+        for i in range(len(vectors)):
+            if duplicates[i] is not None:
+                continue
+            for j in range(i):
+                if duplicates[j] is None and within[i, j] >= threshold:
+                    duplicates[i] = -1
+                    break
+        return duplicates
+
+    def remember(self, mcq_ids, vectors, bands):
+        """Add newly inserted MCQs without waiting for the next refresh."""
+        with self.lock:
+            known = set(self.ids)
+            fresh = [(mcq_id, vector, band) for mcq_id, vector, band in zip(mcq_ids, vectors, bands) if mcq_id not in known]
+            if fresh:
+                self._add(
+                    [mcq_id for mcq_id, _, _ in fresh],
+                    [band for _, _, band in fresh],
+                    np.stack([vector for _, vector, _ in fresh])
+                )
+
+def _warm(app, index):
+    with app.app_context():
+        try:
+            index.refresh()
+        except Exception as e:
+            logger.warning(f"Could not warm dedupe index for job_id={index.job_id}, skill_id={index.skill_id}: {str(e)}")
+        finally:
+            index.warming = False
+            db.session.remove()
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def get_dedupe_index(job_id, skill_id, refresh=True):
+    """The dedupe index for a job and skill, caught up with the MCQ table. Needs an app context."""
+    key = (job_id, skill_id)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = DedupeIndex(job_id, skill_id)
+        _indexes.move_to_end(key)
+        while len(_indexes) > MCQ_DEDUPE_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    if refresh:
+        index.refresh()
+    return index
+
+def find_duplicates(job_id, skill_id, questions, vectors=None, band=None, realtime=False):
+    """Check candidate MCQs against the job and skill's existing ones.
+
+    Returns (duplicates, vectors): per candidate the mcq_id it repeats (-1 for
+    a repeat within the batch) or None, plus the normalized embeddings so
+    callers can `remember` the ones they insert. With a `band` only MCQs of
+    that band are matched. On the `realtime` path a cold index is not built
+    inline: it is warmed in the background and this check passes everything.
+    """
+    if vectors is None:
+        vectors = encode_questions(questions)
+    index = get_dedupe_index(job_id, skill_id, refresh=False)
+    if realtime and not index.warm:
+        with index.lock:
+            start = not index.warming
+            index.warming = True
+        if start:
+            _warm_executor.submit(_warm, current_app._get_current_object(), index)
+        return [None] * len(vectors), vectors
+    # A warm index only embeds rows other processes added since, usually none
+    index.refresh()
+    duplicates = index.check(vectors, band=band)
+    rejected = sum(duplicate is not None for duplicate in duplicates)
+    if rejected:
+        logger.debug(f"Rejected {rejected}/{len(questions)} near-duplicate MCQs for job_id={job_id}, skill_id={skill_id}")
+    return duplicates, vectors
+
+def remember_questions(job_id, skill_id, mcq_ids, vectors, bands):
+    get_dedupe_index(job_id, skill_id, refresh=False).remember(mcq_ids, vectors, bands)
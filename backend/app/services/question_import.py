@@ -0,0 +1,129 @@
+import os
+import re
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from app import db
+from app.models.skill import Skill
+from app.services.question_bank import BAND_ORDER, invalidate_question_bank
+from app.services.question_pool import content_hash
+from app.services.fix_question_structure import fix_text, clean_entry
+from app.services.mcq_writer import mcq_row, write_mcqs, write_pool_items
+
+logger = logging.getLogger(__name__)
+
+QUESTION_BATCHES_DIR = os.getenv(
+    "QUESTION_BATCHES_DIR", os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..', 'question_batches'))
+)
+
+# LLM list syntax that leaked into the start of stored questions, e.g. '```python [ \"' or ',   "\"'
+LEAKED_PREFIX = re.compile(r'^(```\w*)?[\s,\[\]"\\]*')
+
+def split_batch_name(filename):
+    """'Cloud_Computing_better.json' -> ('Cloud_Computing', 'better'), or None for other files."""
+    stem, ext = os.path.splitext(filename)
+    skill, _, band = stem.rpartition("_")
+    if ext != ".json" or not skill or band not in BAND_ORDER:
+        return None
+    return skill, band
+
+def normalize_item(item):
+    """Validate one {question, options, answer} item as fix_file writes it; returns a parsed question or None."""
+    if not isinstance(item, dict):
+        return None
+    question = LEAKED_PREFIX.sub("", clean_entry(str(item.get("question", "")))).strip()
+    options = [clean_entry(str(option)) for option in item.get("options") or []]
+    answer = clean_entry(str(item.get("answer") or ""))
+    if not question or len(options) != 4 or not all(options) or len(set(options)) != 4:
+        return None
+    if answer not in options:
+        # fix_file marks unparseable answers with an error string instead of an option
+        return None
+    return {
+        "question": question,
+        "option_a": options[0],
+        "option_b": options[1],
+        "option_c": options[2],
+        "option_d": options[3],
+        "correct_answer": "ABCD"[options.index(answer)]
+    }
+
+def load_batch_file(path):
+    """Read and normalize one batch file. Runs in a worker process, no DB access.
+
+    Files that are not valid JSON yet (raw LLM output) go through fix_file's parser.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        raw_text = f.read()
+    try:
+        items = json.loads(raw_text)
+    except json.JSONDecodeError:
+        items = fix_text(raw_text)
+    questions, seen = [], set()
+    for item in items if isinstance(items, list) else []:
+        parsed = normalize_item(item)
+        if parsed is None:
+            continue
+        digest = content_hash(parsed)
+        if digest not in seen:
+            seen.add(digest)
+            questions.append(parsed)
+    return questions, len(items) if isinstance(items, list) else 0
+
+def resolve_skill(name, create=False):
+    """Match a file's skill to the skills table by name, with underscores read as spaces."""
+    candidates = {name.lower(), name.replace("_", " ").lower()}
+    skill = Skill.query.filter(db.func.lower(Skill.name).in_(candidates)).first()
+    if skill is None and create:
+        skill = Skill(name=name.replace("_", " "))
+        db.session.add(skill)
+        db.session.flush()
+    return skill
+
+def import_question_batches(folder=QUESTION_BATCHES_DIR, job_id=None, create_skills=False, workers=None):
+    """Load every <skill>_<band>.json file in `folder` into the shared question pool.
+
+    Files are parsed in parallel and written as each finishes, one transaction
+    per file. With `job_id` the questions are also copied into that job's
+    MCQs. Re-running is safe: content hashes make existing questions no-ops.
+    Returns per-file counts.
+    """
+    files = {}
+    for filename in sorted(os.listdir(folder)):
+        parts = split_batch_name(filename)
+        if parts:
+            files[os.path.join(folder, filename)] = parts
+    print(f"📥 Importing {len(files)} question batch files from {folder}")
+    summary = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(load_batch_file, path): path for path in files}
+        for future in as_completed(futures):
+            path = futures[future]
+            skill_name, band = files[path]
+            name = os.path.basename(path)
+            try:
+                questions, total = future.result()
+                skill = resolve_skill(skill_name, create=create_skills)
+                if skill is None:
+                    print(f"⚠️ Skill {skill_name} not found in database. Skipping {name} (use --create-skills)")
+                    summary[name] = {"read": total, "valid": len(questions), "in_pool": 0, "skipped": "unknown skill"}
+                    continue
+                rows = [{**mcq_row(None, skill.skill_id, band, parsed), "tags": []} for parsed in questions]
+                pool_ids = write_pool_items(rows)
+                added = 0
+                if job_id is not None:
+                    job_rows = [
+                        {**mcq_row(job_id, skill.skill_id, band, parsed), "pool_id": pool_ids.get(content_hash(parsed))}
+                        for parsed in questions
+                    ]
+                    added = len(write_mcqs(job_rows))
+                db.session.commit()
+                summary[name] = {"read": total, "valid": len(questions), "in_pool": len(pool_ids), "job_mcqs": added}
+                print(f"✅ {name}: {len(questions)}/{total} valid questions, {added} added to job")
+            except Exception as e:
+                db.session.rollback()
+                print(f"⚠️ Could not import {name}: {e}")
+                summary[name] = {"error": str(e)}
+    if job_id is not None:
+        invalidate_question_bank(job_id)
+    return summary
@@ -0,0 +1,120 @@
+import os
+import re
+import hashlib
+import logging
+from sqlalchemy import or_, func, update
+from sqlalchemy.dialects.postgresql import insert, array
+from app import db
+from app.models.mcq import MCQ
+from app.models.question_pool_item import QuestionPoolItem
+from app.services.question_bank import invalidate_question_bank
+from app.services.question_dedupe import mcq_text
+
+logger = logging.getLogger(__name__)
+
+QUESTION_POOL_ENABLED = os.getenv("QUESTION_POOL_ENABLED", "True") == "True"
+# Items asked this many times are retired so overexposed questions rotate out
+QUESTION_POOL_MAX_EXPOSURE = int(os.getenv("QUESTION_POOL_MAX_EXPOSURE", 200))
+
+def content_hash(question):
+    """Hash of an MCQ's whitespace- and case-normalized text."""
+    normalized = re.sub(r"\s+", " ", mcq_text(question)).strip().lower()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+def job_pool_tags(job):
+    """Questions generated from a custom prompt only fit that job; generic ones are shared by all."""
+    return [f"job:{job.job_id}"] if job.custom_prompt else []
+
+def assign_from_pool(job_id, skill_id, band, count, tags=None):
+    """Copy up to `count` least-used pool items for skill/band into the job's MCQs. Returns how many.
+
+    Items tagged for other jobs and items the job already has (by pool link or
+    content hash) are skipped; rows go through write_mcqs' ON CONFLICT DO NOTHING.
+    Rows are locked with SKIP LOCKED so concurrent builds pick different items.
+    """
+    if not QUESTION_POOL_ENABLED or count <= 0:
+        return 0
+    assigned = db.session.query(MCQ.pool_id).filter(MCQ.job_id == job_id, MCQ.pool_id.isnot(None))
+    query = QuestionPoolItem.query.filter(
+        QuestionPoolItem.skill_id == skill_id,
+        QuestionPoolItem.difficulty_band == band,
+        QuestionPoolItem.retired.is_(False),
+        ~QuestionPoolItem.pool_id.in_(assigned)
+    )
+    generic = func.jsonb_array_length(QuestionPoolItem.tags) == 0
+    query = query.filter(or_(generic, QuestionPoolItem.tags.op('?|')(array(tags))) if tags else generic)
+    items = query.order_by(
+        QuestionPoolItem.times_assigned + QuestionPoolItem.times_served, QuestionPoolItem.pool_id
+    ).limit(count).with_for_update(skip_locked=True).all()
+    # Imported here: mcq_writer depends on content_hash from this module
+    from app.services.mcq_writer import mcq_row, write_mcqs
+    rows = [mcq_row(job_id, skill_id, band, {
+        "question": item.question,
+        "option_a": item.option_a,
+        "option_b": item.option_b,
+        "option_c": item.option_c,
+        "option_d": item.option_d,
+        "correct_answer": item.correct_answer
+    }, pool_id=item.pool_id) for item in items]
+    inserted = write_mcqs(rows, method="insert")
+    for item, row in zip(items, rows):
+        if (job_id, row["content_hash"]) in inserted:
+            item.times_assigned += 1
+        else:
+            # The job already holds this text unlinked (older rows, failed publish); link it so it is not picked again
+            db.session.execute(update(MCQ).where(
+                MCQ.job_id == job_id, MCQ.content_hash == row["content_hash"], MCQ.pool_id.is_(None)
+            ).values(pool_id=item.pool_id))
+    db.session.commit()
+    if inserted:
+        invalidate_question_bank(job_id)
+        logger.debug(f"Assigned {len(inserted)} pool questions to job_id={job_id} (skill_id={skill_id}, {band})")
+    return len(inserted)
+
+def publish_to_pool(mcqs, tags=None):
+    """Add freshly stored MCQ rows (dicts with mcq_id, see mcq_writer.mcq_row) to the shared pool and link them."""
+    if not QUESTION_POOL_ENABLED or not mcqs:
+        return
+    by_hash = {}
+    for mcq in mcqs:
+        by_hash.setdefault(mcq.get('content_hash') or content_hash(mcq), []).append(mcq)
+    rows = [{
+        'skill_id': group[0]['skill_id'],
+        'difficulty_band': group[0]['difficulty_band'],
+        'question': group[0]['question'],
+        'option_a': group[0]['option_a'],
+        'option_b': group[0]['option_b'],
+        'option_c': group[0]['option_c'],
+        'option_d': group[0]['option_d'],
+        'correct_answer': group[0]['correct_answer'],
+        'content_hash': digest,
+        'tags': tags or [],
+        'times_assigned': 1
+    } for digest, group in by_hash.items()]
+    db.session.execute(insert(QuestionPoolItem).values(rows).on_conflict_do_nothing(index_elements=['content_hash']))
+    pool_ids = dict(db.session.query(QuestionPoolItem.content_hash, QuestionPoolItem.pool_id).filter(
+        QuestionPoolItem.content_hash.in_(list(by_hash))
+    ).all())
+    links = [
+        {'mcq_id': mcq['mcq_id'], 'pool_id': pool_ids[digest]}
+        for digest, group in by_hash.items() if digest in pool_ids
+        for mcq in group
+    ]
+    if links:
+        db.session.execute(update(MCQ), links)
+    db.session.commit()
+
+def record_exposure(mcq_ids):
+    """Count pool items as served once per attempt and retire the overexposed ones."""
+    if not QUESTION_POOL_ENABLED or not mcq_ids:
+        return
+    try:
+        pool_ids = db.session.query(MCQ.pool_id).filter(MCQ.mcq_id.in_(list(mcq_ids)), MCQ.pool_id.isnot(None))
+        QuestionPoolItem.query.filter(QuestionPoolItem.pool_id.in_(pool_ids)).update({
+            QuestionPoolItem.times_served: QuestionPoolItem.times_served + 1,
+            QuestionPoolItem.retired: QuestionPoolItem.times_served + 1 >= QUESTION_POOL_MAX_EXPOSURE
+        }, synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error recording question pool exposure: {str(e)}")
+        db.session.rollback()
@@ -0,0 +1,91 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models.question_prefetch import QuestionPrefetch
+from app.services.question_bank import BAND_ORDER, get_question
+from app.services.question_batches import generate_single_question
+
+logger = logging.getLogger(__name__)
+
+PREFETCH_ENABLED = os.getenv("QUESTION_PREFETCH_ENABLED", "True") == "True"
+PREFETCH_WORKERS = int(os.getenv("QUESTION_PREFETCH_WORKERS", 4))
+
+_executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="question-prefetch")
+_in_flight = set()
+_in_flight_lock = threading.Lock()
+
+def predict_next_questions(state, jd_priorities, served_skill):
+    """Return the skill served next and the bands it may be asked at once the current answer is graded."""
+    ordered = sorted(state['questions_per_skill'].items(), key=lambda x: -jd_priorities.get(x[0], 0))
+    next_skill = next((skill for skill, remaining in ordered if remaining > 0), None)
+    if next_skill is None:
+        return None, []
+    band = state['current_band_per_skill'][next_skill]
+    if next_skill != served_skill:
+        return next_skill, [band]
+    index = BAND_ORDER.index(band)
+    bands = {BAND_ORDER[min(index + 1, len(BAND_ORDER) - 1)], BAND_ORDER[max(index - 1, 0)]}
+    return next_skill, sorted(bands, key=BAND_ORDER.index)
+
+def _prefetch(app, attempt_id, job_id, skill, band, job_description, used_mcq_ids):
+    with app.app_context():
+        try:
+            question_data = generate_single_question(skill, band, job_id, job_description, used_question_ids=used_mcq_ids)
+            if not question_data or question_data["mcq_id"] in used_mcq_ids:
+                return
+            db.session.merge(QuestionPrefetch(
+                attempt_id=attempt_id,
+                skill_name=skill,
+                difficulty_band=band,
+                mcq_id=question_data["mcq_id"]
+            ))
+            db.session.commit()
+            logger.debug(f"Prefetched mcq_id={question_data['mcq_id']} for attempt_id={attempt_id} ({skill}, {band})")
+        except IntegrityError:
+            # Another worker prefetched the same slot first
+            db.session.rollback()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Prefetch failed for attempt_id={attempt_id} ({skill}, {band}): {str(e)}")
+        finally:
+            db.session.remove()
+            with _in_flight_lock:
+                _in_flight.discard((attempt_id, skill, band))
+
+def schedule_prefetch(attempt_id, state, jd_priorities, served_skill):
+    """Start generating the candidate next questions in the background."""
+    if not PREFETCH_ENABLED or state['question_count'] >= state['total_questions']:
+        return
+    skill, bands = predict_next_questions(state, jd_priorities, served_skill)
+    if skill is None:
+        return
+    app = current_app._get_current_object()
+    used_mcq_ids = list(state['asked_questions'])
+    for band in bands:
+        key = (attempt_id, skill, band)
+        with _in_flight_lock:
+            if key in _in_flight:
+                continue
+            _in_flight.add(key)
+        _executor.submit(_prefetch, app, attempt_id, state['job_id'], skill, band, state.get('job_description', ""), used_mcq_ids)
+
+def take_prefetched_question(attempt_id, job_id, skill, band, used_mcq_ids):
+    """Return the prefetched question for skill/band, if one is ready, and discard the other speculations."""
+    prefetch = QuestionPrefetch.query.filter_by(attempt_id=attempt_id, skill_name=skill, difficulty_band=band).first()
+    mcq_id = prefetch.mcq_id if prefetch else None
+    clear_prefetched_questions(attempt_id)
+    if mcq_id is None or mcq_id in used_mcq_ids:
+        return None
+    return get_question(job_id, mcq_id)
+
+def clear_prefetched_questions(attempt_id):
+    try:
+        QuestionPrefetch.query.filter_by(attempt_id=attempt_id).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception as e:
+        logger.error(f"Error clearing prefetched questions for attempt_id={attempt_id}: {str(e)}")
+        db.session.rollback()
@@ -0,0 +1,181 @@
+import os
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from app import db
+from app.models.mcq import MCQ
+from app.models.skill import Skill
+from app.models.job import JobDescription
+from app.models.required_skill import RequiredSkill
+from app.models.assessment_registration import AssessmentRegistration
+from app.services.question_bank import BAND_ORDER
+from app.services.bank_generation import enqueue_bank_generation, is_generation_active
+
+logger = logging.getLogger(__name__)
+
+RESERVOIR_ENABLED = os.getenv("QUESTION_RESERVOIR_ENABLED", "True") == "True"
+# Target depth per (skill, band): one candidate's full share of the skill, plus headroom and
+# a little extra per registered candidate so large cohorts see more varied questions
+RESERVOIR_HEADROOM = float(os.getenv("QUESTION_RESERVOIR_HEADROOM", 0.5))
+RESERVOIR_PER_CANDIDATE = float(os.getenv("QUESTION_RESERVOIR_PER_CANDIDATE", 0.1))
+RESERVOIR_MAX_DEPTH = int(os.getenv("QUESTION_RESERVOIR_MAX_DEPTH", 200))
+# A bucket is refilled once stock falls below this fraction of its target
+RESERVOIR_LOW_WATER = float(os.getenv("QUESTION_RESERVOIR_LOW_WATER", 0.5))
+# The sweep tops up assessments starting within this many hours, earliest first
+RESERVOIR_LEAD_HOURS = float(os.getenv("QUESTION_RESERVOIR_LEAD_HOURS", 24))
+RESERVOIR_SWEEP_INTERVAL = float(os.getenv("QUESTION_RESERVOIR_SWEEP_INTERVAL", 60))
+RESERVOIR_MAX_REFILLS_PER_SWEEP = int(os.getenv("QUESTION_RESERVOIR_MAX_REFILLS_PER_SWEEP", 5))
+RESERVOIR_TARGET_TTL = float(os.getenv("QUESTION_RESERVOIR_TARGET_TTL", 300))
+
+def split_questions(jd_priorities, total_questions):
+    """Questions each skill gets in one attempt, proportional to its priority."""
+    priority_sum = sum(jd_priorities.values()) or 1
+    return {
+        skill: max(1, round((priority / priority_sum) * total_questions))
+        for skill, priority in jd_priorities.items()
+    }
+
+def target_depth(per_skill, registrations):
+    """Questions a (skill, band) bucket should hold.
+
+    A candidate whose band never moves takes the skill's whole share from a
+    single bucket, so that is the floor for every band.
+    """
+    depth = per_skill * (1 + RESERVOIR_HEADROOM) + registrations * RESERVOIR_PER_CANDIDATE
+    return min(RESERVOIR_MAX_DEPTH, math.ceil(depth))
+
+def get_job_targets(job):
+    required_skills = RequiredSkill.query.filter_by(job_id=job.job_id).join(Skill, Skill.skill_id == RequiredSkill.skill_id).all()
+    jd_priorities = {rs.skill.name: rs.priority for rs in required_skills}
+    registrations = AssessmentRegistration.query.filter_by(job_id=job.job_id).count()
+    return {
+        skill: target_depth(per_skill, registrations)
+        for skill, per_skill in split_questions(jd_priorities, job.num_questions).items()
+    }
+
+def get_bucket_stock(job_id):
+    """Stored MCQs per (skill_name, band) for a job."""
+    rows = db.session.query(Skill.name, MCQ.difficulty_band, func.count(MCQ.mcq_id)).join(
+        Skill, MCQ.skill_id == Skill.skill_id
+    ).filter(MCQ.job_id == job_id).group_by(Skill.name, MCQ.difficulty_band).all()
+    return {(skill_name, band): count for skill_name, band, count in rows}
+
+class QuestionReservoir:
+    """Keeps every (job, skill, band) bucket stocked ahead of demand.
+
+    Live attempts report what they have left through observe(); a bucket
+    running low for any of them is queued for a background refill, so
+    /next-question only ever reads stored questions. sweep() tops up upcoming
+    assessments ahead of schedule_start so generation is spread out instead
+    of landing when every candidate starts at once.
+    """
+
+    def __init__(self):
+        self.targets = {}
+        self.unused = {}
+        self.lock = threading.Lock()
+
+    def get_targets(self, job_id):
+        with self.lock:
+            cached = self.targets.get(job_id)
+        if cached and time.monotonic() - cached[0] < RESERVOIR_TARGET_TTL:
+            return cached[1]
+        job = JobDescription.query.get(job_id)
+        targets = get_job_targets(job) if job else {}
+        with self.lock:
+            self.targets[job_id] = (time.monotonic(), targets)
+        return targets
+
+    def observe(self, state, question_bank):
+        """Record an attempt's unused stock per bucket and queue refills for low ones.
+
+        A bucket is low when it cannot cover the skill's remaining questions
+        plus the low-water margin for this attempt.
+        """
+        if not RESERVOIR_ENABLED:
+            return
+        job_id = state['job_id']
+        targets = self.get_targets(job_id)
+        used = set(state['asked_questions'])
+        low = {}
+        for skill, remaining in state['questions_per_skill'].items():
+            if remaining <= 0:
+                continue
+            target = targets.get(skill, remaining)
+            for band in BAND_ORDER:
+                stock = question_bank.index.get(band, {}).get(skill, ())
+                unused = sum(1 for mcq_id in stock if mcq_id not in used)
+                with self.lock:
+                    key = (job_id, skill, band)
+                    self.unused[key] = min(unused, self.unused.get(key, unused))
+                if unused < remaining + math.ceil(target * RESERVOIR_LOW_WATER):
+                    low[(skill, band)] = max(1, target - unused)
+        if low:
+            self.refill(job_id, low)
+
+    def refill(self, job_id, batch_sizes):
+        """Queue generation for low buckets unless a run for the job is already queued or running."""
+        if is_generation_active(job_id):
+            return None
+        job = JobDescription.query.get(job_id)
+        if job is None:
+            return None
+        bank_job = enqueue_bank_generation(job, batches=list(batch_sizes), mode='refill', batch_sizes=batch_sizes)
+        with self.lock:
+            for skill, band in batch_sizes:
+                self.unused.pop((job_id, skill, band), None)
+        logger.info(f"Queued reservoir refill for job_id={job_id}: {len(batch_sizes)} buckets (background job {bank_job.job_id})")
+        return bank_job
+
+    def sweep(self):
+        """Top up assessments that are running or start within the lead window. Returns refills queued."""
+        now = datetime.utcnow()
+        jobs = JobDescription.query.filter(
+            JobDescription.status == 'active',
+            JobDescription.schedule_start <= now + timedelta(hours=RESERVOIR_LEAD_HOURS),
+            JobDescription.schedule_end >= now
+        ).order_by(JobDescription.schedule_start).all()
+        queued = 0
+        for job in jobs:
+            if queued >= RESERVOIR_MAX_REFILLS_PER_SWEEP:
+                break
+            targets = get_job_targets(job)
+            with self.lock:
+                self.targets[job.job_id] = (time.monotonic(), targets)
+            stock = get_bucket_stock(job.job_id)
+            deficits = {
+                (skill, band): target - stock.get((skill, band), 0)
+                for skill, target in targets.items()
+                for band in BAND_ORDER
+                if stock.get((skill, band), 0) < target * RESERVOIR_LOW_WATER
+            }
+            if deficits and self.refill(job.job_id, deficits):
+                queued += 1
+        return queued
+
+    def metrics(self):
+        with self.lock:
+            return {
+                f"{job_id}:{skill}:{band}": unused
+                for (job_id, skill, band), unused in self.unused.items()
+            }
+
+question_reservoir = QuestionReservoir()
+
+def run_reservoir_manager(app, interval=RESERVOIR_SWEEP_INTERVAL):
+    """Sweep periodically until interrupted. One instance per deployment is enough."""
+    with app.app_context():
+        logger.info(f"Question reservoir manager started, sweeping every {interval:.0f}s")
+        while True:
+            try:
+                queued = question_reservoir.sweep()
+                if queued:
+                    logger.info(f"Reservoir sweep queued {queued} refills")
+            except Exception as e:
+                logger.error(f"Reservoir sweep failed: {str(e)}")
+                db.session.rollback()
+            db.session.remove()
+            time.sleep(interval)
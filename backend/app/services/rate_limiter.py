@@ -0,0 +1,84 @@
+import time
+import random
+import threading
+
+class TokenBucket:
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.level = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Seconds until `amount` is available (amounts above capacity wait for a full bucket)."""
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / self.refill_per_second) if self.refill_per_second else float("inf")
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits shared by every thread in the process."""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=0, headroom=0, timeout=None):
+        """Block until one request and `tokens` tokens are available. Returns the seconds waited.
+
+        `headroom` requests are left in the bucket for callers that pass none,
+        so lower-priority work cannot drain the quota ahead of them. With a
+        `timeout`, returns None without taking anything once it would be exceeded.
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+                delay = max(self.requests.wait_time(1 + headroom), self.tokens.wait_time(tokens))
+                if delay <= 0:
+                    self.requests.level -= 1
+                    # Oversized requests may overdraw; the debt delays later callers
+                    self.tokens.level -= tokens
+                    return waited
+            if timeout is not None and waited + delay > timeout:
+                return None
+            time.sleep(delay)
+            waited += delay
+
+    def try_acquire(self, tokens=0):
+        """Take one request and `tokens` tokens only if they are available right now."""
+        with self.lock:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            if self.requests.wait_time(1) > 0 or self.tokens.wait_time(tokens) > 0:
+                return False
+            self.requests.level -= 1
+            self.tokens.level -= tokens
+            return True
+
+    def settle(self, estimated_tokens, actual_tokens):
+        """Correct the token bucket once a response reports its real usage."""
+        with self.lock:
+            self.tokens.level += estimated_tokens - actual_tokens
+
+    def refund(self, tokens=0):
+        """Give back a request and its token estimate that were acquired but never sent."""
+        with self.lock:
+            self.requests.level = min(self.requests.capacity, self.requests.level + 1)
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + tokens)
+
+    def throttle(self):
+        """Empty the request bucket after a 429 so every caller slows down, not just the one that was refused."""
+        with self.lock:
+            self.requests.refill(time.monotonic())
+            self.requests.level = min(self.requests.level, 0.0)
+
+def backoff_delay(attempt, base=2.0, cap=60.0):
+    """Exponential backoff with full jitter."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
@@ -0,0 +1,85 @@
+import os
+import logging
+import threading
+from app.services.llm_executor import DeadlineExceeded, remaining_seconds
+
+logger = logging.getLogger(__name__)
+
+# How long the first request for a key waits for others to join before the call goes out
+COALESCE_WINDOW = float(os.getenv("LLM_COALESCE_WINDOW", 0.05))
+COALESCE_MAX_BATCH = int(os.getenv("LLM_COALESCE_MAX_BATCH", 10))
+
+class _Group:
+    def __init__(self, deadline):
+        self.size = 1
+        self.deadline = deadline
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = []
+        self.error = None
+
+class RequestCoalescer:
+    """Merges concurrent requests for the same key into one call that returns several results.
+
+    The first caller for a key becomes the leader: it waits up to the window
+    for others to join, then runs `fetch(count, deadline)` once and hands one
+    distinct result to each caller. Callers past the results get None.
+    """
+
+    def __init__(self, window=COALESCE_WINDOW, max_batch=COALESCE_MAX_BATCH):
+        self.window = window
+        self.max_batch = max_batch
+        self.groups = {}
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "calls": 0, "coalesced": 0, "short": 0}
+
+    def request(self, key, fetch, deadline=None):
+        with self.lock:
+            self.counts["requests"] += 1
+            group = self.groups.get(key)
+            if group is not None:
+                index = group.size
+                group.size += 1
+                self.counts["coalesced"] += 1
+                if group.size >= self.max_batch:
+                    # Full: later callers start a new group
+                    del self.groups[key]
+                    group.full.set()
+            else:
+                group = self.groups[key] = _Group(deadline)
+                index = 0
+        if index:
+            return self._follow(group, index, deadline)
+        return self._lead(key, group, fetch)
+
+    def _lead(self, key, group, fetch):
+        window = self.window if group.deadline is None else min(self.window, remaining_seconds(group.deadline))
+        group.full.wait(window)
+        with self.lock:
+            if self.groups.get(key) is group:
+                del self.groups[key]
+            count = group.size
+            self.counts["calls"] += 1
+        try:
+            group.results = fetch(count, group.deadline) or []
+            if len(group.results) < count:
+                with self.lock:
+                    self.counts["short"] += count - len(group.results)
+        except Exception as e:
+            group.error = e
+        finally:
+            group.done.set()
+        if group.error is not None:
+            raise group.error
+        return group.results[0] if group.results else None
+
+    def _follow(self, group, index, deadline):
+        if not group.done.wait(remaining_seconds(deadline)):
+            raise DeadlineExceeded("Coalesced LLM request did not finish before the deadline")
+        if group.error is not None:
+            raise group.error
+        return group.results[index] if index < len(group.results) else None
+
+    def metrics(self):
+        with self.lock:
+            return dict(self.counts)
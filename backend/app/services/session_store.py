@@ -0,0 +1,363 @@
+import os
+import json
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import flag_modified
+from app import db
+from app.models.assessment_state import AssessmentState
+from app.models.assessment_state_event import AssessmentStateEvent
+from app.models.assessment_attempt import AssessmentAttempt
+from app.services.state_deltas import diff_state, apply_ops, copy_state, encoded_size
+
+logger = logging.getLogger(__name__)
+
+# Session store configuration
+SESSION_BACKEND = os.getenv("ASSESSMENT_SESSION_BACKEND", "postgres")
+SESSION_REDIS_URL = os.getenv("ASSESSMENT_SESSION_REDIS_URL", "redis://localhost:6379/0")
+SESSION_TTL = int(os.getenv("ASSESSMENT_SESSION_TTL", 6 * 60 * 60))
+SESSION_CACHE_TTL = float(os.getenv("ASSESSMENT_SESSION_CACHE_TTL", 30))
+SESSION_CACHE_SIZE = int(os.getenv("ASSESSMENT_SESSION_CACHE_SIZE", 1024))
+SESSION_DELTAS = os.getenv("ASSESSMENT_SESSION_DELTAS", "True") == "True"
+SESSION_COMPACT_EVERY = int(os.getenv("ASSESSMENT_SESSION_COMPACT_EVERY", 25))
+
+def replay_events(attempt_id, state):
+    """Apply the attempt's un-compacted delta events newer than the state's version, in place."""
+    events = AssessmentStateEvent.query.filter(
+        AssessmentStateEvent.attempt_id == attempt_id,
+        AssessmentStateEvent.version > state.get('_version', 0)
+    ).order_by(AssessmentStateEvent.version).all()
+    for event in events:
+        apply_ops(state, event.ops)
+        state['_version'] = event.version
+    return state
+
+def load_saved_state(attempt_id):
+    """The durable state of an attempt, with pending deltas applied, whatever its status."""
+    assessment_state = AssessmentState.query.get(attempt_id)
+    if not assessment_state:
+        return None
+    return replay_events(attempt_id, copy_state(assessment_state.state))
+
+class SessionStore(ABC):
+    """Base class for live assessment session backends."""
+    # True when save() already writes the durable AssessmentState row
+    persists_to_db = False
+
+    @abstractmethod
+    def get(self, attempt_id):
+        pass
+
+    @abstractmethod
+    def save(self, attempt_id, state):
+        """Persist the state; return False if the write failed."""
+
+    @abstractmethod
+    def delete(self, attempt_id):
+        pass
+
+    @abstractmethod
+    def version(self, attempt_id):
+        """Return a cheap change counter for the session, or None if it does not exist."""
+
+class InProcessSessionStore(SessionStore):
+    """Per-process dict store. Only safe with a single worker."""
+
+    def __init__(self, ttl=SESSION_TTL):
+        self.ttl = ttl
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _purge_expired(self, now):
+        expired = [key for key, (_, expires_at) in self._sessions.items() if expires_at <= now]
+        for key in expired:
+            del self._sessions[key]
+
+    def get(self, attempt_id):
+        now = time.time()
+        with self._lock:
+            self._purge_expired(now)
+            entry = self._sessions.get(attempt_id)
+            return entry[0] if entry else None
+
+    def save(self, attempt_id, state):
+        with self._lock:
+            state['_version'] = state.get('_version', 0) + 1
+            self._sessions[attempt_id] = (state, time.time() + self.ttl)
+        return True
+
+    def delete(self, attempt_id):
+        with self._lock:
+            self._sessions.pop(attempt_id, None)
+
+    def version(self, attempt_id):
+        with self._lock:
+            entry = self._sessions.get(attempt_id)
+            return entry[0].get('_version', 0) if entry else None
+
+class PostgresSessionStore(SessionStore):
+    """Store sessions in the assessment_states table, shared by every worker.
+
+    In incremental mode each save appends only the changed fields as a row in
+    assessment_state_events instead of rewriting the whole JSONB state. The
+    events are folded back into assessment_states every `compact_every`
+    versions and when the session ends.
+    """
+    persists_to_db = True
+
+    def __init__(self, incremental=SESSION_DELTAS, compact_every=SESSION_COMPACT_EVERY, max_baselines=SESSION_CACHE_SIZE):
+        self.incremental = incremental
+        self.compact_every = compact_every
+        self.max_baselines = max_baselines
+        # Detached copy of the last persisted state per attempt, used to compute deltas
+        self._baselines = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            "saves": 0,
+            "delta_writes": 0,
+            "snapshot_writes": 0,
+            "bytes_written": 0,
+            "full_state_bytes": 0
+        }
+
+    def _live_query(self, attempt_id):
+        return db.session.query(AssessmentState).join(
+            AssessmentAttempt, AssessmentAttempt.attempt_id == AssessmentState.attempt_id
+        ).filter(
+            AssessmentState.attempt_id == attempt_id,
+            AssessmentAttempt.status == 'started'
+        )
+
+    def _load(self, attempt_id, live_only=True):
+        query = self._live_query(attempt_id) if live_only else AssessmentState.query.filter_by(attempt_id=attempt_id)
+        assessment_state = query.first()
+        if not assessment_state:
+            return None
+        return replay_events(attempt_id, copy_state(assessment_state.state))
+
+    def _remember_baseline(self, attempt_id, state):
+        with self._lock:
+            self._baselines[attempt_id] = copy_state(state)
+            self._baselines.move_to_end(attempt_id)
+            while len(self._baselines) > self.max_baselines:
+                self._baselines.popitem(last=False)
+
+    def _record_write(self, attempt_id, kind, size, state):
+        full_size = encoded_size(state)
+        self.stats["saves"] += 1
+        self.stats[f"{kind}_writes"] += 1
+        self.stats["bytes_written"] += size
+        self.stats["full_state_bytes"] += full_size
+        logger.debug(f"Persisted {kind} of {size} bytes (full state {full_size} bytes) for attempt_id={attempt_id}")
+
+    def get(self, attempt_id):
+        state = self._load(attempt_id)
+        if state is not None and self.incremental:
+            self._remember_baseline(attempt_id, state)
+        return state
+
+    def save(self, attempt_id, state):
+        if not self.incremental:
+            return self._write_snapshot(attempt_id, state)
+        with self._lock:
+            baseline = self._baselines.get(attempt_id)
+        if baseline is None or baseline.get('_version', 0) != state.get('_version', 0):
+            # Without the state this one was derived from there is nothing to diff against
+            return self._write_snapshot(attempt_id, state)
+        ops = diff_state(baseline, state)
+        if ops:
+            return self._append_event(attempt_id, state, ops)
+        return True
+
+    def _append_event(self, attempt_id, state, ops):
+        for _ in range(3):
+            version = state.get('_version', 0) + 1
+            try:
+                db.session.add(AssessmentStateEvent(attempt_id=attempt_id, version=version, ops=ops))
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                # Another worker persisted this version first; replay our changes on top of theirs
+                latest = self._load(attempt_id, live_only=False)
+                if latest is None:
+                    break
+                apply_ops(latest, ops)
+                state.clear()
+                state.update(latest)
+                continue
+            except Exception as e:
+                logger.error(f"Error saving assessment state delta for attempt_id={attempt_id}: {str(e)}")
+                db.session.rollback()
+                return False
+            state['_version'] = version
+            self._record_write(attempt_id, "delta", encoded_size(ops), state)
+            self._remember_baseline(attempt_id, state)
+            if version % self.compact_every == 0:
+                self.compact(attempt_id, state)
+            return True
+        logger.error(f"Could not append assessment state delta for attempt_id={attempt_id}, writing full state")
+        return self._write_snapshot(attempt_id, state)
+
+    def _write_snapshot(self, attempt_id, state, bump_version=True):
+        if bump_version:
+            state['_version'] = state.get('_version', 0) + 1
+        try:
+            assessment_state = AssessmentState.query.get(attempt_id)
+            if assessment_state:
+                assessment_state.state = state
+                flag_modified(assessment_state, 'state')
+            else:
+                assessment_state = AssessmentState(attempt_id=attempt_id, state=state)
+                db.session.add(assessment_state)
+            AssessmentStateEvent.query.filter(
+                AssessmentStateEvent.attempt_id == attempt_id,
+                AssessmentStateEvent.version <= state['_version']
+            ).delete(synchronize_session=False)
+            db.session.commit()
+            self._record_write(attempt_id, "snapshot", encoded_size(state), state)
+            if self.incremental:
+                self._remember_baseline(attempt_id, state)
+            return True
+        except Exception as e:
+            logger.error(f"Error saving assessment state for attempt_id={attempt_id}: {str(e)}")
+            db.session.rollback()
+            return False
+
+    def compact(self, attempt_id, state=None):
+        """Fold pending deltas into the assessment_states row."""
+        if state is None:
+            state = self._load(attempt_id, live_only=False)
+            if state is None:
+                return
+        self._write_snapshot(attempt_id, copy_state(state), bump_version=False)
+
+    def delete(self, attempt_id):
+        # The row is kept as the durable record; the session stops being live
+        # once the attempt leaves the 'started' status.
+        if self.incremental:
+            self.compact(attempt_id)
+        with self._lock:
+            self._baselines.pop(attempt_id, None)
+
+    def version(self, attempt_id):
+        row = self._live_query(attempt_id).with_entities(
+            AssessmentState.state['_version'].astext
+        ).first()
+        if row is None:
+            return None
+        latest_event = db.session.query(db.func.max(AssessmentStateEvent.version)).filter(
+            AssessmentStateEvent.attempt_id == attempt_id
+        ).scalar()
+        return max(int(row[0] or 0), latest_event or 0)
+
+class RedisSessionStore(SessionStore):
+    """Store sessions in any server speaking the Redis protocol."""
+
+    def __init__(self, url=SESSION_REDIS_URL, ttl=SESSION_TTL, client=None):
+        if client is None:
+            import redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+
+    def _state_key(self, attempt_id):
+        return f"assessment:session:{attempt_id}"
+
+    def _version_key(self, attempt_id):
+        return f"assessment:session:{attempt_id}:version"
+
+    def get(self, attempt_id):
+        raw = self.client.get(self._state_key(attempt_id))
+        return json.loads(raw) if raw else None
+
+    def save(self, attempt_id, state):
+        pipe = self.client.pipeline()
+        pipe.incr(self._version_key(attempt_id))
+        pipe.expire(self._version_key(attempt_id), self.ttl)
+        version = pipe.execute()[0]
+        state['_version'] = version
+        self.client.set(self._state_key(attempt_id), json.dumps(state), ex=self.ttl)
+        return True
+
+    def delete(self, attempt_id):
+        self.client.delete(self._state_key(attempt_id), self._version_key(attempt_id))
+
+    def version(self, attempt_id):
+        raw = self.client.get(self._version_key(attempt_id))
+        return int(raw) if raw is not None else None
+
+class CachedSessionStore(SessionStore):
+    """Local TTL cache in front of a shared backend.
+
+    A cached state is only reused while its TTL holds and its version still
+    matches the backend, so a worker never serves a state another worker has
+    already moved past. The cache holds its own copy: callers get a copy they
+    may mutate freely, and only a successful save() updates the cache.
+    """
+
+    def __init__(self, backend, ttl=SESSION_CACHE_TTL, max_entries=SESSION_CACHE_SIZE):
+        self.backend = backend
+        self.persists_to_db = backend.persists_to_db
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, attempt_id, state):
+        with self._lock:
+            self._cache[attempt_id] = (copy_state(state), state.get('_version', 0), time.time() + self.ttl)
+            self._cache.move_to_end(attempt_id)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def get(self, attempt_id):
+        with self._lock:
+            entry = self._cache.get(attempt_id)
+        if entry:
+            state, cached_version, expires_at = entry
+            if expires_at > time.time() and self.backend.version(attempt_id) == cached_version:
+                self.hits += 1
+                return copy_state(state)
+        self.misses += 1
+        state = self.backend.get(attempt_id)
+        if state is None:
+            self._forget(attempt_id)
+            return None
+        self._remember(attempt_id, state)
+        return state
+
+    def save(self, attempt_id, state):
+        if not self.backend.save(attempt_id, state):
+            # Other workers never see a failed write; don't keep serving it here
+            self._forget(attempt_id)
+            return False
+        self._remember(attempt_id, state)
+        return True
+
+    def delete(self, attempt_id):
+        self.backend.delete(attempt_id)
+        self._forget(attempt_id)
+
+    def version(self, attempt_id):
+        return self.backend.version(attempt_id)
+
+    def _forget(self, attempt_id):
+        with self._lock:
+            self._cache.pop(attempt_id, None)
+
+def create_session_store(backend=SESSION_BACKEND):
+    """Build the configured session store."""
+    if backend == "memory":
+        return InProcessSessionStore()
+    if backend == "postgres":
+        return CachedSessionStore(PostgresSessionStore())
+    if backend == "redis":
+        return CachedSessionStore(RedisSessionStore())
+    raise ValueError(f"Unknown assessment session backend: {backend}")
+
+session_store = create_session_store()
@@ -0,0 +1,67 @@
+import json
+
+# Compact delta operations recorded against an assessment state.
+#   ["s", path, value]  set the value at path
+#   ["a", path, items]  extend the list at path with items
+#   ["d", path]         delete the key at path
+SET, APPEND, DELETE = "s", "a", "d"
+
+# Bookkeeping keys that are tracked by the store itself
+IGNORED_KEYS = {"_version"}
+
+def copy_state(state):
+    """Detached deep copy of a JSON-serializable state."""
+    return json.loads(json.dumps(state))
+
+def diff_state(old, new, path=None, ops=None):
+    """Return the list of operations that turn `old` into `new`."""
+    if path is None:
+        path = []
+    if ops is None:
+        ops = []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, value in new.items():
+            if not path and key in IGNORED_KEYS:
+                continue
+            if key not in old:
+                ops.append([SET, path + [key], value])
+            else:
+                diff_state(old[key], value, path + [key], ops)
+        for key in old:
+            if key not in new and not (not path and key in IGNORED_KEYS):
+                ops.append([DELETE, path + [key]])
+    elif isinstance(old, list) and isinstance(new, list):
+        if len(new) >= len(old) and new[:len(old)] == old:
+            if len(new) > len(old):
+                ops.append([APPEND, path, new[len(old):]])
+        else:
+            ops.append([SET, path, new])
+    elif old != new or type(old) is not type(new):
+        ops.append([SET, path, new])
+    return ops
+
+def apply_ops(state, ops):
+    """Apply operations produced by diff_state to `state` in place and return it."""
+    for op in ops:
+        kind, path = op[0], op[1]
+        if not path:
+            if kind == SET:
+                state.clear()
+                state.update(op[2])
+            continue
+        parent = state
+        for key in path[:-1]:
+            parent = parent[key]
+        last = path[-1]
+        if kind == SET:
+            parent[last] = op[2]
+        elif kind == APPEND:
+            parent[last].extend(op[2])
+        elif kind == DELETE:
+            parent.pop(last, None)
+    return state
+
+def encoded_size(value):
+    """Size in bytes of the JSON encoding written to the database."""
+    return len(json.dumps(value, separators=(",", ":")).encode("utf-8"))
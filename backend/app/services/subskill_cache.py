@@ -0,0 +1,94 @@
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from sqlalchemy.dialects.postgresql import insert
+from app import db
+from app.models.skill_expansion import SkillExpansion
+from app.services.db_pool import release_connection
+
+logger = logging.getLogger(__name__)
+
+SUBSKILL_CACHE_TTL = int(os.getenv("SUBSKILL_CACHE_TTL", 30 * 24 * 60 * 60))
+SUBSKILL_CACHE_SIZE = int(os.getenv("SUBSKILL_CACHE_SIZE", 512))
+
+class SubskillCache:
+    """In-process LRU of skill -> subskills in front of the skill_expansions table."""
+
+    def __init__(self, max_entries=SUBSKILL_CACHE_SIZE, ttl=SUBSKILL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"local_hits": 0, "db_hits": 0, "misses": 0}
+
+    def _key(self, skill_name):
+        return skill_name.strip().lower()
+
+    def _remember(self, key, subskills, expires_at):
+        with self.lock:
+            self.entries[key] = (expires_at, subskills)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def get(self, skill_name):
+        """Cached subskills for a skill, or None. Needs an app context on a DB miss."""
+        key = self._key(skill_name)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] > time.time():
+                self.entries.move_to_end(key)
+                self.stats["local_hits"] += 1
+                return list(entry[1])
+        row = SkillExpansion.query.get(key)
+        if row and row.updated_at > datetime.utcnow() - timedelta(seconds=self.ttl):
+            expires_at = time.time() + self.ttl - (datetime.utcnow() - row.updated_at).total_seconds()
+            self._remember(key, row.subskills, expires_at)
+            with self.lock:
+                self.stats["db_hits"] += 1
+            return list(row.subskills)
+        with self.lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, skill_name, subskills):
+        """Persist an expansion. Empty results (quota errors) are not cached."""
+        if not subskills:
+            return
+        key = self._key(skill_name)
+        statement = insert(SkillExpansion).values(skill_name=key, subskills=subskills, updated_at=datetime.utcnow())
+        db.session.execute(statement.on_conflict_do_update(
+            index_elements=[SkillExpansion.skill_name],
+            set_={"subskills": statement.excluded.subskills, "updated_at": statement.excluded.updated_at}
+        ))
+        db.session.commit()
+        self._remember(key, list(subskills), time.time() + self.ttl)
+
+    def stale_skills(self, skill_names):
+        """The subset of skill_names without a fresh expansion in the table."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        fresh = {
+            row.skill_name for row in SkillExpansion.query.filter(
+                SkillExpansion.skill_name.in_([self._key(name) for name in skill_names]),
+                SkillExpansion.updated_at > cutoff
+            )
+        }
+        return [name for name in skill_names if self._key(name) not in fresh]
+
+subskill_cache = SubskillCache()
+
+def get_subskills(skill_name, expand):
+    """Cached subskills for a skill, calling `expand(skill_name)` and storing the result on a miss."""
+    subskills = subskill_cache.get(skill_name)
+    if subskills is None:
+        release_connection()
+        subskills = expand(skill_name)
+        try:
+            subskill_cache.put(skill_name, subskills)
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Could not cache subskills for {skill_name}: {str(e)}")
+    return subskills
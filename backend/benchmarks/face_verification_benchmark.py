@@ -0,0 +1,52 @@
+"""Compare snapshot verification throughput: per-file DeepFace.verify loop vs the batch API.
+
+Usage: python benchmarks/face_verification_benchmark.py <reference_image> <snapshot_dir> [workers]
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from deepface import DeepFace
+from app.services.face_batch import embed_images, cosine_distances
+
+def per_file_loop(reference_path, snapshot_paths):
+    for snapshot_path in snapshot_paths:
+        DeepFace.extract_faces(img_path=snapshot_path, enforce_detection=False)
+        DeepFace.extract_faces(img_path=reference_path, enforce_detection=False)
+        DeepFace.verify(img1_path=reference_path, img2_path=snapshot_path, model_name="SFace", enforce_detection=False)
+
+def batched(reference_path, snapshot_paths, workers):
+    reference = embed_images([reference_path], model_name="SFace", workers=1)[0]
+    embeddings = embed_images(snapshot_paths, model_name="SFace", workers=workers)
+    return cosine_distances(embeddings, reference)
+
+def report(label, seconds, count, cores):
+    rate = count / seconds if seconds else float("inf")
+    print(f"{label:<28} {seconds:8.2f}s  {rate:8.2f} snapshots/s  {rate / cores:8.2f} snapshots/s/core")
+
+if __name__ == "__main__":
+    reference_path, snapshot_dir = sys.argv[1], sys.argv[2]
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else os.cpu_count()
+    snapshot_paths = sorted(
+        os.path.join(snapshot_dir, name) for name in os.listdir(snapshot_dir)
+        if name.lower().endswith((".jpg", ".jpeg", ".png"))
+    )
+    print(f"{len(snapshot_paths)} snapshots, {workers} workers")
+
+    # Warm up model loading so it is not counted against either path
+    DeepFace.build_model("SFace")
+    embed_images([reference_path], model_name="SFace", workers=1)
+
+    start = time.perf_counter()
+    per_file_loop(reference_path, snapshot_paths)
+    report("per-file DeepFace.verify", time.perf_counter() - start, len(snapshot_paths), 1)
+
+    start = time.perf_counter()
+    batched(reference_path, snapshot_paths, 1)
+    report("batched, 1 process", time.perf_counter() - start, len(snapshot_paths), 1)
+
+    if workers > 1:
+        start = time.perf_counter()
+        batched(reference_path, snapshot_paths, workers)
+        report(f"batched, {workers} processes", time.perf_counter() - start, len(snapshot_paths), workers)
@@ -0,0 +1,58 @@
+"""Compare MCQ write throughput: ORM add per row, ORM add + one flush, multi-row INSERT and COPY.
+
+Writes synthetic questions for an existing job and skill and rolls every run back.
+Usage: python benchmarks/mcq_writer_benchmark.py <job_id> <skill_id> [rows]
+"""
+import os
+import sys
+import time
+import uuid
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import create_app, db
+from app.models.mcq import MCQ
+from app.services.mcq_writer import mcq_row, write_mcqs
+
+def synthetic_rows(job_id, skill_id, count):
+    run = uuid.uuid4().hex[:8]
+    return [mcq_row(job_id, skill_id, "better", {
+        "question": f"Benchmark question {run}-{i}?",
+        "option_a": f"Option {i}A",
+        "option_b": f"Option {i}B",
+        "option_c": f"Option {i}C",
+        "option_d": f"Option {i}D",
+        "correct_answer": "B"
+    }) for i in range(count)]
+
+def orm_per_row(rows):
+    # One round trip per question, as the real-time path did with add + commit
+    for row in rows:
+        db.session.add(MCQ(**row))
+        db.session.flush()
+
+def orm_batch(rows):
+    db.session.add_all([MCQ(**row) for row in rows])
+    db.session.flush()
+
+def report(label, seconds, count):
+    rate = count / seconds if seconds else float("inf")
+    print(f"{label:<24} {seconds:8.3f}s  {rate:10.0f} rows/s")
+
+if __name__ == "__main__":
+    job_id, skill_id = int(sys.argv[1]), int(sys.argv[2])
+    count = int(sys.argv[3]) if len(sys.argv) > 3 else 5000
+    app = create_app()
+    with app.app_context():
+        print(f"{count} rows per run")
+        runs = [
+            ("ORM add per row", orm_per_row),
+            ("ORM add_all + flush", orm_batch),
+            ("INSERT ... RETURNING", lambda rows: write_mcqs(rows, method="insert")),
+            ("COPY + INSERT SELECT", lambda rows: write_mcqs(rows, method="copy"))
+        ]
+        for label, write in runs:
+            rows = synthetic_rows(job_id, skill_id, count)
+            start = time.perf_counter()
+            write(rows)
+            report(label, time.perf_counter() - start, count)
+            db.session.rollback()
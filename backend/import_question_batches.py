@@ -0,0 +1,22 @@
+import sys
+import json
+import argparse
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app
+from app.services.question_import import import_question_batches, QUESTION_BATCHES_DIR
+
+app = create_app()
+
+if __name__ == "__main__":
+    # `python import_question_batches.py --job 12` also copies the questions into job 12's bank
+    parser = argparse.ArgumentParser(description="Seed the question pool from question_batches/*.json")
+    parser.add_argument("folder", nargs="?", default=QUESTION_BATCHES_DIR)
+    parser.add_argument("--job", type=int, default=None)
+    parser.add_argument("--create-skills", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args(sys.argv[1:])
+    with app.app_context():
+        summary = import_question_batches(args.folder, job_id=args.job, create_skills=args.create_skills, workers=args.workers)
+    print(json.dumps(summary, indent=2))
@@ -0,0 +1,10 @@
+import logging
+from dotenv import load_dotenv
+load_dotenv()
+
+from app.services.inference import serve
+
+if __name__ == "__main__":
+    # Run one per host and set INFERENCE_BACKEND=server for the web and job workers
+    logging.basicConfig(level=logging.INFO)
+    serve()
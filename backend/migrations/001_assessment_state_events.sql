@@ -0,0 +1,8 @@
+-- Incremental assessment state persistence (see app/services/session_store.py)
+CREATE TABLE IF NOT EXISTS assessment_state_events (
+    attempt_id INTEGER NOT NULL REFERENCES assessment_attempts(attempt_id),
+    version INTEGER NOT NULL,
+    ops JSONB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (attempt_id, version)
+);
@@ -0,0 +1,9 @@
+-- Speculatively generated next questions (see app/services/question_prefetch.py)
+CREATE TABLE IF NOT EXISTS question_prefetches (
+    attempt_id INTEGER NOT NULL REFERENCES assessment_attempts(attempt_id),
+    skill_name VARCHAR(255) NOT NULL,
+    difficulty_band VARCHAR(20) NOT NULL,
+    mcq_id INTEGER NOT NULL REFERENCES mcqs(mcq_id),
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (attempt_id, skill_name, difficulty_band)
+);
@@ -0,0 +1,10 @@
+-- Reference face embeddings per candidate image (see app/services/face_embeddings.py)
+CREATE TABLE IF NOT EXISTS candidate_face_embeddings (
+    candidate_id INTEGER NOT NULL REFERENCES candidates(candidate_id),
+    source VARCHAR(20) NOT NULL,
+    model_name VARCHAR(20) NOT NULL,
+    image_hash VARCHAR(64) NOT NULL,
+    embedding BYTEA NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (candidate_id, source, model_name)
+);
@@ -0,0 +1,4 @@
+-- Lookup of the latest question bank generation run per assessment (see app/services/bank_generation.py)
+CREATE INDEX IF NOT EXISTS ix_background_jobs_question_bank
+    ON background_jobs ((payload->>'job_id'), created_at DESC)
+    WHERE kind = 'question_bank';
@@ -0,0 +1,6 @@
+-- Cached LLM subskill expansions per skill (see app/services/subskill_cache.py)
+CREATE TABLE IF NOT EXISTS skill_expansions (
+    skill_name VARCHAR(255) PRIMARY KEY,
+    subskills JSONB NOT NULL DEFAULT '[]'::jsonb,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
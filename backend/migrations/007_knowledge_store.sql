@@ -0,0 +1,17 @@
+-- Grounding content per topic and its embedded chunks (see app/services/knowledge_store.py)
+CREATE TABLE IF NOT EXISTS knowledge_documents (
+    topic VARCHAR(255) PRIMARY KEY,
+    title VARCHAR(255),
+    source VARCHAR(20) NOT NULL,
+    content TEXT,
+    content_hash VARCHAR(64),
+    fetched_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE TABLE IF NOT EXISTS knowledge_chunks (
+    chunk_id SERIAL PRIMARY KEY,
+    topic VARCHAR(255) NOT NULL REFERENCES knowledge_documents(topic) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    embedding BYTEA NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_knowledge_chunks_topic ON knowledge_chunks (topic);
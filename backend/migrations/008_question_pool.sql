@@ -0,0 +1,24 @@
+-- Cross-job question pool (see app/services/question_pool.py)
+CREATE TABLE IF NOT EXISTS question_pool (
+    pool_id SERIAL PRIMARY KEY,
+    skill_id INTEGER NOT NULL REFERENCES skills(skill_id),
+    difficulty_band VARCHAR(20) NOT NULL,
+    question TEXT NOT NULL,
+    option_a TEXT NOT NULL,
+    option_b TEXT NOT NULL,
+    option_c TEXT NOT NULL,
+    option_d TEXT NOT NULL,
+    correct_answer VARCHAR(1) NOT NULL,
+    content_hash VARCHAR(64) NOT NULL UNIQUE,
+    tags JSONB NOT NULL DEFAULT '[]'::jsonb,
+    times_assigned INTEGER NOT NULL DEFAULT 0,
+    times_served INTEGER NOT NULL DEFAULT 0,
+    retired BOOLEAN NOT NULL DEFAULT FALSE,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS ix_question_pool_lookup
+    ON question_pool (skill_id, difficulty_band, times_assigned)
+    WHERE NOT retired;
+
+ALTER TABLE mcqs ADD COLUMN IF NOT EXISTS pool_id INTEGER REFERENCES question_pool(pool_id);
+CREATE INDEX IF NOT EXISTS ix_mcqs_pool_id ON mcqs (pool_id);
@@ -0,0 +1,16 @@
+-- Content hash for bulk MCQ inserts with ON CONFLICT dedupe (see app/services/mcq_writer.py)
+ALTER TABLE mcqs ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);
+
+-- Same normalization as question_pool.content_hash: question and options joined
+-- by newlines, whitespace runs collapsed, trimmed and lowercased
+UPDATE mcqs SET content_hash = encode(sha256(convert_to(lower(btrim(regexp_replace(
+    question || E'\n' || option_a || E'\n' || option_b || E'\n' || option_c || E'\n' || option_d,
+    '\s+', ' ', 'g'))), 'UTF8')), 'hex')
+WHERE content_hash IS NULL;
+
+-- Existing exact repeats within a job keep their rows but only the first keeps the hash
+UPDATE mcqs m SET content_hash = NULL
+FROM mcqs d
+WHERE d.job_id = m.job_id AND d.content_hash = m.content_hash AND d.mcq_id < m.mcq_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mcqs_job_content_hash ON mcqs (job_id, content_hash);
@@ -0,0 +1,11 @@
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app
+from app.services.question_reservoir import run_reservoir_manager
+
+app = create_app()
+
+if __name__ == "__main__":
+    # Keeps question banks of upcoming and running assessments stocked; refills run on `python worker.py`
+    run_reservoir_manager(app)
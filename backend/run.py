@@ -1,8 +1,12 @@
-from app import create_app
 from dotenv import load_dotenv
 load_dotenv()
 
+from app import create_app
+from app.services.job_queue import start_local_reclaimer
+
 app = create_app()
+# Jobs queued before a restart only run if this process picks them up (JOB_QUEUE_BACKEND=local)
+start_local_reclaimer(app)
 
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,13 @@
+import sys
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app
+from app.services.question_batches import warm_subskill_cache
+
+app = create_app()
+
+if __name__ == "__main__":
+    # `python warm_subskills.py --refresh` re-expands skills that are already cached
+    with app.app_context():
+        warm_subskill_cache(refresh="--refresh" in sys.argv[1:])
@@ -0,0 +1,12 @@
+import sys
+from dotenv import load_dotenv
+load_dotenv()
+
+from app import create_app
+from app.services.job_queue import run_worker
+
+app = create_app()
+
+if __name__ == "__main__":
+    # Optional job kinds to restrict this worker to, e.g. `python worker.py face_verification`
+    run_worker(app, kinds=sys.argv[1:] or None)